@@ -1,6 +1,7 @@
 # /backend/app/__init__.py
 
 import os # <-- 1. Importuj 'os'
+import time
 from dotenv import load_dotenv # <-- 2. Importuj 'load_dotenv'
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
@@ -8,6 +9,7 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_mail import Mail
+from .database import database_url, engine_options
 
 # --- 3. Wczytaj zmienne z pliku .env ---
 # Zrób to na samej górze, zanim cokolwiek zostanie skonfigurowane
@@ -27,7 +29,9 @@ def create_app():
     # Konfiguracja ogólna
     app.config["SECRET_KEY"] = os.environ.get("SECRET_KEY")
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY")
-    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///app.db" # (To może zostać, nie jest sekretem)
+    # Baza danych: DATABASE_URL (domyślnie SQLite w folderze 'instance') + opcje puli, patrz app/database.py
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url()
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
 
     # Konfiguracja Maila
     app.config['MAIL_SERVER'] = os.environ.get("MAIL_SERVER")
@@ -43,6 +47,9 @@ def create_app():
     app.config['VAPID_CLAIMS'] = {
         'sub': os.environ.get("VAPID_MAILTO")
     }
+    # Równoległa wysyłka PUSH (app/push.py)
+    app.config['PUSH_MAX_WORKERS'] = int(os.environ.get("PUSH_MAX_WORKERS", 16))
+    app.config['PUSH_TIMEOUT'] = float(os.environ.get("PUSH_TIMEOUT", 10))
     # --- KONIEC ZMIAN ---
     # --- NOWA ZMIENNA: Wczytanie listy odbiorców powiadomień ---
     recipients_str = os.environ.get("ORDER_NOTIFICATION_RECIPIENTS", "")
@@ -50,10 +57,57 @@ def create_app():
     # i usuń puste wpisy, jeśli zmienna jest pusta.
     app.config['ORDER_NOTIFICATION_RECIPIENTS'] = [email.strip() for email in recipients_str.split(',') if email.strip()]
     # --- KONIEC NOWEGO BLOKU ---
+
+    # Kolejka zadań w tle (e-maile, PDF, powiadomienia). 0 = wyłączone wątki robocze.
+    app.config['JOB_WORKERS'] = int(os.environ.get("JOB_WORKERS", 2))
+    app.config['JOB_POLL_INTERVAL'] = float(os.environ.get("JOB_POLL_INTERVAL", 2.0))
+
+    # Cache wygenerowanych PDF-ów (domyślnie w folderze 'instance')
+    app.config['PDF_CACHE_DIR'] = os.environ.get("PDF_CACHE_DIR")
+    app.config['PDF_CACHE_MAX_BYTES'] = int(os.environ.get("PDF_CACHE_MAX_MB", 256)) * 1024 * 1024
+
+    # Renderowanie PDF (app/pdf_render.py): 'xhtml2pdf' (szablony HTML) lub 'canvas' (ReportLab)
+    app.config['PDF_RENDERER'] = os.environ.get("PDF_RENDERER", "xhtml2pdf")
+    # Czcionki TTF z polskimi znakami dla backendu 'canvas' (domyślnie DejaVu Sans, jeśli jest w systemie)
+    app.config['PDF_FONT_PATH'] = os.environ.get("PDF_FONT_PATH")
+    app.config['PDF_FONT_BOLD_PATH'] = os.environ.get("PDF_FONT_BOLD_PATH")
+
+    # Rdzenie przypadające na jeden proces serwera (gunicorn.conf.py ustawia WEB_CONCURRENCY).
+    # Pule liczące na CPU są osobne w każdym workerze, więc domyślnie dostają tylko tę część.
+    cpus_per_worker = max(1, (os.cpu_count() or 1) // max(1, int(os.environ.get("WEB_CONCURRENCY", 1))))
+
+    # Hasła: koszt bcrypt (hasze z innym kosztem są przeliczane przy logowaniu),
+    # wątki liczące bcrypt na worker (0 = rdzenie / liczba workerów) i limit oczekujących w kolejce
+    app.config['BCRYPT_ROUNDS'] = int(os.environ.get("BCRYPT_ROUNDS", 12))
+    if not 4 <= app.config['BCRYPT_ROUNDS'] <= 31:
+        # bcrypt przyjmuje koszt 4-31; błąd przy starcie zamiast przy pierwszym logowaniu
+        raise ValueError(f"BCRYPT_ROUNDS musi być w zakresie 4-31 (jest {app.config['BCRYPT_ROUNDS']})")
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get("PASSWORD_HASH_WORKERS", 0)) or cpus_per_worker
+    app.config['PASSWORD_HASH_MAX_QUEUE'] = int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", 64))
+
+    # Zbiorczy eksport PDF (ZIP): procesy renderujące na worker (0 = rdzenie / liczba workerów) i limit zamówień
+    app.config['PDF_EXPORT_PROCESSES'] = int(os.environ.get("PDF_EXPORT_PROCESSES", 0)) or cpus_per_worker
+    app.config['PDF_EXPORT_MAX_ORDERS'] = int(os.environ.get("PDF_EXPORT_MAX_ORDERS", 5000))
+
+    # Cache zakończonych przedziałów wykresów kokpitu (sekundy, 0 = bez cache)
+    app.config['TIMESERIES_CACHE_TTL'] = int(os.environ.get("TIMESERIES_CACHE_TTL", 300))
+
+    # Strumień powiadomień (SSE): co ile sekund heartbeat i jak długo trzymać jedno połączenie
+    app.config['NOTIFICATION_STREAM_HEARTBEAT'] = float(os.environ.get("NOTIFICATION_STREAM_HEARTBEAT", 15))
+    app.config['NOTIFICATION_STREAM_MAX_SECONDS'] = float(os.environ.get("NOTIFICATION_STREAM_MAX_SECONDS", 300))
+    # Limit otwartych strumieni na proces (0 = bez limitu); ponad limit klient odpytuje API.
+    # Pod gunicornem ustawia go gunicorn.conf.py według liczby wątków.
+    app.config['NOTIFICATION_STREAM_MAX_CONNECTIONS'] = int(os.environ.get("NOTIFICATION_STREAM_MAX_CONNECTIONS", 0))
+    # To samo dla eksportów strumieniowych (CSV/NDJSON, ZIP z PDF-ami); ponad limit 503
+    app.config['EXPORT_STREAM_MAX_CONNECTIONS'] = int(os.environ.get("EXPORT_STREAM_MAX_CONNECTIONS", 0))
+    
+    # Start procesu (gunicorn nadpisuje to w post_fork dla każdego workera)
+    app.config['WORKER_STARTED_AT'] = time.time()
     
     # Inicjalizacja rozszerzeń
     db.init_app(app)
-    migrate.init_app(app, db)
+    from .search import include_object
+    migrate.init_app(app, db, include_object=include_object)
     jwt.init_app(app)
     mail.init_app(app)
     
@@ -61,7 +115,7 @@ def create_app():
     CORS(app, resources={r"/api/*": {"origins": [
         "http://localhost:5174", 
         "http://localhost:5173"
-    ]}})
+    ], "expose_headers": ["X-Export-Id", "X-Export-Total"]}})
 
     # Rejestracja modeli i blueprintów
     with app.app_context():
@@ -69,4 +123,10 @@ def create_app():
         from . import routes 
         app.register_blueprint(routes.api_bp)
 
+    from .commands import register_commands
+    register_commands(app)
+
+    from .jobs import init_jobs
+    init_jobs(app)
+
     return app
\ No newline at end of file
@@ -0,0 +1,173 @@
+# /backend/app/catalog.py
+"""
+Listowanie katalogu produktów dla /api/products i /api/my-products.
+Warianty ładujemy jednym zbiorczym zapytaniem (selectinload),
+zamiast osobnego SELECT-a dla każdego produktu w to_dict().
+
+Pełny katalog jest dodatkowo trzymany w pamięci procesu jako "migawka"
+(snapshot) przypisana do wersji katalogu. Wersję podbija każda zmiana
+produktów lub przypisań (bump_catalog_version), a jej aktualna wartość
+leży w małym pliku w folderze 'instance', więc widzą ją wszystkie procesy.
+"""
+import hashlib
+import os
+import threading
+import uuid
+from flask import current_app
+from sqlalchemy.orm import selectinload
+from .models import db, Product, client_product_assignment
+from .pagination import encode_cursor, decode_cursor
+
+_VERSION_FILE_NAME = 'catalog.version'
+
+_cache_lock = threading.Lock()
+_snapshot = None      # {"version", "by_id", "body", "etag"}
+_projections = {}     # user_id -> {"version", "body", "etag"}
+
+
+def catalog_query(user_id=None, name_filter=None):
+    """
+    Bazowe zapytanie o katalog (posortowane po ID).
+    Jeśli podano 'user_id', zwraca tylko produkty przypisane do klienta.
+    """
+    query = Product.query.options(selectinload(Product.variants))
+
+    if user_id is not None:
+        query = query.join(
+            client_product_assignment,
+            client_product_assignment.c.product_id == Product.id
+        ).filter(client_product_assignment.c.user_id == user_id)
+
+    if name_filter:
+        query = query.filter(Product.name.ilike(f"%{name_filter}%"))
+
+    return query.order_by(Product.id.asc())
+
+
+def list_catalog(user_id=None, name_filter=None, limit=None, cursor=None):
+    """
+    Zwraca (lista_słowników_produktów, next_cursor).
+    Bez 'limit' zwraca cały (przefiltrowany) katalog, a next_cursor to None.
+    """
+    query = catalog_query(user_id=user_id, name_filter=name_filter)
+
+    if cursor:
+        (last_id,) = decode_cursor(cursor, 1)
+        if not isinstance(last_id, int):
+            raise ValueError("Nieprawidłowy kursor")
+        query = query.filter(Product.id > last_id)
+
+    if limit is None:
+        return [product.to_dict() for product in query.all()], None
+
+    # Pobieramy o jeden więcej, żeby wiedzieć, czy jest następna strona
+    products = query.limit(limit + 1).all()
+    has_more = len(products) > limit
+    products = products[:limit]
+
+    next_cursor = encode_cursor([products[-1].id]) if has_more else None
+    return [product.to_dict() for product in products], next_cursor
+
+
+# --- Wersja katalogu i cache migawek ---
+
+def _version_path():
+    return os.path.join(current_app.instance_path, _VERSION_FILE_NAME)
+
+
+def bump_catalog_version():
+    """
+    Unieważnia cache katalogu we wszystkich procesach.
+    Wywołuj PO commit-cie zmian w produktach, wariantach lub przypisaniach.
+    """
+    global _snapshot
+    path = _version_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # Zapis atomowy: najpierw plik tymczasowy, potem podmiana
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(uuid.uuid4().hex)
+    os.replace(tmp_path, path)
+
+    with _cache_lock:
+        _snapshot = None
+        _projections.clear()
+
+
+def current_catalog_version():
+    """Zwraca aktualny token wersji katalogu (tworzy go przy pierwszym użyciu)."""
+    try:
+        with open(_version_path()) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        version = ''
+
+    if not version:
+        bump_catalog_version()
+        return current_catalog_version()
+    return version
+
+
+def _build_entry(version, products):
+    body = current_app.json.dumps(products).encode('utf-8')
+    return {
+        "version": version,
+        "body": body,
+        # Silny ETag liczony z treści - identyczny we wszystkich procesach
+        "etag": hashlib.sha256(body).hexdigest()[:32]
+    }
+
+
+def catalog_snapshot():
+    """Zwraca migawkę całego katalogu dla bieżącej wersji (buduje ją w razie potrzeby)."""
+    global _snapshot
+    version = current_catalog_version()
+
+    snapshot = _snapshot
+    if snapshot is not None and snapshot["version"] == version:
+        return snapshot
+
+    with _cache_lock:
+        if _snapshot is not None and _snapshot["version"] == version:
+            return _snapshot
+
+        products = [product.to_dict() for product in catalog_query().all()]
+        snapshot = _build_entry(version, products)
+        snapshot["by_id"] = {product["id"]: product for product in products}
+
+        _snapshot = snapshot
+        _projections.clear()
+        return snapshot
+
+
+def cached_projection(user_id):
+    """
+    Zwraca zbuforowany widok katalogu klienta dla bieżącej wersji
+    albo None, jeśli trzeba go zbudować (bez dotykania bazy).
+    """
+    version = current_catalog_version()
+    projection = _projections.get(user_id)
+    if projection is not None and projection["version"] == version:
+        return projection
+    return None
+
+
+def client_projection(user_id):
+    """Widok katalogu klienta budowany z migawki i listy przypisanych ID."""
+    projection = cached_projection(user_id)
+    if projection is not None:
+        return projection
+
+    snapshot = catalog_snapshot()
+    assigned_ids = sorted(
+        product_id for (product_id,) in db.session.query(
+            client_product_assignment.c.product_id
+        ).filter(client_product_assignment.c.user_id == user_id)
+    )
+    products = [snapshot["by_id"][pid] for pid in assigned_ids if pid in snapshot["by_id"]]
+
+    projection = _build_entry(snapshot["version"], products)
+    with _cache_lock:
+        _projections[user_id] = projection
+    return projection
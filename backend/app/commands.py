@@ -0,0 +1,114 @@
+# /backend/app/commands.py
+"""
+Komendy CLI do zadań administracyjnych, np.:
+    flask reindex-orders
+    flask backfill-push-endpoints
+    flask ensure-indexes
+    flask check-query-plans
+    flask rebuild-order-totals
+    flask rebuild-rollups
+"""
+import json
+import sys
+import click
+from .models import db, PushSubscription, Order
+from .search import rebuild_search_index, create_search_index
+from .query_plans import check_query_plans
+from .rollups import rebuild_rollups
+
+
+def register_commands(app):
+
+    @app.cli.command('reindex-orders')
+    def reindex_orders_command():
+        """Tworzy (jeśli trzeba) i przebudowuje indeks wyszukiwania zamówień (FTS5)."""
+        if not create_search_index():
+            click.echo("Indeks FTS5 jest niedostępny w tej bazie - pomijam.")
+            return
+        total = rebuild_search_index()
+        click.echo(f"Zaindeksowano zamówień: {total}")
+
+    @app.cli.command('backfill-push-endpoints')
+    def backfill_push_endpoints_command():
+        """Uzupełnia endpoint/endpoint_hash starych subskrypcji i usuwa duplikaty."""
+        seen_hashes = set(
+            endpoint_hash for (endpoint_hash,) in db.session.query(PushSubscription.endpoint_hash)
+            .filter(PushSubscription.endpoint_hash.isnot(None))
+        )
+        updated, removed = 0, 0
+        # Od najnowszych - przy duplikatach zostaje najświeższa subskrypcja
+        legacy = PushSubscription.query.filter(
+            PushSubscription.endpoint_hash.is_(None)
+        ).order_by(PushSubscription.id.desc()).all()
+
+        for sub in legacy:
+            try:
+                data = json.loads(sub.subscription_json)
+                endpoint_hash = PushSubscription.hash_endpoint(data['endpoint'])
+            except (ValueError, KeyError, TypeError, AttributeError):
+                db.session.delete(sub)
+                removed += 1
+                continue
+
+            if endpoint_hash in seen_hashes:
+                db.session.delete(sub)
+                removed += 1
+                continue
+
+            sub.set_subscription(data)
+            seen_hashes.add(endpoint_hash)
+            updated += 1
+
+        db.session.commit()
+        click.echo(f"Uzupełniono: {updated}, usunięto (duplikaty/błędne): {removed}")
+
+    @app.cli.command('ensure-indexes')
+    def ensure_indexes_command():
+        """Tworzy brakujące indeksy zdefiniowane w modelach (bezpieczne do wielokrotnego użycia)."""
+        created = 0
+        with db.engine.begin() as conn:
+            existing_tables = set(db.inspect(conn).get_table_names())
+            for table in db.metadata.sorted_tables:
+                if table.name not in existing_tables:
+                    continue
+                existing = {index['name'] for index in db.inspect(conn).get_indexes(table.name)}
+                for index in table.indexes:
+                    if index.name not in existing:
+                        index.create(conn)
+                        click.echo(f"Utworzono indeks {index.name}")
+                        created += 1
+        click.echo(f"Nowe indeksy: {created}")
+
+    @app.cli.command('check-query-plans')
+    @click.option('--verbose', is_flag=True, help="Pokaż pełne plany wszystkich zapytań.")
+    def check_query_plans_command(verbose):
+        """Sprawdza, czy zapytania endpointów nie robią pełnych skanów dużych tabel."""
+        failures = 0
+        for request_label, sql, plan, full_scans in check_query_plans():
+            status = "OK " if not full_scans else "BŁĄD"
+            click.echo(f"[{status}] {request_label}")
+            if verbose or full_scans:
+                if sql:
+                    click.echo(f"        {' '.join(sql.split())}")
+                for line in plan:
+                    click.echo(f"        {line}")
+            if full_scans:
+                failures += 1
+
+        if failures:
+            click.echo(f"Zapytania z pełnym skanem tabeli (lub błędem): {failures}")
+            sys.exit(1)
+        click.echo("Wszystkie zapytania korzystają z indeksów.")
+
+    @app.cli.command('rebuild-order-totals')
+    def rebuild_order_totals_command():
+        """Przelicza sumy zamówień (ilość, wysłane, wartość, liczba pozycji) z pozycji."""
+        updated = Order.rebuild_totals()
+        db.session.commit()
+        click.echo(f"Przeliczono sumy zamówień: {updated}")
+
+    @app.cli.command('rebuild-rollups')
+    def rebuild_rollups_command():
+        """Przelicza od zera dzienne agregaty statystyk kokpitu (po rebuild-order-totals)."""
+        days = rebuild_rollups()
+        click.echo(f"Przeliczono agregaty dzienne: {days} dni")
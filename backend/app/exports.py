@@ -0,0 +1,138 @@
+# /backend/app/exports.py
+"""
+Strumieniowy eksport danych (CSV / NDJSON): zamówienia, pozycje, wysyłki.
+
+Zapytania czytają same kolumny (bez obiektów ORM) kursorem po stronie
+serwera (yield_per / stream_results), a wiersze od razu trafiają do
+odpowiedzi - zużycie pamięci nie zależy od liczby eksportowanych wierszy.
+"""
+import csv
+import datetime
+import io
+import json
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from .models import db, Order, OrderItem, Shipment, ShipmentItem, User
+
+FORMATS = ('csv', 'ndjson')
+# Wierszy pobieranych z kursora naraz (i wysyłanych jednym kawałkiem odpowiedzi)
+_FETCH_SIZE = 1000
+
+
+def _orders_statement():
+    return select(
+        Order.id.label('order_id'), Order.created_at, Order.status,
+        Order.user_id, User.username,
+        Order.line_count, Order.total_quantity, Order.total_shipped, Order.total_value,
+        Order.notes
+    ).join(User, Order.user_id == User.id)
+
+
+def _items_statement():
+    return select(
+        OrderItem.id.label('item_id'), OrderItem.order_id, Order.created_at, Order.status,
+        Order.user_id, User.username,
+        OrderItem.product_name, OrderItem.variant_size,
+        OrderItem.quantity, OrderItem.shipped_quantity, OrderItem.price_at_order
+    ).join(Order, OrderItem.order_id == Order.id).join(User, Order.user_id == User.id)
+
+
+def _shipments_statement():
+    shipped_by = aliased(User)
+    return select(
+        Shipment.id.label('shipment_id'), Shipment.order_id, Shipment.created_at,
+        shipped_by.username.label('shipped_by'), Order.user_id,
+        ShipmentItem.order_item_id, OrderItem.product_name, OrderItem.variant_size,
+        ShipmentItem.quantity_shipped
+    ).join(ShipmentItem, ShipmentItem.shipment_id == Shipment.id).join(
+        OrderItem, ShipmentItem.order_item_id == OrderItem.id
+    ).join(
+        Order, Shipment.order_id == Order.id
+    ).outerjoin(shipped_by, Shipment.shipped_by_user_id == shipped_by.id)
+
+
+# nazwa -> (zapytanie, kolumna daty do filtra, sortowanie)
+DATASETS = {
+    'orders': (_orders_statement, Order.created_at, (Order.created_at, Order.id)),
+    'items': (_items_statement, Order.created_at, (Order.created_at, OrderItem.order_id, OrderItem.id)),
+    'shipments': (_shipments_statement, Shipment.created_at, (Shipment.created_at, Shipment.id, ShipmentItem.id)),
+}
+
+
+def export_statement(dataset, start_date=None, end_date=None, status=None, user_id=None):
+    """
+    Zapytanie eksportu. Daty: [start_date, end_date) - dla wysyłek data paczki,
+    dla zamówień i pozycji data zamówienia. 'status' i 'user_id' dotyczą zamówienia.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Nieznany zestaw danych (dozwolone: {', '.join(DATASETS)})")
+    build, date_column, ordering = DATASETS[dataset]
+
+    statement = build()
+    if start_date is not None:
+        statement = statement.where(date_column >= start_date)
+    if end_date is not None:
+        statement = statement.where(date_column < end_date)
+    if status:
+        statement = statement.where(Order.status == status)
+    if user_id is not None:
+        statement = statement.where(Order.user_id == user_id)
+    return statement.order_by(*ordering)
+
+
+def _plain_value(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return value
+
+
+# Początek komórki, który arkusz (Excel, LibreOffice) uzna za formułę
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def csv_cell(value):
+    """
+    Tekst bezpieczny do otwarcia w arkuszu: komórkę zaczynającą się od
+    =, +, -, @ (lub tabulatora / CR) poprzedzamy apostrofem, żeby np. nazwa
+    produktu albo uwagi klienta nie zostały wykonane jako formuła.
+    Liczby zostawiamy bez zmian.
+    """
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_export(statement, output_format='csv'):
+    """Generator kawałków odpowiedzi (nagłówek CSV + co najwyżej _FETCH_SIZE wierszy na kawałek)."""
+    if output_format not in FORMATS:
+        raise ValueError(f"Nieprawidłowy 'format' (dozwolone: {', '.join(FORMATS)})")
+
+    result = db.session.execute(statement.execution_options(yield_per=_FETCH_SIZE))
+    columns = list(result.keys())
+    buffer = io.StringIO()
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    try:
+        if output_format == 'csv':
+            writer = csv.writer(buffer)
+            writer.writerow(columns)
+            yield flush()
+            for rows in result.partitions():
+                writer.writerows([csv_cell(_plain_value(value)) for value in row] for row in rows)
+                yield flush()
+        else:
+            for rows in result.partitions():
+                for row in rows:
+                    buffer.write(json.dumps(
+                        {column: _plain_value(value) for column, value in zip(columns, row)},
+                        ensure_ascii=False
+                    ))
+                    buffer.write('\n')
+                yield flush()
+    finally:
+        result.close()
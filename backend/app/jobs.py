@@ -0,0 +1,339 @@
+# /backend/app/jobs.py
+"""
+Prosta, trwała kolejka zadań w tle oparta o tabelę BackgroundJob.
+
+- enqueue_job() / enqueue_jobs() dodają zadania do bieżącej sesji, więc zapisuje się
+  razem z zamówieniem (albo wcale, jeśli transakcja się wycofa).
+- Pula wątków roboczych pobiera zadania dopiero po commit-cie,
+  rezerwuje je warunkowym UPDATE (bezpieczne przy wielu procesach)
+  i wykonuje zarejestrowany handler.
+- Błąd = ponowienie z wykładniczym opóźnieniem (backoff), aż do max_attempts.
+- Podczas wykonywania handlera wątek-heartbeat odświeża locked_at, więc długie
+  zadanie (przebudowa agregatów, wolny SMTP) nie zostanie uznane za porzucone
+  i uruchomione drugi raz przez inny proces.
+"""
+import contextlib
+import datetime
+import json
+import random
+import threading
+import time
+import traceback
+from sqlalchemy import event, update
+from sqlalchemy.orm import Session
+from .models import db, BackgroundJob
+
+_handlers = {}
+
+DEFAULT_MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 10
+BACKOFF_MAX_SECONDS = 3600
+# Po tylu sekundach bez odświeżenia locked_at zadanie 'running' uznajemy
+# za porzucone (np. restart procesu)
+STALE_LOCK_SECONDS = 600
+# Co ile sekund wykonawca odświeża locked_at trwającego zadania
+HEARTBEAT_SECONDS = 60
+# Co ile sekund wątek roboczy szuka porzuconych zadań
+REQUEUE_INTERVAL_SECONDS = 60
+
+# Każdy wątek roboczy czeka na własnym Event - commit z nowymi zadaniami
+# budzi wszystkie, a żaden nie kasuje sygnału przeznaczonego dla innego
+_wakeups = set()
+_wakeups_lock = threading.Lock()
+
+
+def job_handler(kind):
+    """Dekorator rejestrujący funkcję jako handler zadań danego typu."""
+    def wrapper(fn):
+        _handlers[kind] = fn
+        return fn
+    return wrapper
+
+
+def enqueue_job(kind, payload=None, max_attempts=DEFAULT_MAX_ATTEMPTS, delay_seconds=0):
+    """
+    Dodaje zadanie do bieżącej transakcji (db.session).
+    Zadanie zostanie wykonane dopiero, gdy wywołujący zrobi commit.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Nieznany typ zadania: {kind}")
+
+    job = BackgroundJob(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        max_attempts=max_attempts,
+        run_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=delay_seconds)
+    )
+    db.session.add(job)
+    db.session.info['jobs_enqueued'] = True
+    return job
+
+
+def enqueue_jobs(kind, payloads, max_attempts=DEFAULT_MAX_ATTEMPTS):
+    """
+    Jak enqueue_job(), ale dla wielu zadań jednego typu naraz - jeden
+    INSERT (executemany) w bieżącej transakcji. Zwraca liczbę zadań.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"Nieznany typ zadania: {kind}")
+
+    now = datetime.datetime.utcnow()
+    rows = [
+        {"kind": kind, "payload": json.dumps(payload or {}), "max_attempts": max_attempts, "run_at": now}
+        for payload in payloads
+    ]
+    if rows:
+        db.session.execute(BackgroundJob.__table__.insert(), rows)
+        db.session.info['jobs_enqueued'] = True
+    return len(rows)
+
+
+@event.listens_for(Session, 'after_commit')
+def _wake_workers_after_commit(session):
+    # Budzimy wątki robocze od razu po zapisaniu nowych zadań
+    if session.info.pop('jobs_enqueued', False):
+        _wake_workers()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_enqueued_after_rollback(session):
+    # Wycofane zadania nie istnieją - flaga nie może obudzić wątków przy następnym commit-cie.
+    # Wycofanie samego savepointu nie usuwa zadań dodanych wcześniej w transakcji.
+    if not session.in_nested_transaction():
+        session.info.pop('jobs_enqueued', None)
+
+
+def _wake_workers():
+    with _wakeups_lock:
+        for wakeup in _wakeups:
+            wakeup.set()
+
+
+def _backoff_seconds(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _requeue_stale_jobs():
+    """
+    Przywraca do kolejki zadania, których wykonawca zniknął w trakcie pracy.
+    Porzucenie liczy się jako nieudana próba (attempts rośnie przy rezerwacji),
+    więc zadanie, które za każdym razem zabija proces, po max_attempts
+    kończy jako 'failed' zamiast krążyć w nieskończoność.
+    """
+    now = datetime.datetime.utcnow()
+    stale = BackgroundJob.query.filter(
+        BackgroundJob.status == 'running',
+        BackgroundJob.locked_at < now - datetime.timedelta(seconds=STALE_LOCK_SECONDS)
+    )
+    error = f"Zadanie porzucone przez wykonawcę (brak wyniku po {STALE_LOCK_SECONDS} s)"
+    failed = stale.filter(BackgroundJob.attempts >= BackgroundJob.max_attempts).update({
+        "status": 'failed', "locked_at": None, "finished_at": now, "last_error": error
+    }, synchronize_session=False)
+    stale.filter(BackgroundJob.attempts < BackgroundJob.max_attempts).update({
+        "status": 'queued', "locked_at": None, "last_error": error
+    }, synchronize_session=False)
+    db.session.commit()
+    if failed:
+        print(f"BŁĄD: Porzucone zadania oznaczone jako nieudane ostatecznie: {failed}")
+
+
+def _claim_next_job():
+    """
+    Rezerwuje najstarsze gotowe zadanie. Warunkowy UPDATE (status='queued')
+    gwarantuje, że to samo zadanie nie trafi do dwóch wykonawców.
+    """
+    now = datetime.datetime.utcnow()
+    while True:
+        job_id = db.session.query(BackgroundJob.id).filter(
+            BackgroundJob.status == 'queued',
+            BackgroundJob.run_at <= now
+        ).order_by(BackgroundJob.run_at, BackgroundJob.id).limit(1).scalar()
+
+        if job_id is None:
+            db.session.rollback()
+            return None
+
+        claimed = BackgroundJob.query.filter(
+            BackgroundJob.id == job_id,
+            BackgroundJob.status == 'queued'
+        ).update({
+            "status": 'running',
+            "locked_at": now,
+            "attempts": BackgroundJob.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if claimed == 1:
+            return db.session.get(BackgroundJob, job_id)
+        # Ktoś był szybszy - próbujemy następnego
+
+
+@contextlib.contextmanager
+def _heartbeat(job_id):
+    """
+    Odświeża locked_at zadania co HEARTBEAT_SECONDS, dopóki trwa blok.
+    Osobne połączenie - transakcja handlera może być w toku.
+    """
+    engine = db.engine
+    finished = threading.Event()
+
+    def beat():
+        while not finished.wait(HEARTBEAT_SECONDS):
+            try:
+                with engine.begin() as connection:
+                    connection.execute(update(BackgroundJob).where(
+                        BackgroundJob.id == job_id,
+                        BackgroundJob.status == 'running'
+                    ).values(locked_at=datetime.datetime.utcnow()))
+            except Exception as e:
+                print(f"OSTRZEŻENIE: Nie udało się odświeżyć blokady zadania #{job_id}: {e}")
+
+    thread = threading.Thread(target=beat, name=f"job-heartbeat-{job_id}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        finished.set()
+        thread.join()
+
+
+def run_job(job):
+    """Wykonuje zarezerwowane zadanie i zapisuje wynik (sukces / ponowienie / porażka)."""
+    job_id = job.id
+    handler = _handlers.get(job.kind)
+    try:
+        if handler is None:
+            raise RuntimeError(f"Brak handlera dla zadania '{job.kind}'")
+        with _heartbeat(job_id):
+            handler(json.loads(job.payload or '{}'))
+            db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        job = db.session.get(BackgroundJob, job_id)
+        job.last_error = f"{e}\n{traceback.format_exc(limit=5)}"
+        job.locked_at = None
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            job.finished_at = datetime.datetime.utcnow()
+            print(f"BŁĄD: Zadanie #{job_id} ({job.kind}) nie powiodło się ostatecznie: {e}")
+        else:
+            job.status = 'queued'
+            job.run_at = datetime.datetime.utcnow() + datetime.timedelta(seconds=_backoff_seconds(job.attempts))
+            print(f"OSTRZEŻENIE: Zadanie #{job_id} ({job.kind}) - próba {job.attempts} nieudana: {e}")
+        db.session.commit()
+        return False
+
+    job = db.session.get(BackgroundJob, job_id)
+    job.status = 'done'
+    job.locked_at = None
+    job.last_error = None
+    job.finished_at = datetime.datetime.utcnow()
+    db.session.commit()
+    return True
+
+
+class JobWorkerPool:
+    """Pula wątków roboczych przetwarzających kolejkę w obrębie jednego procesu."""
+
+    def __init__(self, app, size, poll_interval):
+        self.app = app
+        self.size = size
+        self.poll_interval = poll_interval
+        self._threads = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        with self._lock:
+            if self.running or self.size <= 0:
+                return
+            self._stopping.clear()
+            self._threads = [
+                threading.Thread(target=self._worker_loop, name=f"job-worker-{i}", daemon=True)
+                for i in range(self.size)
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    @contextlib.contextmanager
+    def suspended(self):
+        """Żądania obsłużone w tym bloku nie uruchamiają wątków (np. kontrola planów z CLI)."""
+        size, self.size = self.size, 0
+        try:
+            yield
+        finally:
+            self.size = size
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        _wake_workers()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _worker_loop(self):
+        wakeup = threading.Event()
+        with _wakeups_lock:
+            _wakeups.add(wakeup)
+        try:
+            self._process_jobs(wakeup)
+        finally:
+            with _wakeups_lock:
+                _wakeups.discard(wakeup)
+
+    def _process_jobs(self, wakeup):
+        last_requeue_at = None
+        while not self._stopping.is_set():
+            # Kasujemy sygnał przed szukaniem zadań - commit w trakcie pracy nie przepadnie
+            wakeup.clear()
+            with self.app.app_context():
+                try:
+                    # Co REQUEUE_INTERVAL_SECONDS sprzątamy zadania porzucone przez martwe procesy
+                    now = time.monotonic()
+                    if last_requeue_at is None or now - last_requeue_at >= REQUEUE_INTERVAL_SECONDS:
+                        last_requeue_at = now
+                        _requeue_stale_jobs()
+                    job = _claim_next_job()
+                    if job is not None:
+                        run_job(job)
+                        continue
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"BŁĄD: Pętla kolejki zadań: {e}")
+                finally:
+                    db.session.remove()
+
+            wakeup.wait(self.poll_interval)
+
+
+def init_jobs(app):
+    """
+    Podpina kolejkę pod aplikację. Wątki startują przy pierwszym żądaniu HTTP
+    (a nie przy imporcie), żeby skrypty i komendy CLI ich nie uruchamiały.
+    """
+    pool = JobWorkerPool(
+        app,
+        size=app.config.get('JOB_WORKERS', 2),
+        poll_interval=app.config.get('JOB_POLL_INTERVAL', 2.0)
+    )
+    app.extensions['job_pool'] = pool
+
+    @app.before_request
+    def _start_job_workers():
+        if not pool.running:
+            pool.start()
+
+    return pool
+
+
+def job_stats():
+    """Liczba zadań w każdym statusie."""
+    counts = dict(
+        db.session.query(BackgroundJob.status, db.func.count(BackgroundJob.id))
+        .group_by(BackgroundJob.status).all()
+    )
+    return {status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')}
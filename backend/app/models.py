@@ -1,15 +1,20 @@
 # /backend/app/models.py
 from . import db # Importujemy 'db' z __init__.py
-import bcrypt
 import datetime
+import hashlib
+import json
+from urllib.parse import urlsplit, urlunsplit
 from sqlalchemy.sql import text
+from .passwords import hash_password, verify_password, needs_rehash
 
 
 # NOWA TABELA ASOCJACYJNA
 # Definiuje połączenie Wiele-do-Wielu między User i Product
 client_product_assignment = db.Table('client_product_assignment',
     db.Column('user_id', db.Integer, db.ForeignKey('user.id'), primary_key=True),
-    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    # Klucz główny (user_id, product_id) obsługuje wyszukiwanie po kliencie,
+    # ten indeks - po produkcie (np. usuwanie produktu)
+    db.Column('product_id', db.Integer, db.ForeignKey('product.id'), primary_key=True, index=True)
 )
 
 class User(db.Model):
@@ -24,12 +29,31 @@ class User(db.Model):
     # --- KONIEC NOWYCH PÓL ---
     # Role: 'admin', 'user', 'shipping'
     role = db.Column(db.String(20), nullable=False, default='user')
+    # Licznik zmian powiadomień użytkownika (nowe / przeczytane) - kursor 'since'
+    notification_seq = db.Column(db.Integer, nullable=False, default=0, server_default=text('0'))
+
+    @staticmethod
+    def bump_notification_seq(user_id):
+        """
+        Podbija licznik zmian powiadomień w bieżącej transakcji i zwraca nową wartość.
+        UPDATE blokuje wiersz użytkownika, więc równoległe zmiany dostają różne numery.
+        """
+        db.session.query(User).filter(User.id == user_id).update(
+            {"notification_seq": User.notification_seq + 1}, synchronize_session=False
+        )
+        return db.session.query(User.notification_seq).filter(User.id == user_id).scalar()
 
     def set_password(self, password):
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        # bcrypt liczy ograniczona pula wątków, koszt = BCRYPT_ROUNDS (app/passwords.py)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        return verify_password(password, self.password_hash)
+
+    def password_needs_rehash(self):
+        """Czy hasz ma inny koszt niż obecne BCRYPT_ROUNDS (przeliczamy go przy logowaniu)."""
+        return needs_rehash(self.password_hash)
+
     assigned_products = db.relationship('Product', secondary=client_product_assignment, lazy=True,
         backref=db.backref('assigned_to_users', lazy=True))
     
@@ -61,7 +85,7 @@ class ProductVariant(db.Model):
     # ZMIANA: Usuwamy stan magazynowy
     # stock = db.Column(db.Integer, nullable=False, default=0) 
 
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
     product = db.relationship('Product', back_populates='variants')
 
     def to_dict(self):
@@ -74,6 +98,15 @@ class ProductVariant(db.Model):
         }
     
 class Order(db.Model):
+    __table_args__ = (
+        # "Moje zamówienia": WHERE user_id = ? ORDER BY created_at DESC
+        db.Index('ix_order_user_id_created_at', 'user_id', 'created_at'),
+        # Panel spedycji: WHERE status = ? ORDER BY created_at DESC, id DESC
+        db.Index('ix_order_status_created_at', 'status', 'created_at'),
+        # Listy bez filtra, paginacja kursorowa i zakresy dat w statystykach
+        db.Index('ix_order_created_at', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
@@ -87,15 +120,73 @@ class Order(db.Model):
     # Lista pozycji na zamówieniu
     items = db.relationship('OrderItem', back_populates='order', lazy=True, cascade="all, delete-orphan")
 
-    def to_dict(self):
+    # Sumy z pozycji, utrzymywane przy zapisie (create_order / wysyłka),
+    # żeby statusy, listy i statystyki nie musiały czytać wszystkich pozycji.
+    # line_count = 0 oznacza sumy jeszcze nieprzeliczone (np. zamówienia sprzed
+    # dodania kolumn) - uzupełnia je start aplikacji i wysyłka (rebuild_totals).
+    # Przeliczenie od zera: flask rebuild-order-totals
+    total_quantity = db.Column(db.Integer, nullable=False, default=0, server_default=text('0'))
+    total_shipped = db.Column(db.Integer, nullable=False, default=0, server_default=text('0'))
+    total_value = db.Column(db.Float, nullable=False, default=0.0, server_default=text('0'))
+    line_count = db.Column(db.Integer, nullable=False, default=0, server_default=text('0'))
+
+    # Wersja wiersza (blokada optymistyczna): ORM dopisuje "WHERE version = ?" do UPDATE,
+    # a wysyłka podbija ją warunkowym UPDATE (app/shipping.py)
+    version = db.Column(db.Integer, nullable=False, server_default=text('1'))
+    __mapper_args__ = {"version_id_col": version}
+
+    @staticmethod
+    def rebuild_totals(order_ids=None, only_missing=False):
+        """
+        Przelicza sumy z pozycji jednym UPDATE w bieżącej transakcji (commit robi wywołujący).
+        order_ids ogranicza zakres do podanych zamówień, only_missing - do zamówień
+        z nieprzeliczonymi sumami (line_count = 0). Zwraca liczbę zmienionych zamówień.
+        """
+        def items_sum(expression):
+            return db.select(db.func.coalesce(db.func.sum(expression), 0)).where(
+                OrderItem.order_id == Order.id
+            ).scalar_subquery()
+
+        query = Order.query
+        if order_ids is not None:
+            query = query.filter(Order.id.in_(order_ids))
+        if only_missing:
+            query = query.filter(Order.line_count == 0)
+        return query.update({
+            "total_quantity": items_sum(OrderItem.quantity),
+            "total_shipped": items_sum(OrderItem.shipped_quantity),
+            "total_value": items_sum(db.func.coalesce(OrderItem.price_at_order, 0) * OrderItem.quantity),
+            "line_count": items_sum(1)
+        }, synchronize_session=False)
+
+    def recalculate_totals(self):
+        """Przelicza sumy na podstawie pozycji (self.items)."""
+        self.total_quantity = sum(item.quantity for item in self.items)
+        self.total_shipped = sum(item.shipped_quantity or 0 for item in self.items)
+        self.total_value = sum((item.price_at_order or 0) * item.quantity for item in self.items)
+        self.line_count = len(self.items)
+
+    def totals_dict(self):
         return {
+            "total_quantity": self.total_quantity,
+            "total_shipped": self.total_shipped,
+            "total_value": self.total_value,
+            "line_count": self.line_count
+        }
+
+    def to_dict(self, include_items=True):
+        data = {
             "id": self.id,
             "created_at": self.created_at.isoformat(),
             "status": self.status,
             "notes": self.notes,
             "user_id": self.user_id,
-            "items": [item.to_dict() for item in self.items]
+            "version": self.version,
+            **self.totals_dict()
         }
+        if include_items:
+            data["items"] = [item.to_dict() for item in self.items]
+        return data
 
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -104,12 +195,15 @@ class OrderItem(db.Model):
     # --- NOWA KOLUMNA ---
     # Dodajemy kolumnę śledzącą, ile sztuk z tej pozycji już wysłano.
     shipped_quantity = db.Column(db.Integer, nullable=False, server_default=text('0'))
+    # Wersja wiersza - zmienia się przy każdej wysyłce tej pozycji (blokada optymistyczna)
+    version = db.Column(db.Integer, nullable=False, server_default=text('1'))
+    __mapper_args__ = {"version_id_col": version}
     
     # Reszta pól pozostaje bez zmian
     variant_id = db.Column(db.Integer, db.ForeignKey('product_variant.id'), nullable=False)
     variant = db.relationship('ProductVariant')
     
-    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False, index=True)
     order = db.relationship('Order', back_populates='items')
     
     product_name = db.Column(db.String(100))
@@ -124,6 +218,7 @@ class OrderItem(db.Model):
             # --- DODANE DO ZWROTU ---
             # Frontend musi wiedzieć, ile wysłano
             "shipped_quantity": self.shipped_quantity, 
+            "version": self.version,
             
             "variant_id": self.variant_id,
             "order_id": self.order_id,
@@ -137,9 +232,14 @@ class PushSubscription(db.Model):
     
     # Przechowuje cały obiekt subskrypcji (endpoint, klucze) jako JSON
     subscription_json = db.Column(db.Text, nullable=False)
+
+    # Znormalizowany endpoint i jego skrót SHA-256 (unikalny indeks).
+    # Po skrócie szukamy subskrypcji zamiast porównywać cały JSON.
+    endpoint = db.Column(db.Text, nullable=True)
+    endpoint_hash = db.Column(db.String(64), nullable=True, unique=True, index=True)
     
     # KLUCZOWE: Łączymy subskrypcję z kontem użytkownika
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     user = db.relationship('User', backref=db.backref('push_subscriptions', lazy=True, cascade="all, delete-orphan"))
     
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
@@ -152,18 +252,46 @@ class PushSubscription(db.Model):
         }
     
     def get_endpoint(self):
-        # Bezpiecznie wyciągamy sam endpoint z JSONa do podglądu
+        # Endpoint mamy w osobnej kolumnie; JSON parsujemy tylko dla starych wierszy
+        if self.endpoint:
+            return self.endpoint
         try:
-            import json
             return json.loads(self.subscription_json).get('endpoint', 'Błędny format')
         except:
             return 'Błędny format'
+
+    @staticmethod
+    def normalize_endpoint(endpoint):
+        """Ujednolica URL endpointu (schemat i host małymi literami, bez spacji)."""
+        parts = urlsplit(endpoint.strip())
+        return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, parts.query, parts.fragment))
+
+    @staticmethod
+    def hash_endpoint(endpoint):
+        normalized = PushSubscription.normalize_endpoint(endpoint)
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def set_subscription(self, subscription_data):
+        """
+        Zapisuje dane subskrypcji z przeglądarki: JSON w stałej kolejności kluczy
+        oraz znormalizowany endpoint i jego skrót.
+        """
+        self.endpoint = self.normalize_endpoint(subscription_data['endpoint'])
+        self.endpoint_hash = self.hash_endpoint(subscription_data['endpoint'])
+        self.subscription_json = json.dumps(subscription_data, sort_keys=True)
         
 class Shipment(db.Model):
     """
     Reprezentuje pojedynczą, fizyczną wysyłkę (paczkę).
     Jedno zamówienie (Order) może mieć wiele wysyłek (Shipment).
     """
+    __table_args__ = (
+        # Historia wysyłek: WHERE order_id = ? ORDER BY created_at DESC
+        db.Index('ix_shipment_order_id_created_at', 'order_id', 'created_at'),
+        # Eksport wysyłek z zakresu dat (app/exports.py)
+        db.Index('ix_shipment_created_at', 'created_at'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
     
@@ -199,11 +327,11 @@ class ShipmentItem(db.Model):
     quantity_shipped = db.Column(db.Integer, nullable=False)
     
     # Do jakiej paczki należy ta pozycja
-    shipment_id = db.Column(db.Integer, db.ForeignKey('shipment.id'), nullable=False)
+    shipment_id = db.Column(db.Integer, db.ForeignKey('shipment.id'), nullable=False, index=True)
     shipment = db.relationship('Shipment', back_populates='items')
     
     # Do jakiej pozycji GŁÓWNEGO ZAMÓWIENIA się odnosi
-    order_item_id = db.Column(db.Integer, db.ForeignKey('order_item.id'), nullable=False)
+    order_item_id = db.Column(db.Integer, db.ForeignKey('order_item.id'), nullable=False, index=True)
     order_item = db.relationship('OrderItem', backref=db.backref('shipment_items', lazy=True))
 
     def to_dict(self):
@@ -220,6 +348,13 @@ class Notification(db.Model):
     """
     Model do przechowywania powiadomień wewnętrznych (ikona dzwonka).
     """
+    __table_args__ = (
+        # Lista (nieprzeczytane na górze) i licznik nieprzeczytanych jednym indeksem
+        db.Index('ix_notification_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        # Zmiany od kursora: WHERE user_id = ? AND seq > ?
+        db.Index('ix_notification_user_id_seq', 'user_id', 'seq'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     
     # Do kogo należy to powiadomienie
@@ -234,14 +369,117 @@ class Notification(db.Model):
     
     is_read = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # Numer zmiany (User.notification_seq), przy której powiadomienie powstało lub zostało przeczytane
+    seq = db.Column(db.Integer, nullable=False, default=0, server_default=text('0'))
 
     def to_dict(self):
         return {
             "id": self.id,
+            "seq": self.seq,
             "user_id": self.user_id,
             "title": self.title,
             "body": self.body,
             "link_url": self.link_url,
             "is_read": self.is_read,
             "created_at": self.created_at.isoformat()
-        }
\ No newline at end of file
+        }
+
+
+class NotificationStreamTicket(db.Model):
+    """
+    Jednorazowy, krótko ważny bilet do otwarcia strumienia SSE powiadomień.
+    EventSource nie wysyła nagłówków, a adres trafia do logów serwera -
+    dlatego w adresie jest bilet, a nie token JWT. W bazie trzymamy tylko
+    jego skrót, więc bilet działa w każdym workerze.
+    """
+    __table_args__ = (
+        db.Index('ix_notification_stream_ticket_expires_at', 'expires_at'),
+    )
+
+    token_hash = db.Column(db.String(64), primary_key=True) # SHA-256 biletu
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class BackgroundJob(db.Model):
+    """
+    Zadanie w tle zapisane w bazie (np. wysyłka e-maila z PDF-em).
+    Zadania dodajemy w tej samej transakcji co zmianę, której dotyczą,
+    a wykonują je wątki robocze z app/jobs.py - dopiero po commit-cie.
+    """
+    __table_args__ = (
+        db.Index('ix_background_job_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Nazwa handlera zarejestrowanego przez @job_handler
+    kind = db.Column(db.String(50), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}') # JSON
+
+    # Status: 'queued', 'running', 'done', 'failed'
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # Najwcześniejszy moment kolejnej próby (backoff po błędzie)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "last_error": self.last_error,
+            "run_at": self.run_at.isoformat() if self.run_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class PdfExport(db.Model):
+    """
+    Postęp zbiorczego eksportu PDF do ZIP (app/pdf_export.py). W bazie, a nie
+    w pamięci procesu - o postęp można pytać dowolny worker.
+    """
+    __table_args__ = (
+        db.Index('ix_pdf_export_started_at', 'started_at'),
+    )
+
+    id = db.Column(db.String(64), primary_key=True) # export_id (podany przez klienta lub UUID)
+    total = db.Column(db.Integer, nullable=False)
+    done = db.Column(db.Integer, nullable=False, default=0)
+    from_cache = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    # Status: 'running', 'done', 'cancelled'
+    status = db.Column(db.String(20), nullable=False, default='running')
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+# --- AGREGATY DZIENNE (statystyki kokpitu, app/rollups.py) ---
+# Aktualizowane przyrostowo przy zapisie zamówienia, przebudowa: flask rebuild-rollups
+
+class DailyRevenue(db.Model):
+    """Liczba zamówień, sztuk i wartość zamówień z jednego dnia."""
+    day = db.Column(db.Date, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    item_quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class DailyProductQuantity(db.Model):
+    """Zamówione sztuki danego produktu (wg nazwy z zamówienia) w danym dniu."""
+    day = db.Column(db.Date, primary_key=True)
+    product_name = db.Column(db.String(100), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyClientOrders(db.Model):
+    """Liczba zamówień klienta w danym dniu."""
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,197 @@
+# /backend/app/notify_stream.py
+"""
+Powiadomienia "dzwonka" na żywo (Server-Sent Events).
+
+- NotificationHub to prosta szyna publikuj/subskrybuj w obrębie procesu:
+  każde otwarte połączenie SSE ma własną kolejkę, a _create_notification()
+  publikuje do kolejek danego użytkownika zaraz po zapisie.
+- Co NOTIFICATION_STREAM_HEARTBEAT sekund wysyłamy komentarz (heartbeat)
+  i sprawdzamy w bazie, czy nie pojawiło się coś nowego. Dzięki temu
+  docierają też powiadomienia utworzone w innym procesie (np. innym
+  workerze gunicorna) oraz te, które nie zmieściły się w kolejce.
+- Identyfikator zdarzenia = ID powiadomienia. Po zerwaniu połączenia klient
+  podaje Last-Event-ID (nagłówek lub ?last_event_id=), a my doręczamy
+  wszystko, co nowsze.
+- Strumień otwiera się jednorazowym biletem (issue_stream_ticket), a nie
+  tokenem JWT w adresie - adresy żądań trafiają do logów serwera.
+"""
+import datetime
+import hashlib
+import json
+import queue
+import secrets
+import threading
+import time
+from .models import db, Notification, NotificationStreamTicket
+
+# Ile zdarzeń może czekać na jedno połączenie (nadmiar dociągnie kontrola w bazie)
+_QUEUE_SIZE = 100
+# Maksymalna liczba powiadomień wysyłanych przy wznowieniu / jednej kontroli w bazie
+_REPLAY_LIMIT = 50
+# Ważność biletu do strumienia (sekundy) - klient pobiera go tuż przed połączeniem
+STREAM_TICKET_TTL = 60
+
+
+class NotificationHub:
+    """Rejestr otwartych strumieni: user_id -> zbiór kolejek."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def subscribe(self, user_id):
+        subscriber = queue.Queue(maxsize=_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.setdefault(user_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, event, data, event_id=None):
+        """Wrzuca zdarzenie do wszystkich strumieni użytkownika (bez blokowania)."""
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait((event, data, event_id))
+            except queue.Full:
+                pass # Wolny klient - powiadomienie dotrze przy kontroli w bazie
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+hub = NotificationHub()
+
+
+def publish_notification(notification):
+    """Publikuje zapisane (po commit-cie) powiadomienie do strumieni odbiorcy."""
+    hub.publish(notification.user_id, 'notification', notification.to_dict(), notification.id)
+
+
+def publish_all_read(user_id):
+    """Informuje inne karty użytkownika, że wszystko zostało przeczytane."""
+    hub.publish(user_id, 'read', {"unread_count": 0})
+
+
+def _ticket_hash(ticket):
+    return hashlib.sha256(ticket.encode('utf-8')).hexdigest()
+
+
+def issue_stream_ticket(user_id):
+    """
+    Tworzy bilet do strumienia (w bieżącej transakcji - commit robi wywołujący)
+    i zwraca jego treść. Przy okazji usuwa wygasłe bilety.
+    """
+    now = datetime.datetime.utcnow()
+    NotificationStreamTicket.query.filter(
+        NotificationStreamTicket.expires_at <= now
+    ).delete(synchronize_session=False)
+
+    ticket = secrets.token_urlsafe(32)
+    db.session.add(NotificationStreamTicket(
+        token_hash=_ticket_hash(ticket),
+        user_id=user_id,
+        expires_at=now + datetime.timedelta(seconds=STREAM_TICKET_TTL)
+    ))
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """
+    Zużywa bilet i zwraca ID użytkownika albo None (nieznany, wygasły lub już użyty).
+    Bilet usuwamy warunkowym DELETE - z dwóch równoległych prób udaje się jedna.
+    """
+    token_hash = _ticket_hash(ticket)
+    now = datetime.datetime.utcnow()
+    try:
+        user_id = db.session.query(NotificationStreamTicket.user_id).filter(
+            NotificationStreamTicket.token_hash == token_hash,
+            NotificationStreamTicket.expires_at > now
+        ).scalar()
+        if user_id is None:
+            return None
+        deleted = NotificationStreamTicket.query.filter(
+            NotificationStreamTicket.token_hash == token_hash
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return user_id if deleted == 1 else None
+
+
+def _format_event(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _notifications_after(user_id, last_id):
+    """Powiadomienia nowsze niż last_id (rosnąco po ID). Zwalnia połączenie z bazą."""
+    try:
+        return [n.to_dict() for n in Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.id > last_id
+        ).order_by(Notification.id).limit(_REPLAY_LIMIT)]
+    finally:
+        db.session.remove()
+
+
+def _latest_notification_id(user_id):
+    try:
+        return db.session.query(db.func.max(Notification.id)).filter(
+            Notification.user_id == user_id
+        ).scalar() or 0
+    finally:
+        db.session.remove()
+
+
+def notification_stream(user_id, last_event_id=None, heartbeat=15, max_seconds=300):
+    """
+    Generator strumienia SSE dla użytkownika. Po 'max_seconds' kończymy
+    połączenie (zwalniając wątek serwera) - klient wznawia je z nowym
+    biletem i Last-Event-ID.
+    """
+    subscriber = hub.subscribe(user_id)
+    try:
+        # Podpowiedź dla EventSource: po rozłączeniu wznów za 3 s
+        yield "retry: 3000\n\n"
+
+        if last_event_id is not None:
+            last_id = last_event_id
+            for item in _notifications_after(user_id, last_id):
+                last_id = item["id"]
+                yield _format_event('notification', item, item["id"])
+        else:
+            last_id = _latest_notification_id(user_id)
+
+        deadline = time.monotonic() + max_seconds
+        while time.monotonic() < deadline:
+            try:
+                event, data, event_id = subscriber.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ": heartbeat\n\n"
+                # Zapasowa kontrola w bazie (inne procesy, przepełniona kolejka)
+                for item in _notifications_after(user_id, last_id):
+                    last_id = item["id"]
+                    yield _format_event('notification', item, item["id"])
+                continue
+
+            if event_id is not None:
+                if event_id <= last_id:
+                    continue # Już wysłane (np. przez kontrolę w bazie)
+                last_id = event_id
+            yield _format_event(event, data, event_id)
+    finally:
+        hub.unsubscribe(user_id, subscriber)
@@ -0,0 +1,60 @@
+# /backend/app/pagination.py
+"""
+Pomocnicze funkcje do paginacji kursorowej (keyset).
+Kursor to zakodowana (base64) lista wartości klucza sortowania
+ostatniego elementu strony, np. [id] albo [created_at, id].
+"""
+import base64
+import datetime
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values):
+    """Koduje wartości klucza sortowania do nieprzezroczystego stringa."""
+    serializable = [
+        {"dt": value.isoformat()} if isinstance(value, datetime.datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(serializable, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, expected_length):
+    """
+    Dekoduje kursor z encode_cursor().
+    Rzuca ValueError, jeśli kursor jest uszkodzony.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError("Nieprawidłowy kursor")
+
+    if not isinstance(values, list) or len(values) != expected_length:
+        raise ValueError("Nieprawidłowy kursor")
+
+    decoded = []
+    for value in values:
+        if isinstance(value, dict) and 'dt' in value:
+            try:
+                value = datetime.datetime.fromisoformat(value['dt'])
+            except (TypeError, ValueError):
+                raise ValueError("Nieprawidłowy kursor")
+        decoded.append(value)
+    return decoded
+
+
+def parse_page_size(raw_limit, default=DEFAULT_PAGE_SIZE):
+    """Zamienia parametr 'limit' z zapytania na liczbę z zakresu 1..MAX_PAGE_SIZE."""
+    if raw_limit is None or raw_limit == '':
+        return default
+    try:
+        limit = int(raw_limit)
+    except (TypeError, ValueError):
+        raise ValueError("Parametr 'limit' musi być liczbą")
+    if limit <= 0:
+        raise ValueError("Parametr 'limit' musi być większy od 0")
+    return min(limit, MAX_PAGE_SIZE)
@@ -0,0 +1,136 @@
+# /backend/app/passwords.py
+"""
+Haszowanie i sprawdzanie haseł (bcrypt) przez ograniczoną pulę wątków.
+
+- bcrypt zajmuje CPU (przy koszcie 12 ok. 0,2-0,3 s). Gdy wszyscy klienci
+  logują się rano naraz, bez limitu każdy wątek serwera liczyłby hasz
+  jednocześnie. Pula ogranicza równoległe obliczenia, a reszta żądań
+  czeka w kolejce. Każdy worker gunicorna ma własną pulę, więc jej rozmiar
+  (PASSWORD_HASH_WORKERS) domyślnie to rdzenie / liczba workerów, min. 1.
+- Kolejka też ma limit (PASSWORD_HASH_MAX_QUEUE). Po jego przekroczeniu
+  od razu zgłaszamy PasswordHashBusy (HTTP 503 z Retry-After), zamiast
+  trzymać wątki serwera do upływu timeoutu.
+- Koszt bcrypt ustawia BCRYPT_ROUNDS. Hasz z innym kosztem jest
+  przeliczany przy najbliższym udanym logowaniu (needs_rehash), bez
+  masowego resetowania haseł.
+- password_hash_stats() podaje głębokość kolejki i czasy (/api/health).
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import bcrypt
+from flask import current_app, has_app_context
+
+DEFAULT_ROUNDS = 12
+
+
+class PasswordHashBusy(Exception):
+    """Zbyt wiele haszowań w kolejce - klient powinien spróbować za chwilę (HTTP 503)."""
+
+
+_lock = threading.Lock()
+_executor = None
+_stats = {
+    "queued": 0,     # czekają na wolny wątek
+    "running": 0,    # liczone teraz
+    "completed": 0,
+    "rejected": 0,
+    "max_queued": 0,
+    "wait_seconds": 0.0,
+    "hash_seconds": 0.0,
+}
+
+
+def _config(key, default):
+    if has_app_context():
+        return current_app.config.get(key, default)
+    return default
+
+
+def bcrypt_rounds():
+    return _config('BCRYPT_ROUNDS', DEFAULT_ROUNDS)
+
+
+def _pool_size():
+    return _config('PASSWORD_HASH_WORKERS', 0) or 1
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=_pool_size(), thread_name_prefix='bcrypt')
+        return _executor
+
+
+def _run(fn, *args):
+    """Wykonuje fn w puli i czeka na wynik. Rzuca PasswordHashBusy przy pełnej kolejce."""
+    executor = _get_executor()
+    max_queue = _config('PASSWORD_HASH_MAX_QUEUE', 64)
+    submitted_at = time.perf_counter()
+
+    with _lock:
+        if _stats["queued"] >= max_queue:
+            _stats["rejected"] += 1
+            raise PasswordHashBusy("Serwer jest przeciążony logowaniami. Spróbuj ponownie za chwilę.")
+        _stats["queued"] += 1
+        _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+
+    def task():
+        started_at = time.perf_counter()
+        with _lock:
+            _stats["queued"] -= 1
+            _stats["running"] += 1
+            _stats["wait_seconds"] += started_at - submitted_at
+        try:
+            return fn(*args)
+        finally:
+            with _lock:
+                _stats["running"] -= 1
+                _stats["completed"] += 1
+                _stats["hash_seconds"] += time.perf_counter() - started_at
+
+    return executor.submit(task).result()
+
+
+def hash_password(password):
+    """Hasz bcrypt (str) z kosztem BCRYPT_ROUNDS."""
+    salt = bcrypt.gensalt(rounds=bcrypt_rounds())
+    return _run(bcrypt.hashpw, password.encode('utf-8'), salt).decode('utf-8')
+
+
+def verify_password(password, password_hash):
+    if not password or not password_hash:
+        return False
+    try:
+        return _run(bcrypt.checkpw, password.encode('utf-8'), password_hash.encode('utf-8'))
+    except ValueError:
+        return False # Uszkodzony / nie-bcryptowy hasz w bazie
+
+
+def hash_rounds(password_hash):
+    """Koszt zapisany w haszu bcrypt ('$2b$12$...' -> 12) albo None."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    return hash_rounds(password_hash) != bcrypt_rounds()
+
+
+def password_hash_stats():
+    with _lock:
+        stats = dict(_stats)
+    completed = stats.pop("completed")
+    wait_seconds = stats.pop("wait_seconds")
+    hash_seconds = stats.pop("hash_seconds")
+    stats.update({
+        "workers": _pool_size(),
+        "rounds": bcrypt_rounds(),
+        "completed": completed,
+        "avg_wait_ms": round(1000 * wait_seconds / completed, 1) if completed else None,
+        "avg_hash_ms": round(1000 * hash_seconds / completed, 1) if completed else None,
+    })
+    return stats
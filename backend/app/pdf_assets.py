@@ -0,0 +1,172 @@
+# /backend/app/pdf_assets.py
+"""
+Rejestr zasobów statycznych dla PDF-ów (logotypy, czcionki) - jeden na proces.
+
+Obrazy z app/static/img są wczytywane, sprawdzane (Pillow) i dekodowane raz,
+przy starcie (preload_pdf_assets, wywoływane w wsgi.py przed fork()),
+albo przy pierwszym użyciu. Potem:
+- xhtml2pdf dostaje z link_callback gotowe bajty pliku zamiast ścieżki,
+  więc nie sprawdzamy dysku ani nie czytamy pliku przy każdym renderze;
+- backend 'canvas' dostaje obraz już zakodowany do strumienia PDF
+  i zarejestrowane czcionki TTF.
+
+Trafienia i chybienia liczymy w pdf_asset_stats() (widoczne w /api/health).
+Po podmianie pliku w static/ trzeba zrestartować proces (albo clear()).
+"""
+import copy
+import io
+import os
+import threading
+from PIL import Image
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase import pdfdoc, pdfmetrics
+from reportlab.pdfgen.canvas import _digester
+from reportlab.pdfbase.ttfonts import TTFont
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif')
+
+
+class _Image:
+    """
+    Zawartość pliku + zdekodowany obraz dla ReportLab.
+
+    Najdroższe przy rysowaniu jest zakodowanie obrazu do strumienia PDF
+    (kompresja, ASCII85, maska przezroczystości). Robimy to raz, a gotowy
+    obiekt XObject wstawiamy do każdego nowego dokumentu (register_in).
+    """
+
+    def __init__(self, data):
+        self.data = data
+        self.reader = ImageReader(io.BytesIO(data))
+        self.size = self.reader.getSize()
+        # Ta sama nazwa, którą wyliczy canvas.drawImage(..., mask='auto')
+        raw = self.reader.getRGBData()
+        mask = self.reader._dataA.getRGBData() if self.reader._dataA else b'auto'
+        self.xobject = pdfdoc.PDFImageXObject(_digester(raw + mask), self.reader, mask='auto')
+
+    def register_in(self, canvas):
+        """
+        Dodaje zakodowany obraz do dokumentu (tak jak robi to canvas.drawImage
+        przy pierwszym użyciu) - drawImage znajdzie go i nie będzie kodował od nowa.
+        ReportLab nadaje obiektom nazwy przy rejestracji, więc każdy dokument
+        dostaje własne płytkie kopie (strumień danych jest współdzielony).
+        """
+        document = canvas._doc
+        name = self.xobject.name
+        registered_name = document.getXObjectName(name)
+        if document.idToObject.get(registered_name) is not None:
+            return
+        image_object = copy.copy(self.xobject)
+        smask = image_object.__dict__.pop('_smask', None)
+        canvas._setXObjects(image_object)
+        document.Reference(image_object, registered_name)
+        document.addForm(name, image_object)
+        if smask is not None:
+            mask_name = document.getXObjectName(smask.name)
+            if document.idToObject.get(mask_name) is None:
+                smask = copy.copy(smask)
+                canvas._setXObjects(smask)
+                image_object.smask = document.Reference(smask, mask_name)
+            else:
+                image_object.smask = pdfdoc.PDFObjectReference(mask_name)
+
+
+class AssetRegistry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._images = {}  # ścieżka bezwzględna -> _Image lub None (brak / uszkodzony plik)
+        self._fonts = {}   # (ścieżka, ścieżka_pogrubiona) -> (nazwa, nazwa_pogrubiona)
+        self._hits = 0
+        self._misses = 0
+
+    def _load_image(self, path):
+        if not os.path.isfile(path):
+            print(f"BŁĄD PDF: Nie znaleziono pliku statycznego: {path}")
+            return None
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as image:
+                image.verify()
+            return _Image(data)
+        except Exception as e:
+            print(f"BŁĄD PDF: Nieprawidłowy obraz {path}: {e}")
+            return None
+
+    def image(self, path):
+        """_Image dla pliku (wczytany raz) albo None, jeśli plik nie istnieje lub jest uszkodzony."""
+        path = os.path.abspath(path)
+        with self._lock:
+            if path in self._images:
+                self._hits += 1
+                return self._images[path]
+            self._misses += 1
+        loaded = self._load_image(path)
+        with self._lock:
+            return self._images.setdefault(path, loaded)
+
+    def fonts(self, regular, bold):
+        """Rejestruje parę czcionek TTF w ReportLab (raz na proces) i zwraca ich nazwy."""
+        key = (regular, bold)
+        with self._lock:
+            if key in self._fonts:
+                self._hits += 1
+                return self._fonts[key]
+            self._misses += 1
+            index = len(self._fonts)
+            names = (f'PdfSans{index}', f'PdfSans{index}-Bold')
+            pdfmetrics.registerFont(TTFont(names[0], regular))
+            pdfmetrics.registerFont(TTFont(names[1], bold))
+            self._fonts[key] = names
+            return names
+
+    def preload_images(self, directory):
+        """Wczytuje wszystkie obrazy z katalogu (rekurencyjnie). Zwraca ich liczbę."""
+        count = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.abspath(os.path.join(root, name))
+                    loaded = self._load_image(path)
+                    with self._lock:
+                        self._images[path] = loaded
+                    count += 1
+        return count
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "images": sum(1 for image in self._images.values() if image is not None),
+                "image_bytes": sum(len(image.data) for image in self._images.values() if image is not None),
+                "fonts": len(self._fonts),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None
+            }
+
+    def clear(self):
+        """Zapomina obrazy i liczniki (zarejestrowane czcionki zostają w ReportLab)."""
+        with self._lock:
+            self._images.clear()
+            self._hits = 0
+            self._misses = 0
+
+
+assets = AssetRegistry()
+
+
+def preload_pdf_assets(app):
+    """Ładuje obrazy z static/img i czcionki PDF, zanim przyjdzie pierwsze żądanie."""
+    from .pdf_render import font_paths
+    with app.app_context():
+        count = assets.preload_images(os.path.join(app.static_folder, 'img'))
+        regular, bold = font_paths()
+        if regular is not None:
+            assets.fonts(regular, bold)
+    return count
+
+
+def pdf_asset_stats():
+    return assets.stats()
@@ -0,0 +1,217 @@
+# /backend/app/pdf_cache.py
+"""
+Dyskowy cache wygenerowanych PDF-ów z potwierdzeniami zamówień.
+
+Plik jest adresowany treścią: nazwa = ID zamówienia + skrót (hash) wszystkich
+danych, które trafiają do PDF-a. Zmiana zamówienia lub danych klienta daje
+nowy skrót, więc nieaktualny plik nigdy nie zostanie podany. Stare pliki
+usuwa invalidate_orders() oraz limit rozmiaru (najdawniej używane idą pierwsze).
+
+Katalog jest wspólny dla wszystkich workerów. Rozmiar i kolejność LRU
+(data modyfikacji = ostatnie użycie) odczytujemy skanem katalogu, ale nie
+przy każdym zapisie: proces dolicza zapisane bajty do sumy z ostatniego
+skanu i skanuje ponownie dopiero, gdy suma przekroczy limit albo minie
+_SCAN_INTERVAL sekund (zapisy innych workerów). Po przekroczeniu limitu
+usuwamy pliki do _EVICT_TARGET limitu, więc kolejne zapisy (np. eksport
+tysięcy PDF-ów) nie skanują katalogu za każdym razem.
+Plik może zniknąć (usunięty przez inny proces) między lookup_order_pdf()
+a otwarciem - wywołujący obsługuje wtedy FileNotFoundError i renderuje
+PDF ponownie.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from flask import current_app
+from .models import db, Order
+
+# Podbij, jeśli zmieni się szablon lub sposób renderowania PDF
+PDF_CACHE_FORMAT = 1
+# Po przekroczeniu limitu zostawiamy tyle (ułamek limitu) - zapas do kolejnego skanu
+_EVICT_TARGET = 0.9
+# Najdłuższa przerwa między skanami katalogu (sekundy)
+_SCAN_INTERVAL = 60
+
+_lock = threading.Lock()
+_usage = {}  # katalog -> (szacowany rozmiar w bajtach, time.monotonic() ostatniego skanu)
+
+
+def _cache_dir():
+    return current_app.config.get('PDF_CACHE_DIR') or os.path.join(current_app.instance_path, 'pdf_cache')
+
+
+def _max_bytes():
+    return current_app.config.get('PDF_CACHE_MAX_BYTES', 256 * 1024 * 1024)
+
+
+def _scan():
+    """Pliki cache jako lista (data_modyfikacji, nazwa, rozmiar)."""
+    directory = _cache_dir()
+    os.makedirs(directory, exist_ok=True)
+    files = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.name.endswith('.pdf'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, entry.name, stat.st_size))
+    return files
+
+
+def order_content_digest(order):
+    """Skrót wszystkich danych zamówienia widocznych w PDF-ie."""
+    user = order.user
+    fingerprint = {
+        "format": PDF_CACHE_FORMAT,
+        "renderer": current_app.config.get('PDF_RENDERER', 'xhtml2pdf'),
+        "order": [order.id, order.created_at.isoformat() if order.created_at else None, order.notes],
+        "user": [user.username, user.email, user.first_name, user.last_name] if user else None,
+        "items": sorted(
+            [item.id, item.product_name, item.variant_size, item.quantity, item.price_at_order]
+            for item in order.items
+        )
+    }
+    raw = json.dumps(fingerprint, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(raw).hexdigest()[:32]
+
+
+def _file_name(order_id, digest):
+    return f"order_{order_id}_{digest}.pdf"
+
+
+def _evict(max_bytes):
+    """
+    Skanuje katalog i, jeśli przekracza limit, usuwa najdawniej używane pliki
+    do _EVICT_TARGET limitu. Zwraca rozmiar katalogu po sprzątaniu.
+    """
+    directory = _cache_dir()
+    files = sorted(_scan())
+    total_bytes = sum(size for _, _, size in files)
+    if total_bytes <= max_bytes:
+        return total_bytes
+
+    target_bytes = int(max_bytes * _EVICT_TARGET)
+    for _, name, size in files:
+        if total_bytes <= target_bytes:
+            break
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass # Usunął go już inny proces
+        except OSError as e:
+            print(f"OSTRZEŻENIE: Nie udało się usunąć pliku z cache PDF {name}: {e}")
+            continue
+        total_bytes -= size
+    return total_bytes
+
+
+def _note_stored(size):
+    """Dolicza zapisany plik do sumy procesu; skanuje katalog tylko po przekroczeniu limitu lub co _SCAN_INTERVAL."""
+    directory = _cache_dir()
+    max_bytes = _max_bytes()
+    now = time.monotonic()
+    with _lock:
+        estimate, scanned_at = _usage.get(directory, (None, 0.0))
+        if estimate is not None and estimate + size <= max_bytes and now - scanned_at < _SCAN_INTERVAL:
+            _usage[directory] = (estimate + size, scanned_at)
+            return
+        # Czas skanu ustawiamy od razu - równoległe zapisy nie zaczną drugiego skanu z powodu interwału
+        _usage[directory] = ((estimate or 0) + size, now)
+
+    total_bytes = _evict(max_bytes)
+    with _lock:
+        _usage[directory] = (total_bytes, now)
+
+
+def lookup_order_pdf(order):
+    """Zwraca (ścieżka_do_pliku_lub_None, etag) - bez renderowania."""
+    digest = order_content_digest(order)
+    path = os.path.join(_cache_dir(), _file_name(order.id, digest))
+    try:
+        os.utime(path) # Data modyfikacji = ostatnie użycie (kolejność LRU)
+    except FileNotFoundError:
+        return None, digest
+    return path, digest
+
+
+def store_order_pdf(order, pdf_data, digest=None):
+    """Zapisuje wyrenderowany PDF w cache. Zwraca (ścieżka_do_pliku, etag)."""
+    digest = digest or order_content_digest(order)
+    path = os.path.join(_cache_dir(), _file_name(order.id, digest))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf_data)
+    os.replace(tmp_path, path)
+
+    _note_stored(len(pdf_data))
+    return path, digest
+
+
+def cached_order_pdf(order, render):
+    """
+    Zwraca (ścieżka_do_pliku, etag) dla PDF-a zamówienia.
+    'render' to funkcja bez argumentów zwracająca bajty PDF - wołana tylko przy braku w cache.
+    Plik może zostać usunięty przez inny proces, zanim go otworzymy (FileNotFoundError).
+    """
+    path, digest = lookup_order_pdf(order)
+    if path is not None:
+        return path, digest
+
+    # Renderujemy tylko przy braku w cache - to najdroższy krok
+    return store_order_pdf(order, render(), digest)
+
+
+def read_order_pdf(order):
+    """Zwraca (bajty_PDF_lub_None, etag) z cache - bez renderowania."""
+    path, digest = lookup_order_pdf(order)
+    if path is None:
+        return None, digest
+    try:
+        with open(path, 'rb') as f:
+            return f.read(), digest
+    except FileNotFoundError:
+        return None, digest # Usunięty przez inny proces w międzyczasie
+
+
+def cached_order_pdf_bytes(order, render):
+    """Jak cached_order_pdf(), ale zwraca bajty (np. do załącznika e-mail)."""
+    pdf_data, digest = read_order_pdf(order)
+    if pdf_data is None:
+        pdf_data = render()
+        store_order_pdf(order, pdf_data, digest)
+    return pdf_data
+
+
+def invalidate_orders(order_ids):
+    """Usuwa z cache wszystkie wersje PDF-ów podanych zamówień."""
+    prefixes = tuple(f"order_{order_id}_" for order_id in set(order_ids))
+    if not prefixes:
+        return
+    directory = _cache_dir()
+    if not os.path.isdir(directory):
+        return
+
+    for name in os.listdir(directory):
+        if not name.startswith(prefixes):
+            continue
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+
+
+def invalidate_user_orders(user_id):
+    """Usuwa z cache PDF-y wszystkich zamówień klienta (np. po zmianie jego danych)."""
+    order_ids = [order_id for (order_id,) in db.session.query(Order.id).filter(Order.user_id == user_id)]
+    invalidate_orders(order_ids)
+
+
+def cache_stats():
+    files = _scan()
+    return {"files": len(files), "bytes": sum(size for _, _, size in files), "max_bytes": _max_bytes()}
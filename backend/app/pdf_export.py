@@ -0,0 +1,251 @@
+# /backend/app/pdf_export.py
+"""
+Zbiorczy eksport potwierdzeń zamówień (PDF) jako archiwum ZIP.
+
+- PDF-y renderuje pula procesów, więc eksport nie jest ograniczony przez
+  GIL. Pula należy do workera gunicorna, dlatego domyślnie ma tylko jego
+  część rdzeni (PDF_EXPORT_PROCESSES = rdzenie / liczba workerów, min. 1).
+- Odpowiedź zajmuje wątek serwera do końca pobierania - liczbę równoczesnych
+  eksportów na worker ogranicza EXPORT_STREAM_MAX_CONNECTIONS (gunicorn.conf.py).
+- ZIP jest wysyłany strumieniowo: każdy gotowy plik trafia do odpowiedzi,
+  zanim skończą się kolejne. W pamięci trzymamy tylko kilka zamówień
+  i PDF-ów naraz.
+- Najpierw zaglądamy do cache PDF-ów (app/pdf_cache.py), a wyrenderowane
+  pliki do niego zapisujemy - kolejne pobrania są już natychmiastowe.
+- Postęp (ile gotowych z ilu) podaje export_progress(export_id). Liczniki
+  są w bazie (PdfExport), więc o postęp można pytać dowolny worker.
+  Zapisujemy je najwyżej co _PROGRESS_FLUSH_SECONDS, osobnym połączeniem.
+"""
+import datetime
+import io
+import multiprocessing
+import threading
+import time
+import uuid
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.orm import joinedload, selectinload
+from .models import db, Order, PdfExport
+from .pdf_cache import read_order_pdf, store_order_pdf
+from .pdf_render import render_pdf, order_confirmation_context
+
+# Zamówienia wczytujemy z bazy porcjami
+_CHUNK_SIZE = 100
+# Jak często zapisywać postęp do bazy i jak długo trzymać wpisy starych eksportów
+_PROGRESS_FLUSH_SECONDS = 1.0
+_PROGRESS_TTL = datetime.timedelta(days=1)
+
+_lock = threading.Lock()
+_executor = None
+
+# --- Proces roboczy puli ---
+
+_worker_app = None
+
+
+def _init_worker():
+    """Każdy proces puli ma własną aplikację (szablony, konfiguracja, zasoby PDF)."""
+    global _worker_app
+    from . import create_app
+    from .pdf_assets import preload_pdf_assets
+    _worker_app = create_app()
+    preload_pdf_assets(_worker_app)
+
+
+def _render_in_worker(order_id, context):
+    with _worker_app.app_context():
+        return order_id, render_pdf('order_confirmation', context)
+
+
+def export_processes():
+    return current_app.config['PDF_EXPORT_PROCESSES']
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            # 'spawn': proces potomny nie dziedziczy wątków ani połączeń z bazą workera gunicorna
+            _executor = ProcessPoolExecutor(
+                max_workers=export_processes(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker
+            )
+        return _executor
+
+
+def shutdown_export_pool():
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- Postęp ---
+
+def start_export(total, export_id=None):
+    """
+    Zapisuje nowy eksport i zwraca jego ID. Klient może podać własne ID,
+    żeby pytać o postęp, zanim dostanie nagłówki odpowiedzi.
+    Przy okazji usuwa wpisy eksportów starszych niż _PROGRESS_TTL.
+    """
+    export_id = export_id or uuid.uuid4().hex
+    now = datetime.datetime.utcnow()
+    try:
+        PdfExport.query.filter(PdfExport.started_at < now - _PROGRESS_TTL).delete(synchronize_session=False)
+        db.session.add(PdfExport(id=export_id, total=total, started_at=now))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return export_id
+
+
+class _Progress:
+    """Liczniki eksportu w pamięci generatora, zapisywane do bazy co _PROGRESS_FLUSH_SECONDS."""
+
+    def __init__(self, export_id):
+        self.export_id = export_id
+        self.counts = {"done": 0, "from_cache": 0, "failed": 0}
+        self._flushed_at = time.monotonic()
+
+    def add(self, done=0, from_cache=0, failed=0):
+        self.counts["done"] += done
+        self.counts["from_cache"] += from_cache
+        self.counts["failed"] += failed
+        if time.monotonic() - self._flushed_at >= _PROGRESS_FLUSH_SECONDS:
+            self.flush()
+
+    def flush(self, **changes):
+        # Osobne połączenie - sesji żądania, która czyta zamówienia, nie zatwierdzamy w trakcie
+        with db.engine.begin() as connection:
+            connection.execute(
+                update(PdfExport).where(PdfExport.id == self.export_id).values(**self.counts, **changes)
+            )
+        self._flushed_at = time.monotonic()
+
+    def finish(self, status):
+        self.flush(status=status, finished_at=datetime.datetime.utcnow())
+
+
+def export_exists(export_id):
+    return db.session.get(PdfExport, export_id) is not None
+
+
+def export_progress(export_id):
+    """Stan eksportu: total, done, from_cache, failed, percent, status (running/done/cancelled) albo None."""
+    export = db.session.get(PdfExport, export_id)
+    if export is None:
+        return None
+    finished = export.finished_at or datetime.datetime.utcnow()
+    return {
+        "total": export.total,
+        "done": export.done,
+        "from_cache": export.from_cache,
+        "failed": export.failed,
+        "status": export.status,
+        "started_at": export.started_at.isoformat(),
+        "finished_at": export.finished_at.isoformat() if export.finished_at else None,
+        "percent": round(100 * export.done / export.total, 1) if export.total else 100.0,
+        "elapsed_seconds": round((finished - export.started_at).total_seconds(), 1),
+    }
+
+
+# --- Eksport ---
+
+class _ZipBuffer(io.RawIOBase):
+    """Niezapisywalny wstecz strumień dla ZipFile - zebrane bajty oddajemy przez take()."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def take(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _orders_in_chunks(order_ids):
+    for start in range(0, len(order_ids), _CHUNK_SIZE):
+        chunk = order_ids[start:start + _CHUNK_SIZE]
+        orders = {order.id: order for order in Order.query.options(
+            selectinload(Order.items), joinedload(Order.user)
+        ).filter(Order.id.in_(chunk))}
+        for order_id in chunk:
+            if order_id in orders:
+                yield orders[order_id]
+
+
+def stream_orders_zip(export_id, order_ids):
+    """
+    Generator bajtów archiwum ZIP z PDF-ami zamówień (kolejność = kolejność ukończenia).
+    Zamówienia, których nie udało się wyrenderować, są wymienione w pliku bledy.txt.
+    """
+    buffer = _ZipBuffer()
+    archive = zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_STORED)
+    progress = _Progress(export_id)
+    executor = _get_executor()
+    max_in_flight = export_processes() * 2
+    pending = {}  # future -> (zamówienie, skrót treści)
+    errors = []
+    finished = False
+
+    def add_file(order_id, pdf_data):
+        archive.writestr(f"zamowienie_{order_id}.pdf", pdf_data)
+        return buffer.take()
+
+    def collect(block):
+        """Odbiera gotowe wyniki; z block=True czeka na co najmniej jeden."""
+        done, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            order, digest = pending.pop(future)
+            try:
+                _, pdf_data = future.result()
+            except Exception as e:
+                errors.append(f"#{order.id}: {e}")
+                progress.add(done=1, failed=1)
+                continue
+            store_order_pdf(order, pdf_data, digest)
+            progress.add(done=1)
+            yield add_file(order.id, pdf_data)
+
+    try:
+        for order in _orders_in_chunks(order_ids):
+            pdf_data, digest = read_order_pdf(order)
+            if pdf_data is not None:
+                progress.add(done=1, from_cache=1)
+                yield add_file(order.id, pdf_data)
+                continue
+
+            context = order_confirmation_context(order, order.user)
+            pending[executor.submit(_render_in_worker, order.id, context)] = (order, digest)
+            yield from collect(block=len(pending) >= max_in_flight)
+
+        while pending:
+            yield from collect(block=True)
+
+        if errors:
+            archive.writestr("bledy.txt", "\n".join(errors) + "\n")
+        archive.close()
+        finished = True
+        yield buffer.take()
+    finally:
+        # Klient przerwał pobieranie - nie renderujemy reszty
+        for future in pending:
+            future.cancel()
+        progress.finish('done' if finished else 'cancelled')
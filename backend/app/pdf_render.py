@@ -0,0 +1,355 @@
+# /backend/app/pdf_render.py
+"""
+Renderowanie dokumentów PDF (potwierdzenie zamówienia, lista do spakowania).
+
+Backend wybiera PDF_RENDERER:
+- 'xhtml2pdf' (domyślnie) - szablon Jinja (templates/pdf/<dokument>.html)
+  składany przez xhtml2pdf. Najłatwiej zmienić wygląd, ale układ HTML/CSS
+  jest najdroższym krokiem generowania.
+- 'canvas' - te same dokumenty rysowane bezpośrednio na płótnie ReportLab
+  (biblioteki, na której i tak stoi xhtml2pdf). Wielokrotnie szybszy
+  przy długich dokumentach. Dokumenty bez własnego rysowania trafiają
+  do xhtml2pdf.
+
+Polskie znaki w backendzie 'canvas' wymagają czcionki TTF: PDF_FONT_PATH
+i PDF_FONT_BOLD_PATH (domyślnie szukamy DejaVu Sans w typowych miejscach).
+Bez niej zostaje Helvetica, która nie ma m.in. ą, ę, ś, ż.
+Obrazy i czcionki pochodzą z rejestru zasobów (app/pdf_assets.py).
+"""
+import io
+import os
+from types import SimpleNamespace
+from flask import current_app, render_template
+from xhtml2pdf import pisa
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.units import mm
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+from .pdf_assets import assets, IMAGE_EXTENSIONS
+
+RENDERERS = ('xhtml2pdf', 'canvas')
+
+_DEFAULT_FONT_PATHS = (
+    ('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/TTF/DejaVuSans.ttf', '/usr/share/fonts/TTF/DejaVuSans-Bold.ttf'),
+    ('/usr/share/fonts/dejavu/DejaVuSans.ttf', '/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf'),
+)
+
+
+def link_callback(uri, rel):
+    """
+    Funkcja pomocnicza dla xhtml2pdf.
+    Obrazy z /static/ podaje jako gotowe bajty z rejestru (app/pdf_assets.py),
+    pozostałe ścieżki URL zamienia na ścieżki systemowe.
+    """
+    # Obsługa linków web (jeśli kiedyś będziesz potrzebował)
+    if uri.startswith('http://') or uri.startswith('https://'):
+        return uri
+    # Usuń prefiks /static/
+    relative = uri[len('/static/'):] if uri.startswith('/static/') else uri
+    path = os.path.join(current_app.static_folder, relative)
+
+    if path.lower().endswith(IMAGE_EXTENSIONS):
+        image = assets.image(path)
+        return image.data if image is not None else None
+    if not uri.startswith('/static/'):
+        # Domyślna obsługa dla innych zasobów
+        return path
+    if not os.path.isfile(path):
+        print(f"BŁĄD PDF: Nie znaleziono pliku statycznego: {path}")
+        return None
+    return path
+
+
+class PdfRenderer:
+    """Interfejs backendu: render(dokument, kontekst) -> bajty PDF."""
+    name = None
+
+    def render(self, document, context):
+        raise NotImplementedError
+
+
+class XhtmlRenderer(PdfRenderer):
+    """Szablon HTML + xhtml2pdf (dotychczasowa ścieżka)."""
+    name = 'xhtml2pdf'
+
+    def render(self, document, context):
+        html_content = render_template(f'pdf/{document}.html', **context)
+        result_buffer = io.BytesIO()
+        pisa_status = pisa.CreatePDF(
+            html_content,
+            dest=result_buffer,
+            encoding='utf-8',
+            link_callback=link_callback # <-- Mówi PDF, jak znaleźć loga
+        )
+        if pisa_status.err:
+            raise Exception(f"Błąd podczas generowania PDF: {pisa_status.err}")
+        return result_buffer.getvalue()
+
+
+# --- Czcionki dla backendu 'canvas' ---
+
+def font_paths():
+    """(czcionka, czcionka_pogrubiona) z konfiguracji lub systemu; (None, None), jeśli brak."""
+    regular = current_app.config.get('PDF_FONT_PATH')
+    bold = current_app.config.get('PDF_FONT_BOLD_PATH')
+    if regular:
+        return regular, bold or regular
+    for default_regular, default_bold in _DEFAULT_FONT_PATHS:
+        if os.path.isfile(default_regular):
+            return default_regular, default_bold if os.path.isfile(default_bold) else default_regular
+    return None, None
+
+
+_warned_missing_font = False
+
+
+def _fonts_for_canvas():
+    """Nazwy czcionek do rysowania (zarejestrowane raz w rejestrze zasobów)."""
+    global _warned_missing_font
+    regular, bold = font_paths()
+    if regular is None:
+        if not _warned_missing_font:
+            print("OSTRZEŻENIE PDF: brak czcionki TTF (PDF_FONT_PATH) - polskie znaki mogą nie być widoczne.")
+            _warned_missing_font = True
+        return 'Helvetica', 'Helvetica-Bold'
+    return assets.fonts(regular, bold)
+
+
+class _Page:
+    """Kursor rysowania na kolejnych stronach A4 (od góry do dołu)."""
+    MARGIN = 15 * mm
+    PADDING = 2 * mm
+
+    def __init__(self, title, fonts):
+        self.buffer = io.BytesIO()
+        self.canvas = canvas.Canvas(self.buffer, pagesize=A4, pageCompression=1)
+        self.canvas.setTitle(title)
+        self.font, self.bold = fonts
+        self.width, self.height = A4
+        self.content_width = self.width - 2 * self.MARGIN
+        self.y = self.height - self.MARGIN
+
+    def new_page(self):
+        self.canvas.showPage()
+        self.y = self.height - self.MARGIN
+
+    def ensure_space(self, needed):
+        """Nowa strona, jeśli poniżej kursora nie zmieści się 'needed' punktów. Zwraca True po zmianie strony."""
+        if self.y - needed < self.MARGIN:
+            self.new_page()
+            return True
+        return False
+
+    def text(self, value, size=10, bold=False, color=0.2, align='left', gap=1.4):
+        """Akapit zawijany do szerokości strony."""
+        font = self.bold if bold else self.font
+        leading = size * 1.25
+        lines = simpleSplit(str(value), font, size, self.content_width) or ['']
+        self.canvas.setFont(font, size)
+        self.canvas.setFillGray(color)
+        for line in lines:
+            self.ensure_space(leading)
+            self.y -= size
+            if align == 'center':
+                self.canvas.drawCentredString(self.width / 2, self.y, line)
+            else:
+                self.canvas.drawString(self.MARGIN, self.y, line)
+            self.y -= leading - size
+        self.y -= size * (gap - 1)
+
+    def space(self, points):
+        self.y -= points
+
+    def rule(self, gray=0.8, width=1):
+        self.canvas.setStrokeGray(gray)
+        self.canvas.setLineWidth(width)
+        self.canvas.line(self.MARGIN, self.y, self.width - self.MARGIN, self.y)
+
+    def table(self, columns, rows, size=9):
+        """
+        Tabela z zawijaniem tekstu i powtarzanym nagłówkiem na każdej stronie.
+        columns: [(nagłówek, ułamek_szerokości, wyrównanie)],
+        rows: [[(tekst, pogrubiony), ...], ...].
+        """
+        widths = [fraction * self.content_width for _, fraction, _ in columns]
+        leading = size * 1.25
+
+        def cell_lines(value, bold, width):
+            font = self.bold if bold else self.font
+            return font, simpleSplit(str(value), font, size, width - 2 * self.PADDING) or ['']
+
+        def draw_row(cells, background=None):
+            wrapped = [cell_lines(value, bold, width) for (value, bold), width in zip(cells, widths)]
+            row_height = max(len(lines) for _, lines in wrapped) * leading + 2 * self.PADDING
+            if self.ensure_space(row_height) and background is None:
+                # Wiersz nie wymaga ponownego zawijania: szerokości kolumn i czcionki
+                # są na każdej stronie te same, a draw_header() zawija własne komórki
+                draw_header()
+
+            c = self.canvas
+            x = self.MARGIN
+            top = self.y
+            if background is not None:
+                c.setFillGray(background)
+                c.rect(x, top - row_height, self.content_width, row_height, stroke=0, fill=1)
+            c.setStrokeGray(0.85)
+            c.setLineWidth(0.5)
+            c.setFillGray(0.2)
+            for (font, lines), width, (_, _, align) in zip(wrapped, widths, columns):
+                c.rect(x, top - row_height, width, row_height, stroke=1, fill=0)
+                c.setFont(font, size)
+                baseline = top - self.PADDING - size
+                for line in lines:
+                    if align == 'right':
+                        c.drawRightString(x + width - self.PADDING, baseline, line)
+                    else:
+                        c.drawString(x + self.PADDING, baseline, line)
+                    baseline -= leading
+                x += width
+            self.y = top - row_height
+
+        def draw_header():
+            draw_row([(title, True) for title, _, _ in columns], background=0.95)
+
+        self.ensure_space(4 * leading)
+        draw_header()
+        for row in rows:
+            draw_row(row)
+
+    def finish(self):
+        self.canvas.showPage()
+        self.canvas.save()
+        return self.buffer.getvalue()
+
+
+class CanvasRenderer(PdfRenderer):
+    """Dokumenty rysowane bezpośrednio przez ReportLab (bez HTML/CSS)."""
+    name = 'canvas'
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback or XhtmlRenderer()
+
+    def render(self, document, context):
+        draw = getattr(self, f'_draw_{document}', None)
+        if draw is None:
+            return self.fallback.render(document, context)
+        return draw(**context)
+
+    def _draw_order_confirmation(self, order, user, grouped_items):
+        page = _Page(f"Zamówienie #{order.id}", _fonts_for_canvas())
+
+        # Nagłówek z logotypami (jak w szablonie HTML)
+        logo_top = page.y
+        for relative, height, align in (('img/logo_cz.png', 65, 'left'), ('img/h_cz.png', 60, 'right')):
+            image = assets.image(os.path.join(current_app.static_folder, relative))
+            if image is None:
+                continue
+            image_width, image_height = image.size
+            width = image_width * height / image_height
+            x = page.MARGIN if align == 'left' else page.width - page.MARGIN - width
+            # Obraz zakodowany raz na proces - drawImage tylko go wskazuje
+            image.register_in(page.canvas)
+            page.canvas.drawImage(image.reader, x, logo_top - height, width=width, height=height, mask='auto')
+        page.space(70)
+        page.rule(gray=0.93, width=2)
+        page.space(16)
+
+        page.text(f"Zamówienie #{order.id}", size=22, bold=True, color=0, align='center', gap=1.2)
+        if order.created_at:
+            page.text(f"Z dnia: {order.created_at.strftime('%Y-%m-%d %H:%M')}", size=11, color=0.33, align='center')
+        page.space(12)
+
+        page.text(f"Klient: {user.username}", bold=True, gap=1.1)
+        page.text(f"Email: {user.email}", gap=1.6)
+        page.text("Zamówione produkty:", size=12, bold=True)
+
+        rows = []
+        for product in grouped_items:
+            for i, variant in enumerate(product["variants"]):
+                rows.append([
+                    (product["name"] if i == 0 else '', True),
+                    (variant["size"] or '', False),
+                    (f"{variant['quantity']} szt.", False)
+                ])
+        page.table([("Produkt", 0.45, 'left'), ("Wariant (Rozmiar)", 0.30, 'left'), ("Ilość", 0.25, 'right')], rows)
+
+        if order.notes:
+            page.space(18)
+            page.text("Uwagi do zamówienia:", size=12, bold=True)
+            page.text(order.notes, color=0.33)
+        return page.finish()
+
+    def _draw_picking_list(self, aggregated_items, order_ids_str, generated_at):
+        page = _Page("Lista do Spakowania", _fonts_for_canvas())
+
+        page.text("Zbiorcza Lista do Spakowania", size=20, bold=True, gap=1.3)
+        page.text(f"Wygenerowano: {generated_at}", gap=1.2)
+        page.text(f"Dotyczy zamówień: {order_ids_str}", gap=1.2)
+        page.rule(gray=0.2, width=2)
+        page.space(16)
+        page.text("Suma produktów do zebrania:", size=12, bold=True)
+
+        rows = [[
+            (item["name"], False),
+            (item["size"] or '', False),
+            (f"{item['total_quantity']} szt.", True),
+            (', '.join(item["orders"]), False)
+        ] for item in aggregated_items]
+        page.table([
+            ("Produkt", 0.30, 'left'), ("Wariant (Rozmiar)", 0.18, 'left'),
+            ("Łączna ilość", 0.17, 'left'), ("Numery zamówień", 0.35, 'left')
+        ], rows)
+        return page.finish()
+
+
+def order_confirmation_context(order, user):
+    """
+    Kontekst potwierdzenia zamówienia z produktami pogrupowanymi po nazwie.
+    Same proste dane (bez obiektów ORM), więc można go przekazać do innego procesu.
+    """
+    grouped_items = {}
+    for item in order.items:
+        key = item.product_name
+        if key not in grouped_items:
+            grouped_items[key] = {
+                "name": item.product_name,
+                "variants": []
+            }
+
+        item_total_price = 0
+        if item.price_at_order is not None:
+            item_total_price = item.price_at_order * item.quantity
+
+        grouped_items[key]["variants"].append({
+            "size": item.variant_size,
+            "quantity": item.quantity,
+            "price_at_order": item.price_at_order,
+            "total_price": item_total_price
+        })
+
+    return {
+        "order": SimpleNamespace(id=order.id, created_at=order.created_at, notes=order.notes),
+        "user": SimpleNamespace(username=user.username, email=user.email),
+        "grouped_items": list(grouped_items.values())
+    }
+
+
+_renderers = {
+    'xhtml2pdf': XhtmlRenderer(),
+    'canvas': CanvasRenderer(),
+}
+
+
+def get_renderer(name=None):
+    """Backend z PDF_RENDERER (lub podany wprost)."""
+    name = name or current_app.config.get('PDF_RENDERER', 'xhtml2pdf')
+    try:
+        return _renderers[name]
+    except KeyError:
+        raise ValueError(f"Nieznany PDF_RENDERER '{name}' (dozwolone: {', '.join(RENDERERS)})")
+
+
+def render_pdf(document, context, renderer=None):
+    """Renderuje dokument ('order_confirmation', 'picking_list') wybranym backendem."""
+    return get_renderer(renderer).render(document, context)
@@ -0,0 +1,97 @@
+# /backend/app/picking.py
+"""
+Zbiorcza lista do spakowania.
+
+Sumowanie pozostałych do wysłania sztuk robi baza jednym zapytaniem
+GROUP BY (produkt, rozmiar), a numery zamówień skleja w tekst
+(group_concat w SQLite, string_agg w PostgreSQL). Do Pythona trafia
+jeden wiersz na produkt/wariant, a nie każda niezrealizowana pozycja.
+"""
+import csv
+import io
+import json
+from sqlalchemy import func, cast, String
+from .models import db, OrderItem
+from .exports import csv_cell
+
+CSV_COLUMNS = ("product_name", "variant_size", "quantity", "orders")
+# Ile zgrupowanych wierszy pobieramy z kursora naraz przy strumieniowaniu
+_FETCH_SIZE = 500
+
+
+def _picking_query(order_ids):
+    return db.session.query(
+        OrderItem.product_name,
+        OrderItem.variant_size,
+        func.sum(OrderItem.quantity - OrderItem.shipped_quantity),
+        func.aggregate_strings(cast(OrderItem.order_id, String), ',')
+    ).filter(
+        OrderItem.order_id.in_(order_ids),
+        OrderItem.shipped_quantity < OrderItem.quantity
+    ).group_by(
+        OrderItem.product_name, OrderItem.variant_size
+    ).order_by(
+        OrderItem.product_name, OrderItem.variant_size
+    )
+
+
+def _parse_order_ids(joined):
+    # Jedno zamówienie może mieć kilka pozycji tego samego wariantu - stąd set
+    return sorted({int(order_id) for order_id in joined.split(',')})
+
+
+def picking_rows(order_ids):
+    """
+    Generator wierszy listy {"name", "size", "total_quantity", "orders": [ID, ...]}
+    posortowanych po nazwie produktu i rozmiarze.
+    """
+    query = _picking_query(order_ids).execution_options(yield_per=_FETCH_SIZE)
+    for name, size, quantity, joined_ids in query:
+        yield {
+            "name": name,
+            "size": size,
+            "total_quantity": int(quantity),
+            "orders": _parse_order_ids(joined_ids)
+        }
+
+
+def peek(rows):
+    """Zwraca (pierwszy_wiersz_lub_None, generator wszystkich wierszy) - żeby przed strumieniowaniem wiedzieć, czy lista nie jest pusta."""
+    rows = iter(rows)
+    first = next(rows, None)
+
+    def all_rows():
+        if first is None:
+            return
+        yield first
+        yield from rows
+    return first, all_rows()
+
+
+def stream_json(rows):
+    """Tablica JSON wysyłana wiersz po wierszu."""
+    yield '['
+    for i, row in enumerate(rows):
+        yield (',' if i else '') + json.dumps(row, ensure_ascii=False)
+    yield ']'
+
+
+def stream_csv(rows):
+    """CSV (nagłówek + wiersz na wariant); numery zamówień rozdzielone spacją. Teksty przez csv_cell()."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return value
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for row in rows:
+        writer.writerow((
+            csv_cell(row["name"]), csv_cell(row["size"] or ''), row["total_quantity"],
+            ' '.join(f"#{order_id}" for order_id in row["orders"])
+        ))
+        yield flush()
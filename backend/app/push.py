@@ -0,0 +1,147 @@
+# /backend/app/push.py
+"""
+Równoległa wysyłka powiadomień Web Push.
+
+- Wysyłamy przez ograniczoną pulę wątków (PUSH_MAX_WORKERS), zamiast
+  jednego blokującego żądania HTTP po drugim.
+- Dla każdego serwisu push (origin endpointu, np. fcm.googleapis.com)
+  trzymamy jedną sesję HTTP, więc połączenia są używane ponownie.
+- Klucz VAPID parsujemy raz, a nie przy każdej wiadomości.
+- Wygasłe subskrypcje (404/410) usuwamy jednym DELETE po zakończeniu wysyłki.
+"""
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from py_vapid import Vapid02
+from pywebpush import webpush, WebPushException
+from .models import db, PushSubscription
+
+# Kody, którymi serwis push informuje, że subskrypcja już nie istnieje
+EXPIRED_STATUS_CODES = (404, 410)
+
+_lock = threading.Lock()
+_executor = None
+_sessions = {}  # origin -> requests.Session
+_vapid_key_cache = {}  # klucz prywatny (string) -> obiekt Vapid
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('PUSH_MAX_WORKERS', 16),
+                thread_name_prefix='push'
+            )
+        return _executor
+
+
+def _session_for(endpoint):
+    """Wspólna sesja HTTP (pula połączeń) dla danego serwisu push."""
+    parts = urlsplit(endpoint)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    with _lock:
+        session = _sessions.get(origin)
+        if session is None:
+            pool_size = current_app.config.get('PUSH_MAX_WORKERS', 16)
+            session = requests.Session()
+            session.mount(origin, HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+            _sessions[origin] = session
+        return session
+
+
+def _vapid_key():
+    private_key = current_app.config['VAPID_PRIVATE_KEY']
+    with _lock:
+        vapid = _vapid_key_cache.get(private_key)
+        if vapid is None:
+            vapid = Vapid02.from_string(private_key)
+            _vapid_key_cache[private_key] = vapid
+        return vapid
+
+
+def _send_one(subscription_id, user_id, subscription_info, payload, vapid, vapid_claims, session, timeout):
+    """Wysyła jedno powiadomienie. Działa w wątku puli - bez dostępu do bazy."""
+    result = {
+        "subscription_id": subscription_id,
+        "user_id": user_id,
+        "status": "delivered",
+        "http_status": None,
+        "error": None
+    }
+    try:
+        response = webpush(
+            subscription_info=subscription_info,
+            data=payload,
+            vapid_private_key=vapid,
+            # webpush dopisuje 'aud' do claims, więc każdy wątek dostaje kopię
+            vapid_claims=dict(vapid_claims),
+            requests_session=session,
+            timeout=timeout
+        )
+        result["http_status"] = getattr(response, 'status_code', None)
+    except WebPushException as ex:
+        status_code = ex.response.status_code if ex.response is not None else None
+        result["http_status"] = status_code
+        result["status"] = "expired" if status_code in EXPIRED_STATUS_CODES else "failed"
+        result["error"] = str(ex)
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = str(e)
+    return result
+
+
+def dispatch_push(subscriptions, title, body, data=None):
+    """
+    Wysyła to samo powiadomienie do listy subskrypcji (obiekty PushSubscription).
+    Zwraca podsumowanie: liczniki delivered/expired/failed + wynik dla każdej subskrypcji.
+    Wygasłe subskrypcje są usuwane z bazy jednym zapytaniem (z commit-em).
+    """
+    summary = {"total": len(subscriptions), "delivered": 0, "expired": 0, "failed": 0, "results": []}
+    if not subscriptions:
+        return summary
+
+    payload = json.dumps({
+        "title": title,
+        "body": body,
+        "data": data or {} # Dodatkowe dane, np. link do kliknięcia
+    })
+    vapid = _vapid_key()
+    vapid_claims = current_app.config['VAPID_CLAIMS']
+    timeout = current_app.config.get('PUSH_TIMEOUT', 10)
+    executor = _get_executor()
+
+    futures = []
+    for sub in subscriptions:
+        try:
+            subscription_info = json.loads(sub.subscription_json)
+            endpoint = subscription_info['endpoint']
+        except (ValueError, KeyError, TypeError):
+            summary["results"].append({
+                "subscription_id": sub.id, "user_id": sub.user_id,
+                "status": "failed", "http_status": None, "error": "Błędny format subskrypcji"
+            })
+            continue
+        futures.append(executor.submit(
+            _send_one, sub.id, sub.user_id, subscription_info, payload,
+            vapid, vapid_claims, _session_for(endpoint), timeout
+        ))
+
+    summary["results"].extend(future.result() for future in futures)
+
+    for result in summary["results"]:
+        summary[result["status"]] += 1
+
+    expired_ids = [result["subscription_id"] for result in summary["results"] if result["status"] == "expired"]
+    if expired_ids:
+        print(f"Usuwam wygasłe subskrypcje PUSH: {len(expired_ids)}")
+        PushSubscription.query.filter(
+            PushSubscription.id.in_(expired_ids)
+        ).delete(synchronize_session=False)
+        db.session.commit()
+
+    return summary
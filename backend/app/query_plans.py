@@ -0,0 +1,184 @@
+# /backend/app/query_plans.py
+"""
+Kontrola planów zapytań (EXPLAIN QUERY PLAN, SQLite) dla zapytań z endpointów.
+
+Nie utrzymujemy ręcznej kopii zapytań: check_query_plans() wywołuje
+endpointy tylko do odczytu (PLAN_REQUESTS) klientem testowym Flaska,
+przechwytuje każde wykonane SELECT (capture_queries) i sprawdza jego plan.
+Zmiana zapytania w endpoincie od razu zmienia sprawdzany plan.
+Błąd = któreś zapytanie czyta jedną z dużych tabel pełnym skanem
+("SCAN <tabela>" bez indeksu) albo endpoint zwrócił 5xx.
+
+Uruchamiane przez: flask check-query-plans
+oraz w testach (tests/test_query_plans.py), na tymczasowej bazie
+i dodatkowo dla endpointów zapisujących (zamówienie, wysyłka, fala).
+"""
+import contextlib
+import datetime
+import threading
+from flask import current_app
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event, func
+from .models import db, Order, User
+from .pagination import encode_cursor
+
+# Tabele, które rosną razem z historią - tu pełny skan to regresja
+WATCHED_TABLES = {
+    'order', 'order_item', 'shipment', 'shipment_item', 'notification',
+    'push_subscription', 'product_variant', 'background_job', 'client_product_assignment'
+}
+
+_SAMPLE_DATE = datetime.datetime(2025, 1, 1)
+
+# (rola, metoda, ścieżka, argumenty klienta testowego) - tylko endpointy bez zapisu do bazy.
+# W ścieżce: {order_id} / {user_id} = istniejące zamówienie / klient.
+PLAN_REQUESTS = [
+    ('user', 'GET', '/api/my-products', {}),
+    ('user', 'GET', '/api/my-products', {"query_string": {"limit": 20, "q": "a"}}),
+    ('user', 'GET', '/api/my-orders', {}),
+    ('user', 'GET', '/api/me', {}),
+    ('user', 'GET', '/api/me/notifications', {}),
+    ('user', 'GET', '/api/me/notifications', {"query_string": {"since": 0}}),
+    ('admin', 'GET', '/api/products', {"query_string": {"limit": 20}}),
+    ('admin', 'GET', '/api/users/{user_id}/products', {}),
+    ('admin', 'GET', '/api/shipping/orders', {"query_string": {"status": "new", "limit": 50}}),
+    ('admin', 'GET', '/api/shipping/orders', {"query_string": {
+        "limit": 50, "cursor": encode_cursor([_SAMPLE_DATE, 100])
+    }}),
+    ('admin', 'GET', '/api/shipping/orders', {"query_string": {"search": "kowalski", "limit": 50}}),
+    ('admin', 'GET', '/api/shipping/orders', {"query_string": {
+        "search": "kowalski", "sort": "relevance", "limit": 50, "fields": "summary"
+    }}),
+    ('admin', 'GET', '/api/shipping/orders/counts', {}),
+    ('admin', 'GET', '/api/orders/{order_id}/shipments', {}),
+    ('admin', 'POST', '/api/shipping/picking-list', {"json": {"order_ids": ["{order_id}"]}}),
+    ('admin', 'GET', '/api/admin/dashboard-stats', {"query_string": {
+        "start_date": "2025-01-01", "end_date": "2025-01-31"
+    }}),
+    ('admin', 'GET', '/api/admin/timeseries', {"query_string": {
+        "start_date": "2025-01-01", "end_date": "2025-03-31", "bucket": "week", "split": "status"
+    }}),
+    ('admin', 'GET', '/api/admin/latest-orders', {}),
+    ('admin', 'GET', '/api/admin/jobs', {"query_string": {"status": "queued"}}),
+    ('admin', 'GET', '/api/admin/export/orders', {"query_string": {
+        "start_date": "2025-01-01", "end_date": "2025-01-31"
+    }}),
+    ('admin', 'GET', '/api/admin/export/items', {"query_string": {"user_id": "{user_id}", "format": "ndjson"}}),
+    ('admin', 'GET', '/api/admin/export/shipments', {"query_string": {
+        "start_date": "2025-01-01", "end_date": "2025-01-31"
+    }}),
+]
+
+
+@contextlib.contextmanager
+def capture_queries():
+    """
+    Zbiera (sql, parametry) każdego SELECT-a wykonanego w bloku przez bieżący
+    wątek (bez executemany i bez zapytań np. wątków kolejki zadań).
+    """
+    queries = []
+    thread_id = threading.get_ident()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if executemany or threading.get_ident() != thread_id:
+            return
+        if statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            queries.append((statement, parameters))
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+    try:
+        yield queries
+    finally:
+        event.remove(engine, 'before_cursor_execute', before_cursor_execute)
+
+
+def _explain(sql, parameters):
+    """Zwraca listę linii planu (kolumna 'detail') dla zapytania."""
+    with db.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+    return [row[-1] for row in rows]
+
+
+def _full_scans(plan_lines):
+    """Linie 'SCAN <tabela>' bez użycia indeksu dla obserwowanych tabel."""
+    offenders = []
+    for line in plan_lines:
+        words = line.replace('"', '').split()
+        if len(words) >= 2 and words[0] == 'SCAN' and 'USING' not in words:
+            if words[1] in WATCHED_TABLES:
+                offenders.append(line)
+    return offenders
+
+
+def explain_queries(queries):
+    """
+    Plany przechwyconych zapytań (każde inne SQL raz).
+    Zwraca listę (sql, plan, pełne_skany); pełne_skany puste = OK.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError("Kontrola planów obsługuje tylko SQLite (EXPLAIN QUERY PLAN)")
+
+    results = []
+    seen = set()
+    for sql, parameters in queries:
+        if sql in seen:
+            continue
+        seen.add(sql)
+        plan = _explain(sql, parameters)
+        results.append((sql, plan, _full_scans(plan)))
+    return results
+
+
+def _substitute(value, ids):
+    if isinstance(value, str) and value.startswith('{') and value.endswith('}'):
+        return ids[value[1:-1]]
+    if isinstance(value, dict):
+        return {key: _substitute(item, ids) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_substitute(item, ids) for item in value]
+    return value
+
+
+def _auth_headers(role, user_id):
+    claims = {"id": user_id, "username": "query-plan-check", "role": role}
+    token = create_access_token(identity="query-plan-check", additional_claims=claims)
+    return {"Authorization": f"Bearer {token}"}
+
+
+def check_query_plans(requests=PLAN_REQUESTS):
+    """
+    Wywołuje endpointy z 'requests' i sprawdza plany wszystkich ich zapytań.
+    Zwraca listę (żądanie, sql, plan, pełne_skany) - dla żądań zakończonych
+    błędem 5xx sql = None, a plan zawiera opis błędu.
+    """
+    app = current_app._get_current_object()
+    client_id = db.session.query(func.min(User.id)).filter(User.role == 'user').scalar() or 1
+    ids = {
+        "order_id": db.session.query(func.min(Order.id)).scalar() or 1,
+        "user_id": client_id,
+    }
+    client = app.test_client()
+    job_pool = app.extensions.get('job_pool')
+
+    results = []
+    # Żądania testowe nie mogą uruchamiać wątków kolejki zadań (np. z CLI)
+    with (job_pool.suspended() if job_pool is not None else contextlib.nullcontext()):
+        for role, method, path, kwargs in requests:
+            label = f"{method} {path}"
+            kwargs = _substitute(kwargs, ids)
+            # Pusta sesja - obiekty z mapy tożsamości nie mogą ukryć zapytań
+            db.session.remove()
+            with capture_queries() as queries:
+                response = client.open(
+                    path.format(**ids), method=method,
+                    headers=_auth_headers(role, client_id if role == 'user' else 0),
+                    **kwargs
+                )
+                response.get_data() # Odpowiedzi strumieniowe wykonują zapytania dopiero tutaj
+            if response.status_code >= 500:
+                results.append((label, None, [f"HTTP {response.status_code}"], [f"HTTP {response.status_code}"]))
+                continue
+            for sql, plan, full_scans in explain_queries(queries):
+                results.append((label, sql, plan, full_scans))
+    return results
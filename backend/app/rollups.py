@@ -0,0 +1,147 @@
+# /backend/app/rollups.py
+"""
+Dzienne agregaty do statystyk kokpitu admina.
+
+Zamiast przeliczać przychód, top produkty i top klientów z wszystkich
+pozycji zamówień przy każdym żądaniu, trzymamy sumy per dzień:
+    DailyRevenue          - dzień -> zamówienia, sztuki, wartość
+    DailyProductQuantity  - (dzień, produkt) -> sztuki
+    DailyClientOrders     - (dzień, klient) -> zamówienia
+record_order() dolicza nowe zamówienie w tej samej transakcji (UPSERT),
+a dowolny zakres dat to suma co najwyżej kilkuset wierszy.
+"""
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from .models import db, Order, OrderItem, User, DailyRevenue, DailyProductQuantity, DailyClientOrders
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def _increment(session, model, key, values):
+    """INSERT ... ON CONFLICT DO UPDATE: dodaje 'values' do wiersza o kluczu 'key'."""
+    insert = _UPSERT_DIALECTS.get(session.get_bind().dialect.name)
+    if insert is None:
+        # Inne bazy: zwykłe przeczytaj-i-zmień (wystarcza przy jednym procesie)
+        row = session.get(model, tuple(key.values()))
+        if row is None:
+            session.add(model(**key, **values))
+        else:
+            for name, amount in values.items():
+                setattr(row, name, getattr(row, name) + amount)
+        return
+
+    table = model.__table__
+    statement = insert(table).values(**key, **values)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(key),
+        set_={name: table.c[name] + statement.excluded[name] for name in values}
+    )
+    session.execute(statement)
+
+
+def record_order(order, session=None):
+    """Dolicza zamówienie (z załadowanymi pozycjami) do agregatów dziennych."""
+    session = session or db.session
+    day = order.created_at.date()
+
+    _increment(session, DailyRevenue, {"day": day}, {
+        "order_count": 1,
+        "item_quantity": order.total_quantity,
+        "revenue": order.total_value
+    })
+    _increment(session, DailyClientOrders, {"day": day, "user_id": order.user_id}, {"order_count": 1})
+
+    quantities = {}
+    for item in order.items:
+        quantities[item.product_name] = quantities.get(item.product_name, 0) + item.quantity
+    for product_name, quantity in quantities.items():
+        _increment(session, DailyProductQuantity, {"day": day, "product_name": product_name}, {"quantity": quantity})
+
+
+_ROLLUP_MODELS = (DailyRevenue, DailyProductQuantity, DailyClientOrders)
+
+
+def _lock_rollups(session):
+    """
+    Blokuje zapis do agregatów do końca transakcji przebudowy. Równoległe
+    record_order() czekają, a po commit-cie doliczają zamówienia, których
+    przebudowa nie widziała - żadne nie przepada ani nie liczy się dwa razy.
+
+    SQLite: blokadę zapisu całej bazy bierze pierwszy DELETE w przebudowie,
+    zanim cokolwiek przeczytamy. PostgreSQL: jawny LOCK TABLE (EXCLUSIVE
+    blokuje zapis, ale nie odczyt kokpitu).
+    """
+    dialect = session.get_bind().dialect
+    if dialect.name == 'postgresql':
+        tables = ', '.join(dialect.identifier_preparer.format_table(model.__table__) for model in _ROLLUP_MODELS)
+        session.execute(text(f"LOCK TABLE {tables} IN EXCLUSIVE MODE"))
+
+
+def rebuild_rollups():
+    """
+    Przelicza wszystkie agregaty od zera (INSERT ... SELECT ... GROUP BY)
+    w jednej transakcji we własnej sesji, z zablokowanym zapisem agregatów
+    (_lock_rollups). Zwraca liczbę dni z zamówieniami.
+    """
+    order_day = func.date(Order.created_at)
+    with Session(db.engine) as session:
+        _lock_rollups(session)
+        # Najpierw DELETE (w SQLite to on bierze blokadę zapisu), potem odczyt zamówień
+        for model in _ROLLUP_MODELS:
+            session.query(model).delete(synchronize_session=False)
+
+        session.execute(DailyRevenue.__table__.insert().from_select(
+            ['day', 'order_count', 'item_quantity', 'revenue'],
+            db.select(
+                order_day,
+                func.count(Order.id),
+                func.coalesce(func.sum(Order.total_quantity), 0),
+                func.coalesce(func.sum(Order.total_value), 0)
+            ).group_by(order_day)
+        ))
+        session.execute(DailyProductQuantity.__table__.insert().from_select(
+            ['day', 'product_name', 'quantity'],
+            db.select(
+                order_day, OrderItem.product_name, func.sum(OrderItem.quantity)
+            ).join(Order, OrderItem.order_id == Order.id).group_by(order_day, OrderItem.product_name)
+        ))
+        session.execute(DailyClientOrders.__table__.insert().from_select(
+            ['day', 'user_id', 'order_count'],
+            db.select(order_day, Order.user_id, func.count(Order.id)).group_by(order_day, Order.user_id)
+        ))
+        session.commit()
+        return session.query(func.count(DailyRevenue.day)).scalar()
+
+
+def _in_range(query, day_column, start_date, end_date):
+    if start_date:
+        query = query.filter(day_column >= start_date)
+    if end_date:
+        query = query.filter(day_column < end_date)
+    return query
+
+
+def dashboard_rollup(start_date=None, end_date=None, top=5):
+    """
+    Statystyki dla zakresu dni [start_date, end_date) z agregatów:
+    (przychód, liczba zamówień, top produkty, top klienci).
+    """
+    revenue, order_count = _in_range(
+        db.session.query(func.sum(DailyRevenue.revenue), func.sum(DailyRevenue.order_count)),
+        DailyRevenue.day, start_date, end_date
+    ).one()
+
+    quantity = func.sum(DailyProductQuantity.quantity)
+    top_products = _in_range(
+        db.session.query(DailyProductQuantity.product_name, quantity),
+        DailyProductQuantity.day, start_date, end_date
+    ).group_by(DailyProductQuantity.product_name).order_by(quantity.desc()).limit(top).all()
+
+    client_orders = func.sum(DailyClientOrders.order_count)
+    top_clients = _in_range(
+        db.session.query(User.username, client_orders).join(User, User.id == DailyClientOrders.user_id),
+        DailyClientOrders.day, start_date, end_date
+    ).group_by(User.id, User.username).order_by(client_orders.desc()).limit(top).all()
+
+    return revenue or 0.0, int(order_count or 0), top_products, top_clients
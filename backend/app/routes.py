@@ -1,18 +1,37 @@
 # /backend/app/routes.py
-from flask import Blueprint, request, jsonify, make_response, current_app, render_template
-from .models import User, db, Product, ProductVariant, Order, OrderItem, Shipment, ShipmentItem, PushSubscription, Notification
+from flask import Blueprint, request, jsonify, make_response, current_app, render_template, send_file, Response, stream_with_context
+from .models import User, db, Product, ProductVariant, Order, OrderItem, Shipment, PushSubscription, Notification, BackgroundJob, client_product_assignment
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt, create_refresh_token, decode_token
 from datetime import timedelta
 from functools import wraps
 import datetime
 from flask_mail import Message # <-- Do wysyłania maila
 from app import mail # <-- Zaimportuj obiekt 'mail'
-from xhtml2pdf import pisa
-import io # Do obsługi PDF w pamięci
-from sqlalchemy import func
-from pywebpush import webpush, WebPushException
-import json
+from sqlalchemy import func, or_, and_, text
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm.exc import StaleDataError
+from sqlalchemy.orm import joinedload, selectinload
+import io
 import os
+import re
+import time
+from .catalog import list_catalog, bump_catalog_version, catalog_snapshot, cached_projection, client_projection
+from .pagination import parse_page_size, encode_cursor, decode_cursor
+from .search import apply_order_search, index_orders, reindex_user_orders
+from .jobs import job_handler, enqueue_job, enqueue_jobs, job_stats
+from .pdf_cache import cached_order_pdf, cached_order_pdf_bytes, invalidate_orders, invalidate_user_orders
+from .push import dispatch_push
+from .rollups import record_order, rebuild_rollups, dashboard_rollup
+from .timeseries import order_timeseries, invalidate_timeseries
+from .notify_stream import notification_stream, publish_notification, publish_all_read, hub as notification_hub, issue_stream_ticket, redeem_stream_ticket, STREAM_TICKET_TTL
+from .stream_limits import limited_response, slots as stream_slots
+from .shipping import parse_ship_lines, ship_items, ship_orders, ShippingError, ShippingConflict
+from .picking import picking_rows, peek, stream_json, stream_csv
+from .pdf_render import render_pdf, order_confirmation_context
+from .pdf_assets import pdf_asset_stats
+from .pdf_export import start_export, stream_orders_zip, export_progress, export_exists
+from .exports import export_statement, stream_export, FORMATS as EXPORT_FORMATS
+from .passwords import PasswordHashBusy, password_hash_stats
 
 def _create_notification(user_id, title, body, link_url):
     """Tworzy i zapisuje nowe powiadomienie w bazie."""
@@ -21,11 +40,14 @@ def _create_notification(user_id, title, body, link_url):
             user_id=user_id,
             title=title,
             body=body,
-            link_url=link_url
+            link_url=link_url,
+            seq=User.bump_notification_seq(user_id)
         )
         db.session.add(new_notif)
         # Zapisujemy od razu, aby było dostępne
         db.session.commit()
+        # Otwarte strumienie SSE odbiorcy dostają je natychmiast
+        publish_notification(new_notif)
     except Exception as e:
         # Błąd zapisu powiadomienia nie powinien zatrzymać głównej operacji
         print(f"BŁĄD: Nie udało się stworzyć powiadomienia: {e}")
@@ -34,6 +56,41 @@ def _create_notification(user_id, title, body, link_url):
 # Tworzymy "Blueprint" dla naszego API, ułatwi to organizację
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+@api_bp.errorhandler(PasswordHashBusy)
+def _password_hash_busy(e):
+    """Kolejka haszowania haseł jest pełna (np. poranna fala logowań)."""
+    response = jsonify({"msg": str(e)})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+@api_bp.route('/health', methods=['GET'])
+def health():
+    """
+    Stan bieżącego procesu (workera) dla load balancera i monitoringu.
+    503, jeśli baza nie odpowiada.
+    """
+    started_at = current_app.config.get('WORKER_STARTED_AT')
+    job_pool = current_app.extensions.get('job_pool')
+    status = {
+        "status": "ok",
+        "pid": os.getpid(),
+        "uptime_seconds": round(time.time() - started_at, 1) if started_at else None,
+        "job_workers_running": job_pool.running if job_pool is not None else False,
+        "notification_streams": notification_hub.connection_count(),
+        "open_streams": stream_slots.stats(),
+        "pdf_assets": pdf_asset_stats(),
+        "password_hashing": password_hash_stats()
+    }
+    try:
+        db.session.execute(text('SELECT 1'))
+        status["database"] = "ok"
+    except Exception as e:
+        db.session.rollback()
+        status["status"] = "error"
+        status["database"] = str(e)
+        return jsonify(status), 503
+    return jsonify(status), 200
+
 @api_bp.route('/login', methods=['POST'])
 def login():
     data = request.get_json()
@@ -45,6 +102,16 @@ def login():
     if not user or not user.check_password(password):
         return jsonify({"msg": "Błędna nazwa użytkownika lub hasło"}), 401
 
+    # Hasz z innym kosztem niż BCRYPT_ROUNDS przeliczamy teraz, gdy znamy hasło
+    if user.password_needs_rehash():
+        try:
+            user.set_password(password)
+            db.session.commit()
+        except Exception as e:
+            # Nieudane przeliczenie nie może blokować logowania - spróbujemy następnym razem
+            db.session.rollback()
+            print(f"BŁĄD: Nie udało się przeliczyć hasza hasła użytkownika {user.id}: {e}")
+
     # --- ZMIANA LOGIKI TWORZENIA TOKENU ---
     
     # 1. Tożsamość (identity) będzie teraz prostym stringiem
@@ -85,26 +152,6 @@ def protected():
         full_claims=current_user_claims
     ), 200
 
-def link_callback(uri, rel):
-    """
-    Funkcja pomocnicza dla xhtml2pdf.
-    Konwertuje ścieżki URL (np. /static/img/logo.png) na ścieżki systemowe.
-    """
-    # Usuń prefiks /static/
-    if uri.startswith('/static/'):
-        path = os.path.join(current_app.static_folder, uri.replace('/static/', ''))
-    # Obsługa linków web (jeśli kiedyś będziesz potrzebował)
-    elif uri.startswith('http://') or uri.startswith('https://'):
-        return uri
-    else:
-        # Domyślna obsługa dla innych zasobów
-        return os.path.join(current_app.static_folder, uri)
-
-    if not os.path.isfile(path):
-        print(f"BŁĄD PDF: Nie znaleziono pliku statycznego: {path}")
-        return None
-    return path
-
 # Dekorator admina (zaktualizowany)
 def admin_required():
     def wrapper(fn):
@@ -124,12 +171,57 @@ def admin_required():
         return decorator
     return wrapper
 
+def _is_full_catalog_request():
+    """Czy to zwykłe pobranie całego katalogu (bez filtrów i paginacji)?"""
+    return not any(key in request.args for key in ('q', 'limit', 'cursor'))
+
+def _cached_catalog_response(entry):
+    """
+    Odpowiedź ze zbuforowanej migawki katalogu.
+    Zwraca 304, jeśli klient ma już tę wersję (nagłówek If-None-Match).
+    """
+    response = make_response(entry["body"])
+    response.mimetype = 'application/json'
+    response.set_etag(entry["etag"])
+    # 'no-cache' = przeglądarka trzyma kopię, ale zawsze pyta o ETag
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def _catalog_response(user_id=None):
+    """
+    Wspólna obsługa listowania katalogu.
+    Parametry zapytania: 'q' (filtr po nazwie), 'limit' i 'cursor' (paginacja).
+    Bez 'limit'/'cursor' zwracamy zwykłą listę (jak dotychczas),
+    z nimi - obiekt {"products": [...], "next_cursor": ...}.
+    """
+    name_filter = request.args.get('q')
+    raw_limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    paginated = raw_limit is not None or cursor is not None
+
+    try:
+        limit = parse_page_size(raw_limit) if paginated else None
+        products, next_cursor = list_catalog(
+            user_id=user_id,
+            name_filter=name_filter,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    if not paginated:
+        return jsonify(products), 200
+
+    return jsonify({"products": products, "next_cursor": next_cursor}), 200
+
 # GET - Pobierz wszystkie produkty
 @api_bp.route('/products', methods=['GET'])
 @jwt_required() # Zabezpieczamy (może user też powinien widzieć? na razie tak)
 def get_products():
-    products = Product.query.all()
-    return jsonify([product.to_dict() for product in products]), 200
+    if _is_full_catalog_request():
+        return _cached_catalog_response(catalog_snapshot())
+    return _catalog_response()
 
 # POST - Stwórz nowy produkt
 @api_bp.route('/products', methods=['POST'])
@@ -166,6 +258,7 @@ def create_product():
             db.session.add(new_variant)
 
         db.session.commit()
+        bump_catalog_version()
         return jsonify(new_product.to_dict()), 201
         
     except Exception as e:
@@ -208,6 +301,7 @@ def update_product(product_id):
             db.session.add(new_variant)
             
         db.session.commit()
+        bump_catalog_version()
         return jsonify(product.to_dict()), 200
         
     except Exception as e:
@@ -221,6 +315,7 @@ def delete_product(product_id):
     product = Product.query.get_or_404(product_id)
     db.session.delete(product) # Dzięki 'cascade' warianty też się usuną
     db.session.commit()
+    bump_catalog_version()
     return jsonify({"msg": "Produkt usunięty"}), 200
 
 @api_bp.route('/users', methods=['GET'])
@@ -313,8 +408,15 @@ def update_user(user_id):
     # Obsługa zmiany hasła (jeśli zostało podane)
     if 'password' in data and data['password']:
         user.set_password(data['password'])
+
+    # Dane klienta są w indeksie wyszukiwania i w PDF-ach jego zamówień
+    customer_data_changed = any(key in data for key in ('username', 'email', 'first_name', 'last_name'))
+    if customer_data_changed:
+        reindex_user_orders(user.id)
         
     db.session.commit()
+    if customer_data_changed:
+        invalidate_user_orders(user.id)
     
     return jsonify({
         "id": user.id,
@@ -337,6 +439,8 @@ def delete_user(user_id):
     user = User.query.get_or_404(user_id)
     db.session.delete(user)
     db.session.commit()
+    # Usunięty klient nie może dalej dostawać widoku katalogu z cache
+    bump_catalog_version()
     return jsonify({"msg": "Użytkownik usunięty"}), 200
 
 @api_bp.route('/users/<int:user_id>/products', methods=['GET'])
@@ -372,6 +476,7 @@ def set_user_assigned_products(user_id):
             user.assigned_products.append(product)
             
     db.session.commit()
+    bump_catalog_version()
     
     # Zwróć zaktualizowaną listę ID
     updated_product_ids = [product.id for product in user.assigned_products]
@@ -398,53 +503,222 @@ def get_my_assigned_products():
     # Pobieramy ID zalogowanego usera z tokenu
     current_user_claims = get_jwt()
     user_id = current_user_claims.get('id')
-    
+
+    # Szybka ścieżka: widok klienta jest już w cache dla bieżącej wersji katalogu
+    if _is_full_catalog_request():
+        projection = cached_projection(user_id)
+        if projection is not None:
+            return _cached_catalog_response(projection)
+
     user = User.query.get(user_id)
     if not user:
         return jsonify({"msg": "Użytkownik nie znaleziony"}), 404
-        
-    # Dzięki naszej relacji, to jest teraz proste
-    # 'user.assigned_products' to lista obiektów Product
-    products = user.assigned_products 
-    
-    # Zmieniamy obiekty na słowniki, tak jak w /api/products
-    return jsonify([product.to_dict() for product in products]), 200
+
+    if _is_full_catalog_request():
+        return _cached_catalog_response(client_projection(user.id))
+
+    # Te same parametry i to samo zbiorcze ładowanie wariantów co w /api/products,
+    # zawężone do produktów przypisanych do klienta
+    return _catalog_response(user_id=user.id)
 
 # /backend/app/routes.py
 
 # --- Funkcja Pomocnicza do PDF ---
 def _generate_order_pdf(order, user):
+    """Generuje PDF dla danego zamówienia, GRUPUJĄC produkty."""
+    return render_pdf('order_confirmation', order_confirmation_context(order, user))
+
+
+# --- Zadania w tle (wykonywane przez app/jobs.py po commit-cie) ---
+
+@job_handler('order_confirmation_email')
+def _job_order_confirmation_email(payload):
+    """Generuje PDF potwierdzenia i wysyła go klientowi oraz adminom."""
+    order = Order.query.get(payload['order_id'])
+    if not order:
+        return # Zamówienie usunięte - nie ma czego wysyłać
+    user = order.user
+
+    # Ten sam plik trafi potem do cache pobrań (/api/orders/<id>/pdf)
+    pdf_file = cached_order_pdf_bytes(order, lambda: _generate_order_pdf(order, user))
+
+    # Pobierz listę adminów z konfiguracji (którą wczytaliśmy w __init__.py)
+    admin_recipients = current_app.config.get('ORDER_NOTIFICATION_RECIPIENTS', [])
+
+    msg = Message(
+        subject=f"Potwierdzenie Zamówienia #{order.id} (Klient: {user.username})",
+        recipients=[user.email] + admin_recipients,
+        body=f"Dziękujemy za złożenie zamówienia nr {order.id}. Szczegóły znajdują się w załączniku PDF.\n\n(Ta wiadomość została wysłana do klienta oraz do administratorów systemu)."
+    )
+    msg.attach(
+        f"zamowienie_{order.id}.pdf",
+        "application/pdf",
+        pdf_file
+    )
+    # Błąd SMTP = wyjątek = ponowienie zadania z opóźnieniem
+    mail.send(msg)
+
+@job_handler('new_order_admin_notification')
+def _job_new_order_admin_notification(payload):
+    """Powiadomienie "dzwonka" o nowym zamówieniu dla adminów i power userów."""
+    order = Order.query.get(payload['order_id'])
+    if not order:
+        return
+    admins_to_notify = User.query.filter(User.role.in_(['admin', 'power_user'])).all()
+    for admin in admins_to_notify:
+        _create_notification(
+            user_id=admin.id,
+            title="Nowe zamówienie!",
+            body=f"Klient {order.user.username} złożył nowe zamówienie #{order.id}.",
+            link_url="/admin/orders" # Link do listy zamówień w panelu admina
+        )
+
+def _enqueue_shipment_notifications(orders):
     """
-    Generuje PDF dla danego zamówienia, GRUPUJĄC produkty.
-    (Ta funkcja pozostaje bez zmian od ostatniego razu)
+    Kolejkuje powiadomienia o wysyłce (dzwonek, PUSH, e-mail) jako osobne zadania,
+    żeby ponowienie np. e-maila nie dublowało powiadomień PUSH.
+    Status zapisujemy w treści zadania - liczy się stan z chwili wysyłki.
+    Zadania dla wszystkich zamówień dodajemy zbiorczo (wysyłka całej fali).
     """
-    grouped_items = {}
-    for item in order.items:
-        key = item.product_name
-        if key not in grouped_items:
-            grouped_items[key] = {
-                "name": item.product_name,
-                "variants": []
-            }
-        
-        item_total_price = 0
-        if item.price_at_order is not None:
-             item_total_price = item.price_at_order * item.quantity
-
-        grouped_items[key]["variants"].append({
-            "size": item.variant_size,
-            "quantity": item.quantity,
-            "price_at_order": item.price_at_order,
-            "total_price": item_total_price
-        })
+    payloads = [
+        {"order_id": order.id, "status": order.status}
+        for order in orders if order.status in ('partial', 'completed')
+    ]
+    if not payloads:
+        return
+    enqueue_jobs('shipment_bell_notification', payloads)
+    enqueue_jobs('shipment_push_notification', payloads)
+    enqueue_jobs('shipment_status_email', payloads)
+
+@job_handler('shipment_bell_notification')
+def _job_shipment_bell_notification(payload):
+    order_id = payload['order_id']
+    order = Order.query.get(order_id)
+    if not order:
+        return
+    if payload['status'] == 'partial':
+        title = "Zamówienie częściowo wysłane"
+        body = f"Część Twojego zamówienia #{order_id} została wysłana."
+    else:
+        title = "Zamówienie zrealizowane"
+        body = f"Twoje zamówienie #{order_id} zostało w pełni zrealizowane."
+
+    _create_notification(
+        user_id=order.user_id, # Wyślij do klienta, który złożył zamówienie
+        title=title,
+        body=body,
+        link_url="/dashboard/orders" # Link do "Moje Zamówienia"
+    )
+
+@job_handler('shipment_push_notification')
+def _job_shipment_push_notification(payload):
+    order_id = payload['order_id']
+    order = Order.query.get(order_id)
+    if not order:
+        return
+    if payload['status'] == 'partial':
+        title = "Twoje zamówienie jest w drodze!"
+        body = f"Część Twojego zamówienia #{order_id} została wysłana."
+    else: # completed
+        title = "Twoje zamówienie zostało zrealizowane!"
+        body = f"Wszystkie produkty z zamówienia #{order_id} zostały wysłane."
+
+    user_subscriptions = PushSubscription.query.filter_by(user_id=order.user_id).all()
+    click_data = {"url": "/dashboard/orders"}
+
+    summary = dispatch_push(user_subscriptions, title, body, click_data)
+    if summary["failed"]:
+        print(f"OSTRZEŻENIE: PUSH o statusie zamówienia #{order_id}: nieudane {summary['failed']} z {summary['total']}")
+
+@job_handler('shipment_status_email')
+def _job_shipment_status_email(payload):
+    order_id = payload['order_id']
+    order = Order.query.get(order_id)
+    if not order:
+        return
+
+    # Używamy imienia klienta, jeśli istnieje, dla personalizacji
+    customer_name = order.user.first_name or order.user.username
+
+    if payload['status'] == 'partial':
+        title = f"Twoje zamówienie #{order_id} zostało częściowo wysłane"
+        body_text = (f"Cześć {customer_name},\n\n"
+                     f"Dobra wiadomość! Część Twojego zamówienia #{order_id} została właśnie wysłana.\n"
+                     f"Historię wysłanych paczek możesz śledzić w swoim panelu klienta.\n\n"
+                     f"Pozdrawiamy,\nZespół Obsługi")
+    else:
+        title = f"Twoje zamówienie #{order_id} zostało zrealizowane"
+        body_text = (f"Cześć {customer_name},\n\n"
+                     f"Wszystkie produkty z Twojego zamówienia #{order_id} zostały wysłane.\n"
+                     f"Dziękujemy za zakupy!\n\n"
+                     f"Pozdrawiamy,\nZespół Obsługi")
+
+    msg = Message(
+        subject=title,
+        recipients=[order.user.email], # Wyślij tylko do klienta
+        body=body_text
+    )
+    mail.send(msg)
+
 
-    context = {
-        "order": order,
-        "user": user,
-        "grouped_items": grouped_items.values()
+def _validate_cart_items(user_id, cart_items):
+    """
+    Waliduje cały koszyk stałą liczbą zapytań (niezależnie od liczby pozycji):
+    jedno zapytanie o warianty razem z produktami i jedno o przypisania klienta.
+    Zwraca (poprawne_pozycje, błędy), gdzie poprawne_pozycje to lista
+    krotek (wariant, ilość), a błędy - lista WSZYSTKICH błędnych linii.
+    """
+    errors = []
+    parsed_lines = []
+
+    for index, item in enumerate(cart_items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "variant_id": None, "msg": "Nieprawidłowy format pozycji."})
+            continue
+
+        variant_id = item.get('variant_id')
+        try:
+            variant_id = int(variant_id)
+            quantity = int(item.get('quantity'))
+        except (TypeError, ValueError):
+            errors.append({"index": index, "variant_id": variant_id, "msg": "ID wariantu i ilość muszą być liczbami."})
+            continue
+
+        if quantity <= 0:
+            errors.append({"index": index, "variant_id": variant_id, "msg": "Ilość musi być większa od 0."})
+            continue
+
+        parsed_lines.append((index, variant_id, quantity))
+
+    # 1. Wszystkie warianty (z produktami) jednym zapytaniem
+    requested_ids = {variant_id for _, variant_id, _ in parsed_lines}
+    variants_by_id = {}
+    if requested_ids:
+        variants = ProductVariant.query.options(
+            joinedload(ProductVariant.product)
+        ).filter(ProductVariant.id.in_(requested_ids)).all()
+        variants_by_id = {variant.id: variant for variant in variants}
+
+    # 2. Zbiór ID produktów przypisanych do klienta (sprawdzanie O(1))
+    assigned_product_ids = {
+        product_id for (product_id,) in db.session.query(
+            client_product_assignment.c.product_id
+        ).filter(client_product_assignment.c.user_id == user_id)
     }
-    
-    return _generate_pdf_from_template('pdf/order_confirmation.html', context)
+
+    valid_lines = []
+    for index, variant_id, quantity in parsed_lines:
+        variant = variants_by_id.get(variant_id)
+        if not variant:
+            errors.append({"index": index, "variant_id": variant_id, "msg": f"Wariant o ID {variant_id} nie istnieje."})
+            continue
+        if variant.product_id not in assigned_product_ids:
+            errors.append({"index": index, "variant_id": variant_id, "msg": f"Brak dostępu do produktu: {variant.product.name}"})
+            continue
+        valid_lines.append((variant, quantity))
+
+    errors.sort(key=lambda error: error["index"])
+    return valid_lines, errors
 
 
 @api_bp.route('/orders', methods=['POST'])
@@ -460,6 +734,9 @@ def create_order():
     
     if not cart_items:
         return jsonify({"msg": "Koszyk jest pusty"}), 400
+
+    if not isinstance(cart_items, list):
+        return jsonify({"msg": "Pozycje koszyka muszą być listą"}), 400
         
     claims = get_jwt()
     user_id = claims.get('id')
@@ -468,30 +745,40 @@ def create_order():
     if not user:
         return jsonify({"msg": "Użytkownik nie znaleziony"}), 404
 
+    # Walidacja całego koszyka PRZED utworzeniem zamówienia.
+    # Zwracamy wszystkie błędne pozycje naraz, a nie tylko pierwszą.
+    valid_lines, cart_errors = _validate_cart_items(user.id, cart_items)
+    if cart_errors:
+        return jsonify({
+            "msg": f"Koszyk zawiera nieprawidłowe pozycje ({len(cart_errors)}). {cart_errors[0]['msg']}",
+            "errors": cart_errors
+        }), 400
+
     # ZMIANA: Dodajemy 'notes' podczas tworzenia zamówienia
     new_order = Order(user_id=user.id, status='new', notes=notes)
     db.session.add(new_order)
     
     # --- BLOK 1: KRYTYCZNY (Zapis do Bazy Danych) ---
     try:
-        for item in cart_items: # Iterujemy po 'cart_items', a nie 'data'
-            # ... (reszta tego bloku 'try' pozostaje bez zmian) ...
-            variant = ProductVariant.query.get(item.get('variant_id'))
-            if not variant:
-                raise Exception(f"Wariant o ID {item.get('variant_id')} nie istnieje.")
-            
-            if variant.product not in user.assigned_products:
-                 raise Exception(f"Brak dostępu do produktu: {variant.product.name}")
-
+        for variant, quantity in valid_lines: # Pozycje są już zwalidowane
             order_item = OrderItem(
                 order=new_order,
                 variant_id=variant.id,
-                quantity=item.get('quantity'),
+                quantity=quantity,
                 product_name=variant.product.name,
                 variant_size=variant.size,
                 price_at_order=variant.price
             )
             db.session.add(order_item)
+
+        new_order.recalculate_totals()
+        db.session.flush()
+        index_orders([new_order.id])
+        record_order(new_order)
+
+        # Efekty uboczne kolejkujemy w tej samej transakcji (wykonają się po commit-cie)
+        enqueue_job('order_confirmation_email', {"order_id": new_order.id})
+        enqueue_job('new_order_admin_notification', {"order_id": new_order.id})
         
         db.session.commit()
     
@@ -500,54 +787,8 @@ def create_order():
         print(f"KRYTYCZNY BŁĄD BAZY DANYCH: {str(e)}")
         return jsonify({"msg": f"Wystąpił błąd przy zapisie do bazy: {str(e)}"}), 500
 
-    # --- BLOK 2: NIEKRYTYCZNY (PDF i E-mail) ---
-    try:
-        # 1. Wywołaj nową funkcję pomocniczą
-        pdf_file = _generate_order_pdf(new_order, user)
-        
-        # 2. Stwórz i wyślij e-mail z załącznikiem
-        
-        # Pobierz listę adminów z konfiguracji (którą wczytaliśmy w __init__.py)
-        admin_recipients = current_app.config.get('ORDER_NOTIFICATION_RECIPIENTS', [])
-        
-        # Stwórz finalną listę odbiorców: Klient + Admini
-        all_recipients = [user.email] + admin_recipients
-
-        msg = Message(
-            # ZMIANA: Lepszy tytuł dla admina
-            subject=f"Potwierdzenie Zamówienia #{new_order.id} (Klient: {user.username})",
-            # ZMIANA: Wyślij do wszystkich
-            recipients=all_recipients, 
-            body=f"Dziękujemy za złożenie zamówienia nr {new_order.id}. Szczegóły znajdują się w załączniku PDF.\n\n(Ta wiadomość została wysłana do klienta oraz do administratorów systemu)."
-        )
-        msg.attach(
-            f"zamowienie_{new_order.id}.pdf",
-            "application/pdf",
-            pdf_file
-        )
-        mail.send(msg)
-
-    except Exception as e:
-        # Ta logika pozostaje bez zmian - łapie błędy PDF lub maila
-        print(f"--- OSTRZEŻENIE: Nie udało się wysłać e-maila z potw. dla zamówienia #{new_order.id} ---")
-        print(f"--- Błąd: {str(e)} ---")
-        warning_msg = f"Zamówienie {new_order.id} przyjęte, ale nie udało się wysłać e-maila: {str(e)}"
-        response_data = new_order.to_dict()
-        response_data['email_warning'] = warning_msg 
-        # --- NOWA LOGIKA: Powiadomienie "Dzwonka" dla Adminów ---
-    try:
-        # Znajdź wszystkich adminów i power userów
-        admins_to_notify = User.query.filter(User.role.in_(['admin', 'power_user'])).all()
-        for admin in admins_to_notify:
-            _create_notification(
-                user_id=admin.id,
-                title="Nowe zamówienie!",
-                body=f"Klient {user.username} złożył nowe zamówienie #{new_order.id}.",
-                link_url=f"/admin/orders" # Link do listy zamówień w panelu admina
-            )
-    except Exception as e:
-        print(f"BŁĄD: Nie udało się wysłać powiadomienia 'dzwonka' dla admina: {e}")
-    # --- KONIEC NOWEJ LOGIKI ---
+    # --- BLOK 2: NIEKRYTYCZNY (PDF, e-mail, powiadomienia) ---
+    # Wykonują się w tle (app/jobs.py), zadania zapisały się razem z zamówieniem.
 
     # --- SUKCES ---
     return jsonify(new_order.to_dict()), 201 
@@ -581,46 +822,101 @@ def shipping_required():
         return decorator
     return wrapper
 
+def _shipping_order_dict(order, include_items=True):
+    """Zamówienie + podstawowe dane klienta (format używany w panelu spedycji)."""
+    order_dict = order.to_dict(include_items=include_items)
+    order_dict['user_info'] = {
+        "username": order.user.username,
+        "email": order.user.email,
+        "first_name": order.user.first_name,
+        "last_name": order.user.last_name
+    }
+    return order_dict
+
 @api_bp.route('/shipping/orders', methods=['GET'])
 @shipping_required()
 def get_all_orders():
     """
     Zwraca wszystkie zamówienia, z możliwością filtrowania
     wg statusu i wyszukiwania klienta.
+
+    Paginacja (opcjonalna): 'limit' i 'cursor'. Sortujemy po (created_at, id)
+    malejąco, a kursor wskazuje ostatnie zamówienie poprzedniej strony.
+    Wtedy zwracamy {"orders", "next_cursor", "has_more", "total"}.
+    'total' liczymy tylko dla pierwszej strony (bez kursora) - liczenie
+    całej historii przy każdej stronie odebrałoby zysk z kursora.
+    Na kolejnych stronach 'total' to null.
+
+    'search' przeszukuje indeks pełnotekstowy (numer, klient, e-mail, uwagi,
+    produkty). Z 'sort=relevance' wyniki są sortowane wg trafności
+    (wtedy bez kursora - tylko pierwsza strona 'limit' wyników).
+
+    'fields=summary' zwraca zamówienia bez pozycji (same sumy:
+    total_quantity, total_shipped, total_value, line_count).
     """
     try:
         # --- Pobieranie filtrów (bez zmian) ---
         status_filter = request.args.get('status')
         search_query = request.args.get('search')
+        raw_limit = request.args.get('limit')
+        cursor = request.args.get('cursor')
+        paginated = raw_limit is not None or cursor is not None
+        include_items = request.args.get('fields') != 'summary'
         
-        query = Order.query.order_by(Order.created_at.desc())
+        query = Order.query
         
         if status_filter and status_filter != 'all':
             query = query.filter(Order.status == status_filter)
             
+        by_relevance = False
         if search_query:
-            query = query.join(User).filter(
-                User.username.ilike(f"%{search_query}%")
+            query, by_relevance = apply_order_search(
+                query, search_query,
+                by_relevance=request.args.get('sort') == 'relevance'
             )
-        
-        all_matching_orders = query.all()
-        
-        orders_data = []
-        for order in all_matching_orders:
-            order_dict = order.to_dict()
-            
-            # --- ZMIANA TUTAJ: Dodajemy imię i nazwisko ---
-            order_dict['user_info'] = {
-                "username": order.user.username,
-                "email": order.user.email,
-                "first_name": order.user.first_name, # <-- DODANO
-                "last_name": order.user.last_name   # <-- DODANO
-            }
-            # --- KONIEC ZMIANY ---
-            
-            orders_data.append(order_dict)
-            
-        return jsonify(orders_data), 200
+
+        # Pozycje i klienci całej strony ładowani zbiorczo (bez N+1)
+        query = query.options(joinedload(Order.user))
+        if include_items:
+            query = query.options(selectinload(Order.items))
+        if not by_relevance:
+            query = query.order_by(Order.created_at.desc(), Order.id.desc())
+
+        if not paginated:
+            return jsonify([_shipping_order_dict(order, include_items) for order in query.all()]), 200
+
+        try:
+            limit = parse_page_size(raw_limit)
+            if cursor and by_relevance:
+                raise ValueError("Sortowanie wg trafności nie obsługuje kursora")
+            if cursor:
+                last_created_at, last_id = decode_cursor(cursor, 2)
+                if not isinstance(last_created_at, datetime.datetime) or not isinstance(last_id, int):
+                    raise ValueError("Nieprawidłowy kursor")
+                query = query.filter(or_(
+                    Order.created_at < last_created_at,
+                    and_(Order.created_at == last_created_at, Order.id < last_id)
+                ))
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 400
+
+        # Pobieramy o jeden więcej, żeby wiedzieć, czy jest następna strona
+        page = query.limit(limit + 1).all()
+        has_more = len(page) > limit
+        page = page[:limit]
+        if cursor:
+            total = None
+        elif has_more:
+            total = query.order_by(None).count()
+        else:
+            total = len(page)
+
+        return jsonify({
+            "orders": [_shipping_order_dict(order, include_items) for order in page],
+            "next_cursor": encode_cursor([page[-1].created_at, page[-1].id]) if has_more and not by_relevance else None,
+            "has_more": has_more,
+            "total": total
+        }), 200
 
     except Exception as e:
         print(f"Błąd podczas pobierania wszystkich zamówień: {str(e)}")
@@ -659,6 +955,15 @@ def get_order_counts_by_status():
         return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
 
 
+# Limit zamówień w jednej fali wysyłki (jedna transakcja)
+SHIP_BATCH_MAX_ORDERS = 500
+
+def _is_write_conflict(error):
+    """Czy błąd to wyścig z innym zapisem (wersja wiersza / zablokowana baza SQLite) - do ponowienia."""
+    if isinstance(error, StaleDataError):
+        return True
+    return isinstance(error, OperationalError) and 'locked' in str(error.orig).lower()
+
 # ---------------------------------------------------------------------
 # NOWA, PRZEBUDOWANA FUNKCJA DO WYSYŁKI (z historią)
 # ---------------------------------------------------------------------
@@ -669,6 +974,12 @@ def ship_order_items(order_id):
     Realizuje wysyłkę, tworzy wpis w historii (Shipment)
     i automatycznie aktualizuje status całego zamówienia.
     Oczekuje JSON: {"items": [{"item_id": 1, "quantity_to_ship": 2}, ...]}
+    Opcjonalne "version" pozycji (z listy zamówień) - wysyłka tylko, jeśli
+    nikt jej w międzyczasie nie zmienił.
+
+    Równoległe wysyłki są bezpieczne (warunkowe UPDATE, app/shipping.py).
+    Gdy ktoś inny zdążył wysłać te same sztuki, zwracamy 409
+    z "retryable": true - wystarczy odświeżyć zamówienie i ponowić.
     """
     order = Order.query.get_or_404(order_id)
     data = request.get_json()
@@ -682,164 +993,106 @@ def ship_order_items(order_id):
     shipping_user_id = claims.get('id')
 
     try:
-        # 1. Stwórz jedną "paczkę" (Shipment) dla tej transakcji
-        new_shipment = Shipment(
-            order_id=order.id,
-            shipped_by_user_id=shipping_user_id
-        )
-        db.session.add(new_shipment)
-        
-        # Lista do walidacji (aby nie wysłać niczego pustego)
-        processed_items = []
+        # 1-3. Paczka (Shipment), jej pozycje, wysłane ilości, sumy i status zamówienia
+        lines = parse_ship_lines(items_to_ship_data)
+        ship_items(order, lines, shipping_user_id)
 
-        # 2. Przejdź przez pozycje do wysłania z żądania
-        for item_data in items_to_ship_data:
-            item_id = item_data.get('item_id')
-            try:
-                quantity_to_ship = int(item_data.get('quantity_to_ship', 0))
-            except ValueError:
-                raise Exception(f"Ilość dla pozycji {item_id} musi być liczbą.")
-            
-            if quantity_to_ship <= 0:
-                continue # Pomiń, jeśli ktoś wysłał 0
+        index_orders([order.id])
+        _enqueue_shipment_notifications([order])
 
-            order_item = OrderItem.query.get(item_id)
-            
-            # Walidacja
-            if not order_item or order_item.order_id != order_id:
-                raise Exception(f"Pozycja o ID {item_id} nie należy do tego zamówienia.")
-            
-            remaining_to_ship = order_item.quantity - order_item.shipped_quantity
-            if quantity_to_ship > remaining_to_ship:
-                raise Exception(f"Nie można wysłać {quantity_to_ship} szt. '{order_item.product_name}'. Pozostało: {remaining_to_ship}.")
-            
-            # --- KLUCZOWA LOGIKA ---
-            
-            # AKCJA 1: Zaktualizuj starą kolumnę (dla kompatybilności wstecznej)
-            order_item.shipped_quantity += quantity_to_ship
-            
-            # AKCJA 2: Stwórz nowy wpis w historii (ShipmentItem)
-            new_shipment_item = ShipmentItem(
-                quantity_shipped=quantity_to_ship,
-                shipment=new_shipment, # Połącz z nową "paczką"
-                order_item=order_item  # Połącz z pozycją zamówienia
-            )
-            db.session.add(new_shipment_item)
-            processed_items.append(new_shipment_item)
-            
-        # Jeśli formularz był pusty (wszystkie pozycje = 0), rzuć błąd
-        if not processed_items:
-            raise Exception("Nie wybrano żadnych produktów do wysłania (ilość musi być > 0).")
-
-        # 3. Automatyczna aktualizacja statusu zamówienia (na podstawie starej kolumny)
-        total_ordered_count = 0
-        total_shipped_count = 0
-        for item in order.items:
-            total_ordered_count += item.quantity
-            total_shipped_count += item.shipped_quantity
-            
-        if total_shipped_count == 0:
-            order.status = 'new'
-        elif total_shipped_count < total_ordered_count:
-            order.status = 'partial'
-        else:
-            order.status = 'completed'
-
-        # 4. Zapisz wszystko do bazy (Shipment, ShipmentItems, OrderItems, Order)
+        # 4. Zapisz wszystko do bazy (Shipment, ShipmentItems, OrderItems, Order, zadania)
         db.session.commit()
+        invalidate_orders([order.id])
+        invalidate_timeseries('status')
 
-        # --- NOWA LOGIKA: Powiadomienie "Dzwonka" dla Klienta ---
-        try:
-            title = None
-            body = None
-            if order.status == 'partial':
-                title = "Zamówienie częściowo wysłane"
-                body = f"Część Twojego zamówienia #{order.id} została wysłana."
-            elif order.status == 'completed':
-                title = "Zamówienie zrealizowane"
-                body = f"Twoje zamówienie #{order.id} zostało w pełni zrealizowane."
-
-            if title: # Tylko jeśli status się zmienił na 'partial' lub 'completed'
-                _create_notification(
-                    user_id=order.user_id, # Wyślij do klienta, który złożył zamówienie
-                    title=title,
-                    body=body,
-                    link_url="/dashboard/orders" # Link do "Moje Zamówienia"
-                )
-        except Exception as e:
-            print(f"BŁĄD: Nie udało się wysłać powiadomienia 'dzwonka' dla klienta: {e}")
-        # --- KONIEC NOWEJ LOGIKI ---
+        # 5-7. Powiadomienia (dzwonek, PUSH, e-mail) idą przez kolejkę zadań w tle
+        
+        # 8. Zwróć zaktualizowane zamówienie (stary blok 7)
+        return jsonify(_shipping_order_dict(order)), 200
 
-        # 5. Automatyczne powiadomienia PUSH (ta logika już tu jest i zadziała)
-        try:
-            if order.status == 'partial' or order.status == 'completed':
-                # ... (logika wysyłania PUSH, którą już mamy) ...
-                if order.status == 'partial':
-                    title = "Twoje zamówienie jest w drodze!"
-                    body = f"Część Twojego zamówienia #{order.id} została wysłana."
-                else: # completed
-                    title = "Twoje zamówienie zostało zrealizowane!"
-                    body = f"Wszystkie produkty z zamówienia #{order.id} zostały wysłane."
-                
-                user_subscriptions = PushSubscription.query.filter_by(user_id=order.user_id).all()
-                click_data = {"url": "/dashboard/orders"}
-                
-                for sub in user_subscriptions:
-                    _send_push_notification(sub.subscription_json, title, body, click_data)
-        except Exception as e:
-            print(f"BŁĄD: Nie udało się wysłać powiadomienia PUSH o statusie: {e}")
+    except ShippingConflict as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), 409
+    except ShippingError as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        if _is_write_conflict(e):
+            print(f"OSTRZEŻENIE: Konflikt zapisu przy wysyłce zamówienia #{order_id}: {e}")
+            return jsonify({"msg": "Zamówienie jest właśnie zmieniane przez kogoś innego. Spróbuj ponownie.", "retryable": True}), 409
+        return jsonify({"msg": str(e)}), 400
+    
+@api_bp.route('/shipping/orders/ship-batch', methods=['POST'])
+@shipping_required()
+def ship_orders_batch():
+    """
+    Wysyłka całej fali zamówień jednym żądaniem (np. po liście do spakowania).
+    Oczekuje JSON: {"orders": [{"order_id": 1, "items": [{"item_id": 1, "quantity_to_ship": 2}, ...]}, ...]}
 
-        # 7. --- NOWA LOGIKA: E-MAIL O STATUSIE WYSYŁKI ---
-        try:
-            title = None
-            body_text = None
-            
-            # Używamy imienia klienta, jeśli istnieje, dla personalizacji
-            customer_name = order.user.first_name or order.user.username
-
-            if order.status == 'partial':
-                title = f"Twoje zamówienie #{order.id} zostało częściowo wysłane"
-                body_text = (f"Cześć {customer_name},\n\n"
-                             f"Dobra wiadomość! Część Twojego zamówienia #{order.id} została właśnie wysłana.\n"
-                             f"Historię wysłanych paczek możesz śledzić w swoim panelu klienta.\n\n"
-                             f"Pozdrawiamy,\nZespół Obsługi")
-
-            elif order.status == 'completed':
-                title = f"Twoje zamówienie #{order.id} zostało zrealizowane"
-                body_text = (f"Cześć {customer_name},\n\n"
-                             f"Wszystkie produkty z Twojego zamówienia #{order.id} zostały wysłane.\n"
-                             f"Dziękujemy za zakupy!\n\n"
-                             f"Pozdrawiamy,\nZespół Obsługi")
-
-            # Jeśli status się zgadza, wyślij e-mail
-            if title and body_text:
-                msg = Message(
-                    subject=title,
-                    recipients=[order.user.email], # Wyślij tylko do klienta
-                    body=body_text
-                )
-                mail.send(msg)
-        
-        except Exception as e:
-            # Błąd wysyłki e-maila nie może zatrzymać całej operacji
-            print(f"BŁĄD: Nie udało się wysłać e-maila o statusie wysyłki: {e}")
-        # --- KONIEC NOWEJ LOGIKI ---
+    Wszystko albo nic: paczki, pozycje, statusy i powiadomienia zapisują się
+    w jednej transakcji. Błąd którejkolwiek pozycji = 400 (dane) lub 409
+    (ktoś inny zdążył wysłać te sztuki - można ponowić) i nic się nie zmienia.
+    """
+    data = request.get_json() or {}
+    orders_data = data.get('orders')
 
-        
-        # 8. Zwróć zaktualizowane zamówienie (stary blok 7)
-        order_dict = order.to_dict()
-        order_dict['user_info'] = {
-            "username": order.user.username,
-            "email": order.user.email,
-            "first_name": order.user.first_name,
-            "last_name": order.user.last_name
+    if not orders_data or not isinstance(orders_data, list):
+        return jsonify({"msg": "Brak zamówień do wysłania"}), 400
+    if len(orders_data) > SHIP_BATCH_MAX_ORDERS:
+        return jsonify({"msg": f"Jednorazowo można wysłać maksymalnie {SHIP_BATCH_MAX_ORDERS} zamówień"}), 400
+
+    claims = get_jwt()
+    shipping_user_id = claims.get('id')
+
+    try:
+        requested = {}
+        for order_data in orders_data:
+            order_id = order_data.get('order_id') if isinstance(order_data, dict) else None
+            if type(order_id) is not int: # True/False to też int
+                raise ShippingError("Każde zamówienie musi mieć liczbowe 'order_id'.")
+            if order_id in requested:
+                raise ShippingError(f"Zamówienie #{order_id} występuje na liście więcej niż raz.")
+            requested[order_id] = parse_ship_lines(order_data.get('items'))
+
+        # Wszystkie zamówienia jednym zapytaniem
+        orders = {order.id: order for order in Order.query.filter(Order.id.in_(requested))}
+        missing = [order_id for order_id in requested if order_id not in orders]
+        if missing:
+            raise ShippingError(f"Nie znaleziono zamówień: {', '.join(map(str, missing))}.")
+
+        ship_orders([(orders[order_id], lines) for order_id, lines in requested.items()], shipping_user_id)
+
+        order_ids = list(requested)
+        index_orders(order_ids)
+        shipped_orders = Order.query.options(joinedload(Order.user)).filter(Order.id.in_(order_ids)).all()
+        _enqueue_shipment_notifications(shipped_orders)
+
+        # Odpowiedź budujemy przed commit-em (potem obiekty w sesji wygasają)
+        result = {
+            "shipped_orders": len(shipped_orders),
+            "orders": [_shipping_order_dict(order, include_items=False) for order in shipped_orders]
         }
-        return jsonify(order_dict), 200
+        db.session.commit()
+        invalidate_orders(order_ids)
+        invalidate_timeseries('status')
+
+        return jsonify(result), 200
 
+    except ShippingConflict as e:
+        db.session.rollback()
+        return jsonify(e.to_dict()), 409
+    except ShippingError as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 400
     except Exception as e:
         db.session.rollback()
-        return jsonify({"msg": str(e)}), 40
-    
+        if _is_write_conflict(e):
+            print(f"OSTRZEŻENIE: Konflikt zapisu przy wysyłce fali zamówień: {e}")
+            return jsonify({"msg": "Zamówienia są właśnie zmieniane przez kogoś innego. Spróbuj ponownie.", "retryable": True}), 409
+        print(f"Błąd podczas wysyłki fali zamówień: {str(e)}")
+        return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
+
 @api_bp.route('/me', methods=['GET'])
 @jwt_required() # Dowolny zalogowany użytkownik
 def get_my_profile():
@@ -877,8 +1130,14 @@ def update_my_profile():
     
     if 'last_name' in data:
         user.last_name = data['last_name']
+
+    customer_data_changed = any(key in data for key in ('email', 'first_name', 'last_name'))
+    if customer_data_changed:
+        reindex_user_orders(user.id)
         
     db.session.commit()
+    if customer_data_changed:
+        invalidate_user_orders(user.id)
     
     # Zwróć zaktualizowane dane
     return jsonify({
@@ -927,15 +1186,13 @@ def get_dashboard_stats():
         start_date_str = request.args.get('start_date')
         end_date_str = request.args.get('end_date')
         
-        # Bazowe zapytania, które będziemy filtrować
-        order_query = Order.query
-        item_query = db.session.query(OrderItem).join(Order, OrderItem.order_id == Order.id)
+        # Statystyki liczymy z dziennych agregatów (app/rollups.py), a nie z pozycji zamówień
+        start_date = None
+        end_date = None
         
         if start_date_str:
             try:
                 start_date = datetime.datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                order_query = order_query.filter(Order.created_at >= start_date)
-                item_query = item_query.filter(Order.created_at >= start_date)
             except ValueError:
                 return jsonify({"msg": "Nieprawidłowy format start_date. Wymagany RRRR-MM-DD"}), 400
 
@@ -943,64 +1200,24 @@ def get_dashboard_stats():
             try:
                 # Dodajemy 1 dzień, aby 'end_date' był włącznie (czyli do końca dnia)
                 end_date = datetime.datetime.strptime(end_date_str, '%Y-%m-%d').date() + datetime.timedelta(days=1)
-                order_query = order_query.filter(Order.created_at < end_date)
-                item_query = item_query.filter(Order.created_at < end_date)
             except ValueError:
                 return jsonify({"msg": "Nieprawidłowy format end_date. Wymagany RRRR-MM-DD"}), 400
         
         # --- KONIEC LOGIKI FILTROWANIA ---
 
-        # 1. Obliczamy całkowitą wartość (na podstawie przefiltrowanych pozycji)
-        total_revenue = item_query.with_entities(
-            func.sum(OrderItem.price_at_order * OrderItem.quantity)
-        ).scalar() or 0.0
-
-        # 2. Liczymy łączne liczby (na podstawie przefiltrowanych zamówień)
-        total_orders = order_query.count()
+        # 1-4. Przychód, liczba zamówień, top 5 produktów i top 5 klientów w zakresie dat
+        total_revenue, total_orders, top_products, top_clients = dashboard_rollup(start_date, end_date)
         
         # Te statystyki są globalne, nie filtrujemy ich
         total_users = db.session.query(func.count(User.id)).scalar()
         total_products = db.session.query(func.count(Product.id)).scalar()
 
-        # 3. Top 5 najczęściej zamawianych produktów (na podstawie przefiltrowanych pozycji)
-        top_products = item_query.group_by(
-            OrderItem.product_name
-        ).with_entities(
-            OrderItem.product_name,
-            func.sum(OrderItem.quantity).label('total_quantity')
-        ).order_by(
-            func.sum(OrderItem.quantity).desc()
-        ).limit(5).all()
-        
         top_products_data = [
             {"name": name, "quantity": int(qty)} for name, qty in top_products
         ]
-
-        # 4. Top 5 klientów (na podstawie przefiltrowanych zamówień)
-        # Musimy użyć 'order_query' jako podzapytania, aby było to wydajne
-        
-        # Krok 4a: Zdobądź przefiltrowane ID zamówień
-        filtered_order_ids = [order.id for order in order_query.all()]
-        
-        if not filtered_order_ids:
-             top_clients_data = []
-        else:
-            top_clients = db.session.query(
-                User.username,
-                func.count(Order.id).label('order_count')
-            ).join(
-                Order, User.id == Order.user_id
-            ).filter(
-                Order.id.in_(filtered_order_ids) # Filtruj tylko po przefiltrowanych zamówieniach
-            ).group_by(
-                User.id
-            ).order_by(
-                func.count(Order.id).desc()
-            ).limit(5).all()
-
-            top_clients_data = [
-                {"username": username, "orders": count} for username, count in top_clients
-            ]
+        top_clients_data = [
+            {"username": username, "orders": int(count)} for username, count in top_clients
+        ]
 
         # Zwróć wszystko w jednym obiekcie
         return jsonify({
@@ -1020,6 +1237,159 @@ def get_dashboard_stats():
         print(f"Błąd podczas generowania statystyk: {str(e)}")
         return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
     
+def _limited_export(build_response):
+    """
+    Eksport strumieniowy zajmuje wątek serwera do końca pobierania - na proces
+    najwyżej EXPORT_STREAM_MAX_CONNECTIONS naraz, kolejne dostają 503.
+    """
+    response = limited_response(
+        'exports', current_app.config.get('EXPORT_STREAM_MAX_CONNECTIONS', 0), build_response
+    )
+    if response is None:
+        response = jsonify({"msg": "Trwa już zbyt wiele eksportów. Spróbuj ponownie za chwilę."})
+        response.headers['Retry-After'] = '30'
+        return response, 503
+    return response
+
+@api_bp.route('/admin/export/<dataset>', methods=['GET'])
+@admin_required()
+def export_data(dataset):
+    """
+    Strumieniowy eksport: 'orders', 'items' (pozycje zamówień) lub 'shipments' (pozycje paczek).
+    Parametry: 'format' (csv / ndjson), 'start_date', 'end_date' (RRRR-MM-DD, włącznie),
+    'status' (status zamówienia), 'user_id' (klient).
+    """
+    output_format = request.args.get('format', 'csv')
+    if output_format not in EXPORT_FORMATS:
+        return jsonify({"msg": f"Nieprawidłowy 'format' (dozwolone: {', '.join(EXPORT_FORMATS)})"}), 400
+
+    try:
+        start_date = datetime.datetime.strptime(request.args['start_date'], '%Y-%m-%d') \
+            if request.args.get('start_date') else None
+        end_date = datetime.datetime.strptime(request.args['end_date'], '%Y-%m-%d') + datetime.timedelta(days=1) \
+            if request.args.get('end_date') else None
+    except ValueError:
+        return jsonify({"msg": "Nieprawidłowy format daty. Wymagany RRRR-MM-DD"}), 400
+
+    user_id = request.args.get('user_id')
+    if user_id is not None:
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            return jsonify({"msg": "'user_id' musi być liczbą"}), 400
+
+    try:
+        statement = export_statement(
+            dataset, start_date=start_date, end_date=end_date,
+            status=request.args.get('status') or None, user_id=user_id
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 404
+
+    def build_response():
+        mimetype = 'text/csv' if output_format == 'csv' else 'application/x-ndjson'
+        response = Response(stream_with_context(stream_export(statement, output_format)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = \
+            f"attachment; filename={dataset}_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.{'csv' if output_format == 'csv' else 'ndjson'}"
+        response.headers['X-Accel-Buffering'] = 'no' # Bez buforowania w nginx
+        return response
+
+    return _limited_export(build_response)
+
+@api_bp.route('/admin/timeseries', methods=['GET'])
+@admin_required()
+def get_order_timeseries():
+    """
+    Zamówienia, sztuki i przychód w czasie (do wykresów kokpitu).
+    Parametry: 'start_date', 'end_date' (RRRR-MM-DD, włącznie; domyślnie ostatnie 30 dni),
+    'bucket' (day / week / month), 'split' (status / product),
+    'window' - liczba kubełków średniej kroczącej (0 = bez średnich).
+    """
+    today = datetime.datetime.utcnow().date()
+    try:
+        end_date = datetime.datetime.strptime(request.args['end_date'], '%Y-%m-%d').date() \
+            if request.args.get('end_date') else today
+        start_date = datetime.datetime.strptime(request.args['start_date'], '%Y-%m-%d').date() \
+            if request.args.get('start_date') else end_date - datetime.timedelta(days=29)
+    except ValueError:
+        return jsonify({"msg": "Nieprawidłowy format daty. Wymagany RRRR-MM-DD"}), 400
+
+    try:
+        window = int(request.args.get('window', 0))
+    except ValueError:
+        return jsonify({"msg": "'window' musi być liczbą"}), 400
+    if not 0 <= window <= 366:
+        return jsonify({"msg": "'window' musi być z zakresu 0-366"}), 400
+
+    try:
+        data = order_timeseries(
+            start_date,
+            end_date + datetime.timedelta(days=1), # 'end_date' włącznie
+            bucket=request.args.get('bucket', 'day'),
+            split=request.args.get('split') or None,
+            window=window
+        )
+    except ValueError as e:
+        return jsonify({"msg": str(e)}), 400
+
+    return jsonify(data), 200
+
+@api_bp.route('/admin/jobs', methods=['GET'])
+@admin_required()
+def get_jobs():
+    """
+    Podgląd kolejki zadań w tle: liczniki statusów + ostatnie zadania.
+    Opcjonalny filtr 'status' (queued / running / done / failed).
+    """
+    status_filter = request.args.get('status')
+    query = BackgroundJob.query
+    if status_filter:
+        query = query.filter(BackgroundJob.status == status_filter)
+    jobs = query.order_by(BackgroundJob.id.desc()).limit(50).all()
+
+    return jsonify({
+        "counts": job_stats(),
+        "jobs": [job.to_dict() for job in jobs]
+    }), 200
+
+@api_bp.route('/admin/jobs/<int:job_id>', methods=['GET'])
+@admin_required()
+def get_job(job_id):
+    """Status pojedynczego zadania w tle."""
+    job = BackgroundJob.query.get_or_404(job_id)
+    return jsonify(job.to_dict()), 200
+
+@api_bp.route('/admin/jobs/<int:job_id>/retry', methods=['POST'])
+@admin_required()
+def retry_job(job_id):
+    """Ponownie kolejkuje zadanie, które ostatecznie się nie powiodło."""
+    job = BackgroundJob.query.get_or_404(job_id)
+    if job.status != 'failed':
+        return jsonify({"msg": "Ponowić można tylko zadanie ze statusem 'failed'"}), 400
+
+    job.status = 'queued'
+    job.attempts = 0
+    job.run_at = datetime.datetime.utcnow()
+    job.finished_at = None
+    db.session.info['jobs_enqueued'] = True
+    db.session.commit()
+    return jsonify(job.to_dict()), 200
+
+@job_handler('rebuild_rollups')
+def _job_rebuild_rollups(payload):
+    """Przebudowa dziennych agregatów statystyk (np. po imporcie starych zamówień)."""
+    days = rebuild_rollups()
+    invalidate_timeseries(all_splits=True)
+    print(f"Przebudowano agregaty dzienne: {days} dni")
+
+@api_bp.route('/admin/rollups/rebuild', methods=['POST'])
+@admin_required()
+def rebuild_dashboard_rollups():
+    """Kolejkuje przebudowę agregatów kokpitu jako zadanie w tle."""
+    job = enqueue_job('rebuild_rollups', max_attempts=1)
+    db.session.commit()
+    return jsonify(job.to_dict()), 202
+
 @api_bp.route('/admin/latest-orders', methods=['GET'])
 @admin_required()
 def get_latest_orders():
@@ -1045,38 +1415,6 @@ def get_latest_orders():
         print(f"Błąd podczas pobierania ostatnich zamówień: {str(e)}")
         return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
     
-def _send_push_notification(subscription_info_json, title, body, data=None):
-    """
-    Wysyła pojedyncze powiadomienie.
-    'subscription_info_json' to string JSON z bazy danych.
-    """
-    try:
-        subscription_info = json.loads(subscription_info_json)
-        payload = {
-            "title": title,
-            "body": body,
-            "data": data or {} # Dodatkowe dane, np. link do kliknięcia
-        }
-        
-        webpush(
-            subscription_info=subscription_info,
-            data=json.dumps(payload),
-            vapid_private_key=current_app.config['VAPID_PRIVATE_KEY'],
-            vapid_claims=current_app.config['VAPID_CLAIMS']
-        )
-    except WebPushException as ex:
-        # Jeśli subskrypcja wygasła (kod 410), powinniśmy ją usunąć
-        if ex.response.status_code == 410:
-            print(f"Subskrypcja wygasła i zostanie usunięta: {ex.response.text}")
-            # Znajdź i usuń subskrypcję
-            PushSubscription.query.filter_by(subscription_json=subscription_info_json).delete()
-            db.session.commit()
-        else:
-            print(f"Błąd podczas wysyłania PUSH: {ex}")
-    except Exception as e:
-        print(f"Inny błąd PUSH: {e}")
-
-
 # --- API do subskrypcji dla Klienta ---
 
 @api_bp.route('/subscribe-push', methods=['POST'])
@@ -1090,19 +1428,33 @@ def subscribe_push():
     if not subscription_data or 'endpoint' not in subscription_data:
         return jsonify({"msg": "Brak danych subskrypcji"}), 400
         
-    subscription_json = json.dumps(subscription_data)
-    
-    # Sprawdź, czy ta subskrypcja (ten endpoint) już istnieje
-    existing_sub = PushSubscription.query.filter_by(subscription_json=subscription_json).first()
-    
-    if not existing_sub:
-        new_sub = PushSubscription(
-            user_id=user_id,
-            subscription_json=subscription_json
-        )
-        db.session.add(new_sub)
+    if not isinstance(subscription_data['endpoint'], str) or not subscription_data['endpoint'].strip():
+        return jsonify({"msg": "Nieprawidłowy endpoint subskrypcji"}), 400
+
+    # Upsert po indeksowanym skrócie endpointu: ta sama przeglądarka
+    # (ten sam endpoint) nadpisuje swój wpis zamiast tworzyć duplikat
+    endpoint_hash = PushSubscription.hash_endpoint(subscription_data['endpoint'])
+    existing_sub = PushSubscription.query.filter_by(endpoint_hash=endpoint_hash).first()
+
+    if existing_sub:
+        # Klucze mogły się zmienić, a na tej przeglądarce może być zalogowany ktoś inny
+        existing_sub.user_id = user_id
+        existing_sub.set_subscription(subscription_data)
         db.session.commit()
-        print(f"Zapisano nową subskrypcję dla usera {user_id}")
+    else:
+        new_sub = PushSubscription(user_id=user_id)
+        new_sub.set_subscription(subscription_data)
+        db.session.add(new_sub)
+        try:
+            db.session.commit()
+            print(f"Zapisano nową subskrypcję dla usera {user_id}")
+        except IntegrityError:
+            # Równoległe żądanie z tym samym endpointem zdążyło pierwsze
+            db.session.rollback()
+            existing_sub = PushSubscription.query.filter_by(endpoint_hash=endpoint_hash).first()
+            existing_sub.user_id = user_id
+            existing_sub.set_subscription(subscription_data)
+            db.session.commit()
     
     return jsonify({"success": True}), 201
 
@@ -1153,11 +1505,15 @@ def send_custom_push():
     subscriptions = query.all()
     if not subscriptions:
         return jsonify({"msg": "Nie znaleziono subskrypcji pasujących do kryteriów"}), 404
-        
-    for sub in subscriptions:
-        _send_push_notification(sub.subscription_json, title, body)
-        
-    return jsonify({"msg": f"Wysłano powiadomienie do {len(subscriptions)} subskrypcji"}), 200
+
+    # Równoległa wysyłka; wynik zawiera status każdej subskrypcji
+    summary = dispatch_push(subscriptions, title, body)
+
+    return jsonify({
+        "msg": (f"Wysłano powiadomienie do {summary['delivered']} z {summary['total']} subskrypcji "
+                f"(wygasłe: {summary['expired']}, błędy: {summary['failed']})"),
+        **summary
+    }), 200
 
 # --- Endpoint do pobierania PDF na żądanie ---
 
@@ -1176,15 +1532,27 @@ def get_order_pdf(order_id):
         return jsonify({"msg": "Brak dostępu do tego zasobu"}), 403
         
     try:
-        # Wywołaj naszą funkcję pomocniczą
-        pdf_data = _generate_order_pdf(order, order.user)
-        
-        # Stwórz odpowiedź Flask z surowymi danymi PDF
-        response = make_response(pdf_data)
-        response.headers['Content-Type'] = 'application/pdf'
-        # 'inline' otwiera w nowej karcie; 'attachment' wymusza pobieranie
-        response.headers['Content-Disposition'] = f'inline; filename=zamowienie_{order.id}.pdf'
-        
+        # PDF renderujemy tylko, jeśli nie ma go w cache dla bieżącej treści zamówienia
+        pdf_path, etag = cached_order_pdf(order, lambda: _generate_order_pdf(order, order.user))
+
+        def send(source):
+            # send_file obsługuje ETag/If-None-Match (304) oraz Range (206)
+            return send_file(
+                source,
+                mimetype='application/pdf',
+                as_attachment=False, # 'inline' otwiera w nowej karcie
+                download_name=f'zamowienie_{order.id}.pdf',
+                conditional=True,
+                etag=etag,
+                max_age=0
+            )
+
+        try:
+            response = send(pdf_path)
+        except FileNotFoundError:
+            # Inny worker usunął plik z cache (limit rozmiaru), zanim go otworzyliśmy
+            response = send(io.BytesIO(_generate_order_pdf(order, order.user)))
+        response.cache_control.private = True
         return response
 
     except Exception as e:
@@ -1284,6 +1652,75 @@ def reset_password():
         print(f"Błąd podczas resetowania hasła: {str(e)}")
         return jsonify({"msg": "Token jest nieprawidłowy lub wygasł"}), 422
     
+EXPORT_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
+@api_bp.route('/orders/export-pdf', methods=['POST'])
+@shipping_required()
+def export_orders_pdf():
+    """
+    Zbiorcze pobranie potwierdzeń zamówień (PDF) jako ZIP, wysyłany strumieniowo.
+    Oczekuje JSON: {"order_ids": [1, 2, 3]} albo filtra {"status", "start_date", "end_date"}
+    (RRRR-MM-DD, włącznie). Opcjonalne "export_id" pozwala śledzić postęp
+    (GET /orders/export-pdf/<export_id>) jeszcze w trakcie pobierania.
+    """
+    data = request.get_json(silent=True) or {}
+    query = db.session.query(Order.id)
+
+    if 'order_ids' in data:
+        order_ids = data.get('order_ids')
+        # type() zamiast isinstance() - True/False to też int
+        if not order_ids or not isinstance(order_ids, list) or not all(type(i) is int for i in order_ids):
+            return jsonify({"msg": "'order_ids' musi być niepustą listą liczb"}), 400
+        existing = {order_id for (order_id,) in query.filter(Order.id.in_(order_ids))}
+        order_ids = [order_id for order_id in dict.fromkeys(order_ids) if order_id in existing]
+    else:
+        if not any(data.get(key) for key in ('status', 'start_date', 'end_date')):
+            return jsonify({"msg": "Podaj 'order_ids' albo filtr: 'status', 'start_date', 'end_date'"}), 400
+        try:
+            if data.get('start_date'):
+                query = query.filter(Order.created_at >= datetime.datetime.strptime(data['start_date'], '%Y-%m-%d'))
+            if data.get('end_date'):
+                end_date = datetime.datetime.strptime(data['end_date'], '%Y-%m-%d') + datetime.timedelta(days=1)
+                query = query.filter(Order.created_at < end_date)
+        except (TypeError, ValueError):
+            return jsonify({"msg": "Nieprawidłowy format daty. Wymagany RRRR-MM-DD"}), 400
+        if data.get('status'):
+            query = query.filter(Order.status == data['status'])
+        order_ids = [order_id for (order_id,) in query.order_by(Order.created_at, Order.id)]
+
+    if not order_ids:
+        return jsonify({"msg": "Nie znaleziono zamówień do eksportu"}), 404
+    max_orders = current_app.config.get('PDF_EXPORT_MAX_ORDERS', 5000)
+    if len(order_ids) > max_orders:
+        return jsonify({"msg": f"Zbyt wiele zamówień ({len(order_ids)}, maks. {max_orders}) - zawęź filtr"}), 400
+
+    export_id = data.get('export_id')
+    if export_id is not None and (not isinstance(export_id, str) or not EXPORT_ID_PATTERN.match(export_id)):
+        return jsonify({"msg": "Nieprawidłowe 'export_id' (8-64 znaki: litery, cyfry, '-', '_')"}), 400
+    if export_id is not None and export_exists(export_id):
+        return jsonify({"msg": "Eksport o tym 'export_id' już istnieje"}), 409
+
+    def build_response():
+        started_id = start_export(len(order_ids), export_id)
+        response = Response(stream_with_context(stream_orders_zip(started_id, order_ids)), mimetype='application/zip')
+        response.headers['Content-Disposition'] = \
+            f"attachment; filename=zamowienia_{datetime.datetime.now().strftime('%Y%m%d_%H%M')}.zip"
+        response.headers['X-Export-Id'] = started_id
+        response.headers['X-Export-Total'] = str(len(order_ids))
+        response.headers['X-Accel-Buffering'] = 'no' # Bez buforowania w nginx
+        return response
+
+    return _limited_export(build_response)
+
+@api_bp.route('/orders/export-pdf/<export_id>', methods=['GET'])
+@shipping_required()
+def get_export_pdf_progress(export_id):
+    """Postęp eksportu ZIP (z bazy - działa w każdym procesie serwera)."""
+    progress = export_progress(export_id)
+    if progress is None:
+        return jsonify({"msg": "Nie znaleziono eksportu"}), 404
+    return jsonify(progress), 200
+
 @api_bp.route('/orders/<int:order_id>/shipments', methods=['GET'])
 @jwt_required()
 def get_order_shipments(order_id):
@@ -1314,33 +1751,6 @@ def get_order_shipments(order_id):
         print(f"Błąd podczas pobierania historii wysyłek: {str(e)}")
         return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
     
-    # --- Helper do generowania PDF (zmodyfikowany, aby przyjmował szablon) ---
-def _generate_pdf_from_template(template_name, context):
-    """Generuje PDF z danego szablonu i kontekstu."""
-    try:
-        html_content = render_template(template_name, **context)
-        
-        result_buffer = io.BytesIO()
-        
-        # --- ZMIANA: Dodajemy 'link_callback' ---
-        pisa_status = pisa.CreatePDF(
-                html_content,
-                dest=result_buffer,
-                encoding='utf-8',
-                link_callback=link_callback # <-- Mówi PDF, jak znaleźć loga
-        )
-        # --- KONIEC ZMIANY ---
-
-        if pisa_status.err:
-            raise Exception(f"Błąd podczas generowania PDF: {pisa_status.err}")
-
-        pdf_data = result_buffer.getvalue()
-        result_buffer.close()
-        return pdf_data
-    except Exception as e:
-        print(f"Błąd podczas _generate_pdf_from_template: {e}")
-        raise e
-
 # --- Endpoint do Listy do Spakowania ---
 @api_bp.route('/shipping/picking-list-pdf', methods=['POST'])
 @shipping_required()
@@ -1354,54 +1764,31 @@ def get_picking_list_pdf():
 
     if not order_ids or not isinstance(order_ids, list):
         return jsonify({"msg": "Nie podano listy ID zamówień"}), 400
+    # type() zamiast isinstance() - True/False to też int
+    if not all(type(i) is int for i in order_ids):
+        return jsonify({"msg": "'order_ids' musi być niepustą listą liczb"}), 400
 
     try:
-        # 1. Znajdź wszystkie NIEREALIZOWANE pozycje z wybranych zamówień
-        items_to_pick = db.session.query(OrderItem).filter(
-            OrderItem.order_id.in_(order_ids),
-            OrderItem.shipped_quantity < OrderItem.quantity # Kluczowy warunek!
-        ).all()
+        # 1. Zsumowane w bazie (GROUP BY) pozostałe sztuki per produkt/wariant
+        aggregated_items = [
+            {**item, "orders": [f"#{order_id}" for order_id in item["orders"]]}
+            for item in picking_rows(order_ids)
+        ]
 
-        if not items_to_pick:
+        if not aggregated_items:
             return jsonify({"msg": "Wszystkie pozycje z wybranych zamówień zostały już zrealizowane."}), 404
 
-        # 2. Zagreguj (zsumuj) produkty
-        aggregated_list = {}
-        for item in items_to_pick:
-            key = f"{item.product_name}_{item.variant_size}"
-            remaining_to_ship = item.quantity - item.shipped_quantity
-            
-            if key not in aggregated_list:
-                aggregated_list[key] = {
-                    "name": item.product_name,
-                    "size": item.variant_size,
-                    "total_quantity": 0,
-                    "orders": set() # Używamy 'set', aby uniknąć duplikatów ID
-                }
-            
-            aggregated_list[key]['total_quantity'] += remaining_to_ship
-            aggregated_list[key]['orders'].add(f"#{item.order_id}") # Dodaj ID zamówienia
-
-        # Konwertuj 'set' na listę, aby można było ją posortować i połączyć
-        final_items_list = sorted(
-            [
-                {**item, "orders": sorted(list(item["orders"]), key=lambda x: int(x[1:]))} 
-                for item in aggregated_list.values()
-            ],
-            key=lambda x: x['name'] # Sortuj alfabetycznie po nazwie
-        )
-
-        # 3. Przygotuj kontekst dla szablonu
+        # 2. Przygotuj kontekst dla szablonu
         context = {
-            "aggregated_items": final_items_list,
+            "aggregated_items": aggregated_items,
             "order_ids_str": ", ".join([f"#{id}" for id in order_ids]),
             "generated_at": datetime.datetime.now().strftime('%Y-%m-%d %H:%M')
         }
         
-        # 4. Wygeneruj PDF
-        pdf_data = _generate_pdf_from_template('pdf/picking_list.html', context)
+        # 3. Wygeneruj PDF
+        pdf_data = render_pdf('picking_list', context)
         
-        # 5. Zwróć PDF do przeglądarki
+        # 4. Zwróć PDF do przeglądarki
         response = make_response(pdf_data)
         response.headers['Content-Type'] = 'application/pdf'
         response.headers['Content-Disposition'] = 'inline; filename=lista_do_spakowania.pdf'
@@ -1412,22 +1799,91 @@ def get_picking_list_pdf():
         print(f"Błąd podczas generowania listy do spakowania: {str(e)}")
         return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
     
+@api_bp.route('/shipping/picking-list', methods=['POST'])
+@shipping_required()
+def get_picking_list():
+    """
+    Lista do spakowania jako dane (strumieniowane wiersz po wierszu).
+    Oczekuje JSON: {"order_ids": [1, 2, 3]}. Parametr 'format': json (domyślnie) lub csv.
+    """
+    data = request.get_json(silent=True) or {}
+    order_ids = data.get('order_ids')
+    output_format = request.args.get('format', 'json')
+
+    if not order_ids or not isinstance(order_ids, list):
+        return jsonify({"msg": "Nie podano listy ID zamówień"}), 400
+    # type() zamiast isinstance() - True/False to też int
+    if not all(type(i) is int for i in order_ids):
+        return jsonify({"msg": "'order_ids' musi być niepustą listą liczb"}), 400
+    if output_format not in ('json', 'csv'):
+        return jsonify({"msg": "Nieprawidłowy 'format' (dozwolone: json, csv)"}), 400
+
+    first, rows = peek(picking_rows(order_ids))
+    if first is None:
+        return jsonify({"msg": "Wszystkie pozycje z wybranych zamówień zostały już zrealizowane."}), 404
+
+    def build_response():
+        if output_format == 'csv':
+            response = Response(stream_with_context(stream_csv(rows)), mimetype='text/csv')
+            response.headers['Content-Disposition'] = 'attachment; filename=lista_do_spakowania.csv'
+        else:
+            response = Response(stream_with_context(stream_json(rows)), mimetype='application/json')
+        response.headers['X-Accel-Buffering'] = 'no' # Bez buforowania w nginx
+        return response
+
+    # Strumień zajmuje wątek jak eksport admina - ten sam limit
+    return _limited_export(build_response)
+
     # --- API DLA CENTRUM POWIADOMIEŃ (DZWONKA) ---
 
+# Maksymalna liczba zmian zwracanych jako delta ('since'); przy większej - pełna lista
+NOTIFICATION_DELTA_LIMIT = 50
+
 @api_bp.route('/me/notifications', methods=['GET'])
 @jwt_required()
 def get_my_notifications():
-    """Pobiera listę powiadomień dla zalogowanego użytkownika."""
+    """
+    Pobiera listę powiadomień dla zalogowanego użytkownika.
+
+    Z 'since' (wartość 'seq' z poprzedniej odpowiedzi) zwraca tylko powiadomienia
+    nowe lub zmienione od tamtej chwili, a 304 - jeśli nic się nie zmieniło.
+    Gdy zmian jest więcej niż NOTIFICATION_DELTA_LIMIT (np. "przeczytaj wszystkie"
+    przy wielu nieprzeczytanych - wszystkie dostają ten sam 'seq'), zwracamy pełną
+    listę jak bez 'since' z "full": true - klient zastępuje nią swoją listę.
+    """
     claims = get_jwt()
     user_id = claims.get('id')
-    
-    # Pobieramy 20 ostatnich, nieprzeczytane na górze
-    notifications = Notification.query.filter_by(
-        user_id=user_id
-    ).order_by(
-        Notification.is_read.asc(),
-        Notification.created_at.desc()
-    ).limit(20).all()
+
+    since = request.args.get('since')
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return jsonify({"msg": "'since' musi być liczbą"}), 400
+
+    # Jedno odczytanie po kluczu głównym mówi, czy cokolwiek się zmieniło
+    current_seq = db.session.query(User.notification_seq).filter(User.id == user_id).scalar() or 0
+    if since is not None and since >= current_seq:
+        return '', 304
+
+    notifications = None
+    if since is not None:
+        notifications = Notification.query.filter(
+            Notification.user_id == user_id,
+            Notification.seq > since
+        ).order_by(Notification.seq.desc(), Notification.id.desc()).limit(NOTIFICATION_DELTA_LIMIT + 1).all()
+        if len(notifications) > NOTIFICATION_DELTA_LIMIT:
+            notifications = None # Zmian za dużo na deltę - pełna lista poniżej
+    full = notifications is None
+    if full:
+        # Pobieramy 20 ostatnich, nieprzeczytane na górze
+        notifications = Notification.query.filter_by(
+            user_id=user_id
+        ).order_by(
+            Notification.is_read.asc(),
+            Notification.created_at.desc(),
+            Notification.id.desc()
+        ).limit(20).all()
     
     # Zlicz nieprzeczytane
     unread_count = Notification.query.filter_by(
@@ -1437,9 +1893,71 @@ def get_my_notifications():
 
     return jsonify({
         "notifications": [n.to_dict() for n in notifications],
-        "unread_count": unread_count
+        "unread_count": unread_count,
+        "seq": current_seq,
+        "full": full
     }), 200
 
+@api_bp.route('/me/notifications/stream-ticket', methods=['POST'])
+@jwt_required()
+def create_notification_stream_ticket():
+    """
+    Jednorazowy bilet do strumienia powiadomień (ważny STREAM_TICKET_TTL sekund).
+    EventSource nie wysyła nagłówków, a token JWT w adresie trafiłby do logów serwera.
+    """
+    claims = get_jwt()
+    try:
+        ticket = issue_stream_ticket(claims.get('id'))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": f"Błąd serwera: {str(e)}"}), 500
+    return jsonify({"ticket": ticket, "expires_in": STREAM_TICKET_TTL}), 201
+
+@api_bp.route('/me/notifications/stream', methods=['GET'])
+@jwt_required(optional=True)
+def stream_my_notifications():
+    """
+    Strumień SSE z nowymi powiadomieniami (zdarzenia 'notification' i 'read').
+    Uwierzytelnienie: nagłówek Authorization albo ?ticket= z /me/notifications/stream-ticket
+    (jednorazowy). Wznowienie: nagłówek Last-Event-ID (lub ?last_event_id=) = ID ostatniego
+    powiadomienia. 503, gdy worker ma już NOTIFICATION_STREAM_MAX_CONNECTIONS strumieni -
+    klient odpytuje wtedy /me/notifications.
+    """
+    user_id = get_jwt().get('id')
+    if user_id is None:
+        ticket = request.args.get('ticket')
+        user_id = redeem_stream_ticket(ticket) if ticket else None
+        if user_id is None:
+            return jsonify({"msg": "Brak lub nieważny bilet strumienia"}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({"msg": "Nieprawidłowy Last-Event-ID"}), 400
+
+    def build_response():
+        stream = notification_stream(
+            user_id,
+            last_event_id=last_event_id,
+            heartbeat=current_app.config.get('NOTIFICATION_STREAM_HEARTBEAT', 15),
+            max_seconds=current_app.config.get('NOTIFICATION_STREAM_MAX_SECONDS', 300)
+        )
+        response = Response(stream_with_context(stream), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no' # Bez buforowania w nginx
+        return response
+
+    response = limited_response(
+        'notifications', current_app.config.get('NOTIFICATION_STREAM_MAX_CONNECTIONS', 0), build_response
+    )
+    if response is None:
+        response = jsonify({"msg": "Zbyt wiele otwartych strumieni, odpytuj /me/notifications."})
+        response.headers['Retry-After'] = '60'
+        return response, 503
+    return response
+
 @api_bp.route('/me/notifications/mark-read', methods=['POST'])
 @jwt_required()
 def mark_notifications_as_read():
@@ -1448,13 +1966,18 @@ def mark_notifications_as_read():
     user_id = claims.get('id')
     
     try:
-        Notification.query.filter_by(
+        unread = Notification.query.filter_by(
             user_id=user_id,
             is_read=False
-        ).update(
-            {"is_read": True}
         )
+        if db.session.query(unread.exists()).scalar():
+            # Przeczytane powiadomienia dostają nowy numer zmiany (widać je w 'since')
+            unread.update(
+                {"is_read": True, "seq": User.bump_notification_seq(user_id)},
+                synchronize_session=False
+            )
         db.session.commit()
+        publish_all_read(user_id)
         return jsonify({"success": True}), 200
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,242 @@
+# /backend/app/search.py
+"""
+Indeks pełnotekstowy zamówień dla panelu spedycji (SQLite FTS5).
+
+Jeden wiersz indeksu = jedno zamówienie (rowid = Order.id). Indeksujemy:
+numer zamówienia, login, imię, nazwisko, e-mail klienta, uwagi
+oraz nazwy produktów i rozmiary z pozycji zamówienia.
+
+Indeks tworzy i wypełnia 'flask reindex-orders', a potem aktualizujemy go
+przyrostowo w tej samej transakcji co zapis zamówienia (index_orders /
+reindex_user_orders). Gdy indeksu jeszcze nie ma albo baza nie obsługuje
+FTS5 (np. PostgreSQL), wyszukiwanie wraca do zwykłego ILIKE po tych samych polach.
+"""
+import re
+import threading
+import unicodedata
+from sqlalchemy import text, select, table, column, or_, cast, String
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, selectinload, joinedload
+from .models import db, Order, OrderItem, User
+
+FTS_TABLE = 'order_search'
+
+# Lekki opis tabeli FTS (poza db.metadata, żeby create_all jej nie tworzył)
+order_search_table = table(FTS_TABLE, column('rowid'), column('rank'))
+
+_REINDEX_BATCH_SIZE = 500
+
+_init_lock = threading.Lock()
+_fts_available = None  # None = nie wiadomo (jeszcze nie znaleziono indeksu)
+
+
+def _table_exists(connection):
+    return connection.execute(text(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"
+    ), {"name": FTS_TABLE}).first() is not None
+
+
+def search_enabled():
+    """
+    Czy indeks FTS5 istnieje. Tylko sprawdza - indeks tworzy i wypełnia
+    'flask reindex-orders' (create_search_index + rebuild_search_index),
+    bo pełna przebudowa przy dużej historii trwa zbyt długo jak na żądanie HTTP.
+    Dopóki indeksu nie ma, wyszukiwanie działa przez ILIKE.
+    """
+    global _fts_available
+    if _fts_available is not None:
+        return _fts_available
+
+    if db.engine.dialect.name != 'sqlite':
+        _fts_available = False
+        return False
+
+    with db.engine.connect() as conn:
+        exists = _table_exists(conn)
+    if exists:
+        # Raz znaleziony indeks zapamiętujemy; brak sprawdzamy ponownie,
+        # żeby procesy zauważyły indeks utworzony w międzyczasie z CLI
+        _fts_available = True
+    return exists
+
+
+def create_search_index():
+    """Tworzy pustą tabelę FTS5, jeśli jej nie ma. Zwraca False, gdy baza nie obsługuje FTS5."""
+    global _fts_available
+    if db.engine.dialect.name != 'sqlite':
+        return False
+
+    with _init_lock:
+        try:
+            with db.engine.begin() as conn:
+                if not _table_exists(conn):
+                    conn.execute(text(
+                        f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                        "order_ref, username, first_name, last_name, email, notes, items, "
+                        "tokenize = 'unicode61 remove_diacritics 2')"
+                    ))
+        except OperationalError as e:
+            print(f"OSTRZEŻENIE: Indeks FTS5 niedostępny, wyszukiwanie przez ILIKE: {e}")
+            return False
+        _fts_available = True
+    return True
+
+
+def _fold(value):
+    """
+    Ujednolica tekst do indeksu i zapytań: bez polskich znaków, małe litery.
+    ('ł' nie rozkłada się w Unicode, więc zamieniamy je ręcznie.)
+    """
+    value = (value or '').replace('ł', 'l').replace('Ł', 'L')
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def _document_for(order):
+    """Buduje wiersz indeksu dla zamówienia (z załadowanymi user i items)."""
+    user = order.user
+    items = []
+    seen = set()
+    for item in order.items:
+        entry = f"{item.product_name or ''} {item.variant_size or ''}".strip()
+        if entry and entry not in seen:
+            seen.add(entry)
+            items.append(entry)
+
+    return {
+        "rowid": order.id,
+        "order_ref": f"{order.id} #{order.id}",
+        "username": _fold(user.username) if user else '',
+        "first_name": _fold(user.first_name) if user else '',
+        "last_name": _fold(user.last_name) if user else '',
+        "email": _fold(user.email) if user else '',
+        "notes": _fold(order.notes),
+        "items": _fold("\n".join(items))
+    }
+
+
+def _index_batch(session, order_ids):
+    orders = session.query(Order).options(
+        joinedload(Order.user),
+        selectinload(Order.items)
+    ).filter(Order.id.in_(order_ids)).all()
+
+    documents = [_document_for(order) for order in orders]
+    if documents:
+        session.execute(text(
+            f"INSERT OR REPLACE INTO {FTS_TABLE} "
+            "(rowid, order_ref, username, first_name, last_name, email, notes, items) "
+            "VALUES (:rowid, :order_ref, :username, :first_name, :last_name, :email, :notes, :items)"
+        ), documents)
+
+
+def index_orders(order_ids):
+    """
+    Dodaje/odświeża zamówienia w indeksie w bieżącej transakcji.
+    Błąd indeksu nie może zablokować zapisu zamówienia - wtedy tylko logujemy.
+    """
+    order_ids = list({order_id for order_id in order_ids if order_id is not None})
+    if not order_ids or not search_enabled():
+        return
+
+    try:
+        with db.session.begin_nested():
+            _index_batch(db.session, order_ids)
+    except Exception as e:
+        print(f"BŁĄD: Nie udało się zaktualizować indeksu wyszukiwania: {e}")
+
+
+def reindex_user_orders(user_id):
+    """Odświeża w indeksie wszystkie zamówienia klienta (np. po zmianie danych)."""
+    if not search_enabled():
+        return
+    order_ids = [order_id for (order_id,) in db.session.query(Order.id).filter(Order.user_id == user_id)]
+    for start in range(0, len(order_ids), _REINDEX_BATCH_SIZE):
+        index_orders(order_ids[start:start + _REINDEX_BATCH_SIZE])
+
+
+def rebuild_search_index():
+    """
+    Przebudowuje cały indeks od zera we własnej sesji (nie rusza db.session).
+    Zwraca liczbę zaindeksowanych zamówień.
+    """
+    if not search_enabled():
+        return 0
+
+    total = 0
+    with Session(db.engine) as session:
+        session.execute(text(f"DELETE FROM {FTS_TABLE}"))
+        last_id = 0
+        while True:
+            batch = [order_id for (order_id,) in session.query(Order.id).filter(
+                Order.id > last_id
+            ).order_by(Order.id).limit(_REINDEX_BATCH_SIZE)]
+            if not batch:
+                break
+            _index_batch(session, batch)
+            session.expunge_all()
+            total += len(batch)
+            last_id = batch[-1]
+        session.commit()
+    return total
+
+
+def _fts_query(query_text):
+    """
+    Zamienia tekst wpisany przez użytkownika na bezpieczne zapytanie FTS5:
+    każde słowo w cudzysłowie jako prefiks, wszystkie słowa muszą wystąpić.
+    """
+    tokens = re.findall(r'\w+', _fold(query_text), re.UNICODE)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _match_subquery(query_text):
+    return select(
+        order_search_table.c.rowid,
+        order_search_table.c.rank
+    ).where(
+        text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=_fts_query(query_text))
+    ).subquery()
+
+
+def apply_order_search(query, query_text, by_relevance=False):
+    """
+    Zawęża zapytanie o zamówienia do wyników wyszukiwania.
+    'by_relevance' sortuje wyniki wg trafności (tylko z FTS5).
+    Zwraca (zapytanie, czy_posortowano_wg_trafności).
+    """
+    if search_enabled():
+        if not _fts_query(query_text):
+            return query.filter(Order.id.is_(None)), False
+        matches = _match_subquery(query_text)
+        query = query.join(matches, matches.c.rowid == Order.id)
+        if by_relevance:
+            return query.order_by(matches.c.rank, Order.id.desc()), True
+        return query, False
+
+    # Fallback bez FTS5: ILIKE po tych samych polach
+    pattern = f"%{query_text}%"
+    item_match = select(OrderItem.id).where(
+        OrderItem.order_id == Order.id,
+        or_(OrderItem.product_name.ilike(pattern), OrderItem.variant_size.ilike(pattern))
+    ).exists()
+    query = query.join(User, Order.user_id == User.id).filter(or_(
+        cast(Order.id, String) == query_text.strip().lstrip('#'),
+        User.username.ilike(pattern),
+        User.first_name.ilike(pattern),
+        User.last_name.ilike(pattern),
+        User.email.ilike(pattern),
+        Order.notes.ilike(pattern),
+        item_match
+    ))
+    return query, False
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    """
+    Filtr dla Alembica (Flask-Migrate): tabele FTS5 tworzymy sami,
+    więc 'flask db migrate' nie może proponować ich usunięcia.
+    """
+    if type_ == 'table' and reflected and compare_to is None and name.startswith(FTS_TABLE):
+        return False
+    return True
@@ -0,0 +1,246 @@
+# /backend/app/shipping.py
+"""
+Realizacja wysyłek bez globalnej blokady.
+
+Wysłane ilości zwiększamy warunkowym UPDATE:
+    UPDATE order_item SET shipped_quantity = shipped_quantity + n, version = version + 1
+    WHERE id = ? AND shipped_quantity + n <= quantity
+Jeśli dwóch pakowaczy wysyła to samo w tej samej chwili, baza przepuści
+tylko jednego. Drugi dostaje ShippingConflict (HTTP 409), odświeża dane
+i może spróbować ponownie. Sumy i status zamówienia zmieniamy tak samo,
+atomowo po stronie bazy.
+"""
+import datetime
+from sqlalchemy import and_, bindparam, case
+from .models import db, Order, OrderItem, Shipment, ShipmentItem
+
+
+class ShippingError(Exception):
+    """Błędne żądanie wysyłki (HTTP 400)."""
+
+
+class ShippingConflict(Exception):
+    """Pozycja zmieniła się w międzyczasie - po odświeżeniu można ponowić (HTTP 409)."""
+
+    def __init__(self, msg, item_id=None, remaining=None, version=None):
+        super().__init__(msg)
+        self.item_id = item_id
+        self.remaining = remaining
+        self.version = version
+
+    def to_dict(self):
+        return {
+            "msg": str(self),
+            "retryable": True,
+            "item_id": self.item_id,
+            "remaining": self.remaining,
+            "version": self.version
+        }
+
+
+def parse_ship_lines(items_data):
+    """
+    Zamienia [{"item_id", "quantity_to_ship", "version"?}, ...] na listę
+    (item_id, ilość, wersja_lub_None). Pozycje z ilością 0 pomijamy,
+    powtórzone item_id sumujemy.
+    """
+    if items_data is not None and not isinstance(items_data, list):
+        raise ShippingError("'items' musi być listą pozycji.")
+    lines = {}
+    for item_data in items_data or []:
+        if not isinstance(item_data, dict):
+            raise ShippingError("Każda pozycja musi być obiektem z 'item_id' i 'quantity_to_ship'.")
+        item_id = item_data.get('item_id')
+        # type() zamiast isinstance() - True/False to też int
+        if type(item_id) is not int:
+            raise ShippingError("Każda pozycja musi mieć liczbowe 'item_id'.")
+        try:
+            quantity = int(item_data.get('quantity_to_ship', 0))
+        except (TypeError, ValueError):
+            raise ShippingError(f"Ilość dla pozycji {item_id} musi być liczbą.")
+        if quantity <= 0:
+            continue # Pomiń, jeśli ktoś wysłał 0
+
+        version = item_data.get('version')
+        if version is not None and type(version) is not int:
+            raise ShippingError(f"Wersja pozycji {item_id} musi być liczbą.")
+        if item_id in lines:
+            quantity += lines[item_id][1]
+            version = lines[item_id][2] if version is None else version
+        lines[item_id] = (item_id, quantity, version)
+    return list(lines.values())
+
+
+def _conflict_for(item, quantity):
+    """Odczytuje aktualny stan pozycji po nieudanym warunkowym UPDATE."""
+    current = db.session.query(
+        OrderItem.quantity, OrderItem.shipped_quantity, OrderItem.version
+    ).filter(OrderItem.id == item.id).one()
+    remaining = current.quantity - current.shipped_quantity
+    return ShippingConflict(
+        f"Pozycja '{item.product_name}' została w międzyczasie zmieniona. "
+        f"Pozostało do wysłania: {remaining}, próbowano: {quantity}. Odśwież i spróbuj ponownie.",
+        item_id=item.id, remaining=remaining, version=current.version
+    )
+
+
+def _reserve_item(item, quantity, version=None):
+    """Warunkowo zwiększa shipped_quantity. Zwraca False, jeśli ktoś był szybszy."""
+    conditions = [
+        OrderItem.id == item.id,
+        OrderItem.shipped_quantity + quantity <= OrderItem.quantity
+    ]
+    if version is not None:
+        conditions.append(OrderItem.version == version)
+    updated = db.session.query(OrderItem).filter(*conditions).update({
+        "shipped_quantity": OrderItem.shipped_quantity + quantity,
+        "version": OrderItem.version + 1
+    }, synchronize_session=False)
+    return updated == 1
+
+
+def _reserve_one_by_one(reservations):
+    for item, quantity, version in reservations:
+        if not _reserve_item(item, quantity, version):
+            raise _conflict_for(item, quantity)
+
+
+def _reserve_items(reservations):
+    """
+    Warunkowe UPDATE dla wszystkich pozycji [(pozycja, ilość, wersja)].
+    Gdy sterownik podaje wiarygodną liczbę zmienionych wierszy dla executemany
+    (np. SQLite), wysyłamy jedno zapytanie dla całej listy.
+    """
+    dialect = db.session.get_bind().dialect
+    if len(reservations) == 1 or not dialect.supports_sane_multi_rowcount \
+            or any(version is not None for _, _, version in reservations):
+        _reserve_one_by_one(reservations)
+        return
+
+    table = OrderItem.__table__
+    savepoint = db.session.begin_nested()
+    statement = table.update().where(
+        table.c.id == bindparam('b_id'),
+        table.c.shipped_quantity + bindparam('b_quantity') <= table.c.quantity
+    ).values(
+        shipped_quantity=table.c.shipped_quantity + bindparam('b_quantity'),
+        version=table.c.version + 1
+    )
+    result = db.session.execute(statement, [
+        {"b_id": item.id, "b_quantity": quantity} for item, quantity, _ in reservations
+    ])
+    if result.rowcount == len(reservations):
+        savepoint.commit()
+        return
+
+    # Któraś pozycja się nie zmieściła - cofamy zbiorczy UPDATE i powtarzamy
+    # pozycja po pozycji, żeby wskazać, której dotyczy konflikt
+    savepoint.rollback()
+    _reserve_one_by_one(reservations)
+
+
+def _add_orders_shipped(shipped_by_order):
+    """Atomowo dolicza wysłane sztuki do sum zamówień {order_id: ilość} i ustawia ich statusy."""
+    table = Order.__table__
+    shipped = table.c.total_shipped + bindparam('b_quantity')
+    statement = table.update().where(table.c.id == bindparam('b_id')).values(
+        total_shipped=shipped,
+        version=table.c.version + 1,
+        status=case(
+            # total_quantity > 0: nieprzeliczone sumy nie mogą zamknąć zamówienia
+            (and_(table.c.total_quantity > 0, shipped >= table.c.total_quantity), 'completed'),
+            (shipped > 0, 'partial'),
+            else_='new'
+        )
+    )
+    db.session.execute(statement, [
+        {"b_id": order_id, "b_quantity": quantity} for order_id, quantity in shipped_by_order.items()
+    ])
+
+
+def _insert_shipments(shipment_lines, shipped_by_user_id):
+    """
+    Zapisuje paczki i ich pozycje zbiorczo (executemany), zamiast wiersz
+    po wierszu przez ORM. shipment_lines: {order_id: [(order_item_id, ilość)]}.
+    Zwraca {order_id: shipment_id}.
+    """
+    created_at = datetime.datetime.utcnow()
+    shipments = Shipment.__table__
+    # RETURNING (SQLite 3.35+, PostgreSQL) oddaje ID nowych paczek bez dodatkowego zapytania
+    shipment_ids = {
+        order_id: shipment_id
+        for shipment_id, order_id in db.session.execute(
+            shipments.insert().returning(shipments.c.id, shipments.c.order_id),
+            [
+                {"order_id": order_id, "shipped_by_user_id": shipped_by_user_id, "created_at": created_at}
+                for order_id in shipment_lines
+            ]
+        )
+    }
+    db.session.execute(ShipmentItem.__table__.insert(), [
+        {"shipment_id": shipment_ids[order_id], "order_item_id": order_item_id, "quantity_shipped": quantity}
+        for order_id, lines in shipment_lines.items()
+        for order_item_id, quantity in lines
+    ])
+    return shipment_ids
+
+
+def ship_orders(order_lines, shipped_by_user_id):
+    """
+    Tworzy po jednej paczce (Shipment) dla każdego zamówienia z listy
+    [(zamówienie, linie)] w bieżącej transakcji (commit robi wywołujący).
+    Pozycje wszystkich zamówień sprawdzamy jednym zapytaniem.
+    Zwraca {order_id: shipment_id}.
+    Rzuca ShippingError (błędne dane) lub ShippingConflict (wyścig z innym pakowaczem).
+    """
+    item_ids = {item_id for _, lines in order_lines for item_id, _, _ in lines}
+    items = {
+        item.id: item for item in OrderItem.query.filter(OrderItem.id.in_(item_ids))
+    } if item_ids else {}
+
+    shipment_lines = {}
+    reservations = []
+    shipped_by_order = {}
+    for order, lines in order_lines:
+        if not lines:
+            raise ShippingError(f"Zamówienie #{order.id}: nie wybrano żadnych produktów do wysłania (ilość musi być > 0).")
+
+        shipment_lines[order.id] = []
+        for item_id, quantity, version in lines:
+            order_item = items.get(item_id)
+            if order_item is None or order_item.order_id != order.id:
+                raise ShippingError(f"Pozycja o ID {item_id} nie należy do zamówienia #{order.id}.")
+
+            remaining_to_ship = order_item.quantity - order_item.shipped_quantity
+            # Wysyłka ponad stan to błąd danych (400) także z 'version' - ponowienie nic nie da.
+            # 409 zostaje dla innej wersji pozycji lub przegranego wyścigu w _reserve_items.
+            if quantity > remaining_to_ship:
+                raise ShippingError(f"Zamówienie #{order.id}: nie można wysłać {quantity} szt. '{order_item.product_name}'. Pozostało: {remaining_to_ship}.")
+
+            reservations.append((order_item, quantity, version))
+            shipment_lines[order.id].append((order_item.id, quantity))
+            shipped_by_order[order.id] = shipped_by_order.get(order.id, 0) + quantity
+
+    # Zamówienia sprzed kolumn z sumami (line_count = 0): przeliczamy je z pozycji,
+    # zanim doliczymy wysyłkę - inaczej status liczyłby się od zera
+    missing_totals = [order.id for order, _ in order_lines if not order.line_count]
+    if missing_totals:
+        Order.rebuild_totals(missing_totals)
+
+    _reserve_items(reservations)
+    _add_orders_shipped(shipped_by_order)
+    shipment_ids = _insert_shipments(shipment_lines, shipped_by_user_id)
+
+    # Obiekty w sesji mają stare wartości (zmieniał je UPDATE w bazie)
+    for order_item in items.values():
+        db.session.expire(order_item)
+    for order, _ in order_lines:
+        db.session.expire(order)
+    return shipment_ids
+
+
+def ship_items(order, lines, shipped_by_user_id):
+    """Jedna paczka dla jednego zamówienia (patrz ship_orders). Zwraca ID paczki."""
+    if not lines:
+        raise ShippingError("Nie wybrano żadnych produktów do wysłania (ilość musi być > 0).")
+    return ship_orders([(order, lines)], shipped_by_user_id)[order.id]
@@ -0,0 +1,56 @@
+# /backend/app/stream_limits.py
+"""
+Limit długich odpowiedzi strumieniowych w obrębie procesu (workera).
+
+Otwarty strumień zajmuje wątek serwera przez cały czas trwania, a worker
+gthread ma stałą liczbę wątków. Bez limitu kilka kart ze strumieniem
+powiadomień zajęłoby wszystkie wątki i zwykłe żądania API czekałyby
+w kolejce. Budżet wątków ustawia gunicorn.conf.py; limit 0 = bez limitu
+(serwer developerski).
+"""
+import threading
+
+
+class StreamSlots:
+    """Liczniki otwartych strumieni: rodzaj -> liczba."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}
+
+    def acquire(self, kind, limit):
+        """Zajmuje miejsce dla strumienia. False = limit wyczerpany."""
+        with self._lock:
+            count = self._open.get(kind, 0)
+            if limit and count >= limit:
+                return False
+            self._open[kind] = count + 1
+            return True
+
+    def release(self, kind):
+        with self._lock:
+            self._open[kind] = max(self._open.get(kind, 0) - 1, 0)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._open)
+
+
+slots = StreamSlots()
+
+
+def limited_response(kind, limit, build_response):
+    """
+    Zwraca odpowiedź z build_response(), jeśli jest wolne miejsce, inaczej None.
+    Miejsce zwalniamy, gdy serwer zamknie odpowiedź (call_on_close) - także
+    wtedy, gdy klient rozłączył się, zanim generator ruszył.
+    """
+    if not slots.acquire(kind, limit):
+        return None
+    try:
+        response = build_response()
+    except BaseException:
+        slots.release(kind)
+        raise
+    response.call_on_close(lambda: slots.release(kind))
+    return response
@@ -0,0 +1,223 @@
+# /backend/app/timeseries.py
+"""
+Szeregi czasowe zamówień dla wykresów kokpitu admina.
+
+Liczba zamówień, sztuk i przychód w kubełkach (dzień / tydzień / miesiąc),
+opcjonalnie rozbite wg statusu lub produktu. SQL grupuje dane po dniach,
+a tutaj składamy je w kubełki, uzupełniamy luki zerami i liczymy
+średnie kroczące.
+
+Zakończone kubełki trafiają do cache w pamięci procesu (z czasem życia
+TIMESERIES_CACHE_TTL), więc kolejne odświeżenia kokpitu pytają bazę
+tylko o bieżący kubełek.
+"""
+import collections
+import datetime
+import threading
+import time
+from flask import current_app
+from sqlalchemy import func
+from .models import db, Order, OrderItem, DailyRevenue
+
+BUCKETS = ('day', 'week', 'month')
+SPLITS = (None, 'status', 'product')
+METRICS = ('orders', 'units', 'revenue')
+TOTAL_SERIES = 'all'
+
+MAX_BUCKETS = 1000
+_MAX_CACHE_ENTRIES = 5000
+
+_lock = threading.Lock()
+_cache = collections.OrderedDict()  # (split, bucket, start) -> (wygasa, {seria: [zam., szt., przychód]})
+
+
+def bucket_start(day, bucket):
+    """Pierwszy dzień kubełka zawierającego 'day' (tydzień od poniedziałku)."""
+    if bucket == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def bucket_end(start, bucket):
+    """Pierwszy dzień następnego kubełka."""
+    if bucket == 'week':
+        return start + datetime.timedelta(days=7)
+    if bucket == 'month':
+        return (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start + datetime.timedelta(days=1)
+
+
+def _bucket_starts(start_date, end_date, bucket):
+    """Początki kolejnych kubełków pokrywających dni [start_date, end_date)."""
+    starts = []
+    current = bucket_start(start_date, bucket)
+    while current < end_date:
+        starts.append(current)
+        if len(starts) > MAX_BUCKETS:
+            raise ValueError(f"Zbyt wiele przedziałów (maks. {MAX_BUCKETS}) - zawęź zakres lub zwiększ 'bucket'")
+        current = bucket_end(current, bucket)
+    return starts
+
+
+def _as_date(value):
+    # func.date() w SQLite zwraca tekst 'RRRR-MM-DD'
+    if isinstance(value, str):
+        return datetime.date.fromisoformat(value)
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    return value
+
+
+def _daily_rows(start_date, end_date, split):
+    """Wiersze (dzień, seria, zamówienia, sztuki, przychód) zgrupowane w SQL po dniach."""
+    if split is None:
+        # Bez podziału wystarczą dzienne agregaty (app/rollups.py)
+        return db.session.query(
+            DailyRevenue.day, DailyRevenue.order_count, DailyRevenue.item_quantity, DailyRevenue.revenue
+        ).filter(
+            DailyRevenue.day >= start_date, DailyRevenue.day < end_date
+        ).all()
+
+    order_day = func.date(Order.created_at)
+    date_range = (Order.created_at >= start_date, Order.created_at < end_date)
+
+    if split == 'status':
+        return db.session.query(
+            order_day, Order.status,
+            func.count(Order.id), func.sum(Order.total_quantity), func.sum(Order.total_value)
+        ).filter(*date_range).group_by(order_day, Order.status).all()
+
+    return db.session.query(
+        order_day, OrderItem.product_name,
+        func.count(func.distinct(OrderItem.order_id)),
+        func.sum(OrderItem.quantity),
+        func.sum(func.coalesce(OrderItem.price_at_order, 0) * OrderItem.quantity)
+    ).join(Order, OrderItem.order_id == Order.id).filter(
+        *date_range
+    ).group_by(order_day, OrderItem.product_name).all()
+
+
+def _compute_buckets(starts, bucket, split):
+    """Liczy wartości podanych kubełków jednym zapytaniem (zakres od pierwszego do ostatniego)."""
+    values = {start: {} for start in starts}
+    rows = _daily_rows(starts[0], bucket_end(starts[-1], bucket), split)
+
+    for row in rows:
+        if split is None:
+            day, orders, units, revenue = row
+            series = TOTAL_SERIES
+        else:
+            day, series, orders, units, revenue = row
+        start = bucket_start(_as_date(day), bucket)
+        if start not in values:
+            continue # Dzień należy do kubełka, który już mamy w cache
+        totals = values[start].setdefault(series or '', [0, 0, 0.0])
+        totals[0] += int(orders or 0)
+        totals[1] += int(units or 0)
+        totals[2] += float(revenue or 0)
+    return values
+
+
+def _cache_ttl():
+    return current_app.config.get('TIMESERIES_CACHE_TTL', 300)
+
+
+def _cached_buckets(starts, bucket, split):
+    """Wartości kubełków: zakończone z cache, brakujące i bieżące - z bazy."""
+    today = datetime.datetime.utcnow().date()
+    now = time.monotonic()
+    result = {}
+
+    with _lock:
+        for start in starts:
+            entry = _cache.get((split, bucket, start))
+            if entry is not None and entry[0] > now:
+                _cache.move_to_end((split, bucket, start))
+                result[start] = entry[1]
+
+    missing = [start for start in starts if start not in result]
+    if not missing:
+        return result
+
+    computed = _compute_buckets(missing, bucket, split)
+    result.update(computed)
+
+    ttl = _cache_ttl()
+    if ttl > 0:
+        with _lock:
+            for start, value in computed.items():
+                # Bieżący (niezakończony) kubełek jeszcze się zmienia - nie trzymamy go
+                if bucket_end(start, bucket) <= today:
+                    _cache[(split, bucket, start)] = (now + ttl, value)
+            while len(_cache) > _MAX_CACHE_ENTRIES:
+                _cache.popitem(last=False)
+    return result
+
+
+def invalidate_timeseries(split=None, all_splits=False):
+    """
+    Czyści cache kubełków. Zmiana statusu zamówienia unieważnia podział 'status',
+    przebudowa agregatów - wszystko. (Inne procesy odświeżą się po TIMESERIES_CACHE_TTL.)
+    """
+    with _lock:
+        for key in list(_cache):
+            if all_splits or key[0] == split:
+                del _cache[key]
+
+
+def _moving_average(values, window):
+    """Średnia z ostatnich 'window' kubełków (None, dopóki jest ich mniej)."""
+    averages = []
+    running = 0
+    for i, value in enumerate(values):
+        running += value
+        if i >= window:
+            running -= values[i - window]
+        averages.append(round(running / window, 2) if i >= window - 1 else None)
+    return averages
+
+
+def order_timeseries(start_date, end_date, bucket='day', split=None, window=0):
+    """
+    Szereg czasowy dla dni [start_date, end_date). Zakres jest rozszerzany
+    do pełnych kubełków. 'window' > 0 dodaje średnie kroczące.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Nieprawidłowy 'bucket' (dozwolone: {', '.join(BUCKETS)})")
+    if split not in SPLITS:
+        raise ValueError("Nieprawidłowy 'split' (dozwolone: status, product)")
+    if end_date <= start_date:
+        raise ValueError("'end_date' musi być późniejsza niż 'start_date'")
+
+    starts = _bucket_starts(start_date, end_date, bucket)
+    values = _cached_buckets(starts, bucket, split)
+
+    series_names = sorted({name for bucket_values in values.values() for name in bucket_values})
+    if split is None:
+        series_names = [TOTAL_SERIES]
+
+    series = []
+    for name in series_names:
+        # Luki (kubełki bez zamówień) uzupełniamy zerami
+        points = [values[start].get(name, [0, 0, 0.0]) for start in starts]
+        entry = {
+            "key": name,
+            "orders": [point[0] for point in points],
+            "units": [point[1] for point in points],
+            "revenue": [round(point[2], 2) for point in points]
+        }
+        if window > 0:
+            entry["moving_average"] = {metric: _moving_average(entry[metric], window) for metric in METRICS}
+        series.append(entry)
+
+    return {
+        "bucket": bucket,
+        "split": split,
+        "window": window,
+        "start": starts[0].isoformat(),
+        "end": bucket_end(starts[-1], bucket).isoformat(),
+        "buckets": [start.isoformat() for start in starts],
+        "series": series
+    }
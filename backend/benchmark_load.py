@@ -0,0 +1,141 @@
+# /backend/benchmark_load.py
+"""
+Test obciążenia endpointów spedycji i katalogu.
+
+Bez --url uruchamia gunicorna (gunicorn.conf.py) kolejno z każdą liczbą
+workerów z --workers i porównuje przepustowość:
+    python benchmark_load.py --username admin --password ... --workers 1,2,4
+
+Z --url mierzy już działający serwer:
+    python benchmark_load.py --url http://127.0.0.1:8000 --username admin --password ...
+"""
+import argparse
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+ENDPOINTS = [
+    "/api/shipping/orders?limit=50",
+    "/api/shipping/orders/counts",
+    "/api/products?limit=50",
+]
+
+
+def login(base_url, username, password):
+    response = requests.post(f"{base_url}/api/login", json={"username": username, "password": password}, timeout=30)
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def wait_until_healthy(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.3)
+    raise RuntimeError(f"Serwer {base_url} nie odpowiada na /api/health")
+
+
+def run_load(base_url, token, concurrency, duration):
+    """Każdy z 'concurrency' wątków odpytuje w kółko ENDPOINTS przez 'duration' sekund."""
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    deadline = time.time() + duration
+
+    def client_loop(offset):
+        session = requests.Session()
+        session.headers["Authorization"] = f"Bearer {token}"
+        i = offset
+        while time.time() < deadline:
+            path = ENDPOINTS[i % len(ENDPOINTS)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                ok = session.get(f"{base_url}{path}", timeout=30).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=client_loop, args=(i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "rps": len(latencies) / duration,
+        "p50_ms": statistics.median(latencies) * 1000 if latencies else 0,
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+    }
+
+
+def start_gunicorn(workers, port):
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+    return subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+
+def print_result(label, result):
+    print(f"{label:>12} | {result['rps']:8.1f} req/s | p50 {result['p50_ms']:7.1f} ms | "
+          f"p95 {result['p95_ms']:7.1f} ms | błędy: {result['errors']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Adres działającego serwera (bez uruchamiania gunicorna)")
+    parser.add_argument("--username", required=True, help="Konto z dostępem do panelu spedycji")
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}", help="Liczby workerów do porównania, np. 1,2,4")
+    parser.add_argument("--concurrency", type=int, default=16, help="Liczba równoległych klientów")
+    parser.add_argument("--duration", type=float, default=15, help="Czas pomiaru w sekundach")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    if args.url:
+        token = login(args.url, args.username, args.password)
+        print_result("serwer", run_load(args.url, token, args.concurrency, args.duration))
+        return
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    baseline = None
+    for workers in [int(value) for value in args.workers.split(",")]:
+        process = start_gunicorn(workers, args.port)
+        try:
+            wait_until_healthy(base_url)
+            token = login(base_url, args.username, args.password)
+            run_load(base_url, token, args.concurrency, min(args.duration, 3)) # rozgrzewka
+            result = run_load(base_url, token, args.concurrency, args.duration)
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(timeout=60)
+
+        baseline = baseline or result["rps"]
+        print_result(f"{workers} workerów", result)
+        if baseline:
+            print(f"{'':>12} | skalowanie względem pierwszego pomiaru: x{result['rps'] / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
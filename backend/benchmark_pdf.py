@@ -0,0 +1,99 @@
+# /backend/benchmark_pdf.py
+"""
+Porównanie backendów PDF (app/pdf_render.py): czas renderowania i szczytowe
+zużycie pamięci (tracemalloc) dla potwierdzenia zamówienia i listy do spakowania.
+Dane są syntetyczne - baza nie jest potrzebna.
+
+    python benchmark_pdf.py
+    python benchmark_pdf.py --lines 10,1000 --repeat 5 --renderers xhtml2pdf,canvas
+"""
+import argparse
+import datetime
+import statistics
+import time
+import tracemalloc
+from types import SimpleNamespace
+from app import create_app
+from app.pdf_render import render_pdf
+
+SIZES = ['XS', 'S', 'M', 'L', 'XL', 'XXL']
+
+
+def order_confirmation_context(lines):
+    order = SimpleNamespace(
+        id=12345,
+        created_at=datetime.datetime(2025, 3, 14, 9, 26),
+        notes="Proszę o dostawę do magazynu przy ul. Łąkowej (brama od strony północnej)."
+    )
+    user = SimpleNamespace(username="klient_żółć", email="klient@example.com")
+    grouped_items = {}
+    for i in range(lines):
+        name = f"Koszulka sportowa zażółć gęślą jaźń {i // len(SIZES)}"
+        product = grouped_items.setdefault(name, {"name": name, "variants": []})
+        product["variants"].append({
+            "size": SIZES[i % len(SIZES)], "quantity": i % 7 + 1,
+            "price_at_order": 49.9, "total_price": 49.9 * (i % 7 + 1)
+        })
+    return {"order": order, "user": user, "grouped_items": grouped_items.values()}
+
+
+def picking_list_context(lines):
+    order_ids = list(range(1000, 1000 + max(lines // 4, 1)))
+    return {
+        "aggregated_items": [{
+            "name": f"Bluza z kapturem ąęśćż {i // len(SIZES)}",
+            "size": SIZES[i % len(SIZES)],
+            "total_quantity": i % 40 + 1,
+            "orders": [f"#{order_id}" for order_id in order_ids[i % len(order_ids)::97][:12]]
+        } for i in range(lines)],
+        "order_ids_str": ", ".join(f"#{order_id}" for order_id in order_ids),
+        "generated_at": "2025-03-14 09:26"
+    }
+
+
+DOCUMENTS = {
+    "order_confirmation": order_confirmation_context,
+    "picking_list": picking_list_context,
+}
+
+
+def measure(document, context, renderer, repeat):
+    render_pdf(document, context, renderer) # rozgrzewka (czcionki, szablony)
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        pdf_data = render_pdf(document, context, renderer)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    render_pdf(document, context, renderer)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak, len(pdf_data)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--lines", default="10,1000", help="Liczby pozycji w dokumencie, np. 10,1000")
+    parser.add_argument("--repeat", type=int, default=3, help="Liczba pomiarów (podajemy medianę)")
+    parser.add_argument("--renderers", default="xhtml2pdf,canvas")
+    args = parser.parse_args()
+
+    renderers = args.renderers.split(",")
+    app = create_app()
+    with app.app_context():
+        print(f"{'dokument':>20} {'pozycji':>8} {'backend':>10} | {'czas':>10} | {'pamięć (szczyt)':>15} | {'rozmiar':>9}")
+        for document, build_context in DOCUMENTS.items():
+            for lines in [int(value) for value in args.lines.split(",")]:
+                context = build_context(lines)
+                baseline = None
+                for renderer in renderers:
+                    elapsed, peak, size = measure(document, context, renderer, args.repeat)
+                    baseline = baseline or elapsed
+                    print(f"{document:>20} {lines:>8} {renderer:>10} | {elapsed * 1000:8.1f} ms | "
+                          f"{peak / 1024 / 1024:12.1f} MB | {size / 1024:6.0f} kB"
+                          + (f" | x{baseline / elapsed:.1f}" if renderer != renderers[0] else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# /backend/gunicorn.conf.py
+"""
+Konfiguracja gunicorna dla produkcji:
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Zmienne środowiskowe:
+    BIND             - adres nasłuchu (domyślnie 0.0.0.0:8000)
+    WEB_CONCURRENCY  - liczba procesów (domyślnie 2 x liczba rdzeni + 1)
+    GUNICORN_THREADS - wątki na proces (domyślnie suma budżetu poniżej)
+    GUNICORN_TIMEOUT - limit czasu żądania w sekundach (domyślnie 60)
+
+Budżet wątków jednego procesu (gthread):
+    GUNICORN_REQUEST_THREADS            - zwykłe żądania API (domyślnie
+                                          2 x liczba rdzeni, min. 4; czekają
+                                          głównie na bazę i sieć)
+    NOTIFICATION_STREAM_MAX_CONNECTIONS - strumienie SSE powiadomień
+                                          (domyślnie liczba rdzeni, min. 2);
+                                          każdy trzyma wątek do 5 minut,
+                                          ponad limit klient odpytuje API
+    EXPORT_STREAM_MAX_CONNECTIONS       - eksporty CSV/NDJSON i ZIP z PDF-ami
+                                          (domyślnie 2); wątek jest zajęty do
+                                          końca pobierania, ponad limit 503
+Strumienie mają własne miejsca, więc nawet przy wyczerpanych limitach
+zostaje GUNICORN_REQUEST_THREADS wątków na zwykłe żądania. Ustawiając
+GUNICORN_THREADS ręcznie, zostaw zapas ponad sumę obu limitów.
+
+Płynny restart (bez zrywania żądań): kill -HUP <pid mastera>
+"""
+import multiprocessing
+import os
+import time
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+
+cpu_count = multiprocessing.cpu_count()
+workers = int(os.environ.get("WEB_CONCURRENCY", cpu_count * 2 + 1))
+worker_class = "gthread"
+
+request_threads = int(os.environ.get("GUNICORN_REQUEST_THREADS", max(4, cpu_count * 2)))
+notification_streams = int(os.environ.get("NOTIFICATION_STREAM_MAX_CONNECTIONS", max(2, cpu_count)))
+export_streams = int(os.environ.get("EXPORT_STREAM_MAX_CONNECTIONS", 2))
+threads = int(os.environ.get("GUNICORN_THREADS", request_threads + notification_streams + export_streams))
+
+# Limity czyta aplikacja (create_app) - ładowana po tym pliku. Liczba workerów
+# wyznacza domyślny rozmiar pul liczących na CPU (eksport PDF, bcrypt) w każdym z nich.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+os.environ["NOTIFICATION_STREAM_MAX_CONNECTIONS"] = str(notification_streams)
+os.environ["EXPORT_STREAM_MAX_CONNECTIONS"] = str(export_streams)
+
+# Aplikacja i szablony ładowane raz przed fork() - szybszy start i współdzielona pamięć
+preload_app = True
+
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Okresowa wymiana workerów (ogranicza skutki ewentualnych wycieków pamięci)
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", 5000))
+max_requests_jitter = max_requests // 10
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """
+    Połączenia z bazy otwarte w procesie nadrzędnym (podczas preload) nie mogą
+    być współdzielone przez workery - każdy zaczyna z własną, pustą pulą.
+    Wątki kolejki zadań startują dopiero przy pierwszym żądaniu, już po fork().
+    """
+    from wsgi import app
+    from app import db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+    app.config['WORKER_STARTED_AT'] = time.time()
+
+
+def worker_exit(server, worker):
+    """
+    Przy płynnym restarcie kończymy wątki kolejki zadań (przerwane zadanie wróci do kolejki)
+    i procesy eksportu PDF.
+    """
+    from wsgi import app
+    from app.pdf_export import shutdown_export_pool
+
+    pool = app.extensions.get('job_pool')
+    if pool is not None:
+        pool.stop(timeout=5)
+    shutdown_export_pool()
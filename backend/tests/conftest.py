@@ -0,0 +1,64 @@
+# /backend/tests/conftest.py
+"""
+Wspólne fixtury testów: aplikacja na tymczasowej bazie SQLite (plik w tmp_path),
+bez wątków kolejki zadań i z najniższym kosztem bcrypt.
+
+Uruchamianie (z katalogu backend): python -m pytest -q
+"""
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{tmp_path / 'test.db'}")
+    monkeypatch.setenv("SECRET_KEY", "test")
+    monkeypatch.setenv("JWT_SECRET_KEY", "test-jwt-secret-key-with-enough-bytes")
+    monkeypatch.setenv("JOB_WORKERS", "0")
+    monkeypatch.setenv("BCRYPT_ROUNDS", "4")
+    monkeypatch.setenv("PDF_CACHE_DIR", str(tmp_path / "pdf_cache"))
+
+    from app import create_app, db
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def auth():
+    """auth(user) -> nagłówek Authorization z tokenem jak po /api/login."""
+    from flask_jwt_extended import create_access_token
+
+    def headers(user):
+        claims = {"id": user.id, "username": user.username, "role": user.role}
+        token = create_access_token(identity=user.username, additional_claims=claims)
+        return {"Authorization": f"Bearer {token}"}
+    return headers
+
+
+@pytest.fixture
+def make_user(app):
+    from app.models import db, User
+
+    def make(username, role='user'):
+        user = User(
+            username=username, email=f"{username}@example.com", role=role,
+            first_name=username.title(), last_name="Kowalski"
+        )
+        user.password_hash = 'x' # Bez bcrypt - testy nie logują się hasłem
+        db.session.add(user)
+        db.session.commit()
+        return user
+    return make
@@ -0,0 +1,95 @@
+# /backend/tests/test_exports.py
+"""Eksporty CSV: komórki wyglądające jak formuły arkusza są neutralizowane."""
+import csv
+import io
+from app.exports import csv_cell
+from app.models import db, Order, OrderItem, Product, ProductVariant
+from app.stream_limits import slots as stream_slots
+
+
+def test_csv_cell():
+    assert csv_cell('=HYPERLINK("http://x")') == '\'=HYPERLINK("http://x")'
+    assert csv_cell('+48 600') == "'+48 600"
+    assert csv_cell('-1') == "'-1"
+    assert csv_cell('@SUM(A1)') == "'@SUM(A1)"
+    assert csv_cell('Bluza') == 'Bluza'
+    assert csv_cell(-5) == -5
+
+
+def test_exports_escape_formulas(client, auth, make_user):
+    admin = auth(make_user('admin', role='admin'))
+    client_user = make_user('klient')
+    product = Product(name='=cmd|calc!A1')
+    db.session.add(product)
+    db.session.flush()
+    variant = ProductVariant(product_id=product.id, size='@M')
+    db.session.add(variant)
+    db.session.flush()
+    order = Order(user_id=client_user.id, notes='+zadzwoń')
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderItem(
+        order_id=order.id, variant_id=variant.id, product_name=product.name,
+        variant_size=variant.size, quantity=2, price_at_order=10.0
+    ))
+    db.session.commit()
+
+    orders = client.get('/api/admin/export/orders', headers=admin)
+    rows = list(csv.DictReader(io.StringIO(orders.get_data(as_text=True))))
+    assert rows[0]["notes"] == "'+zadzwoń"
+
+    items = client.get('/api/admin/export/items', headers=admin)
+    rows = list(csv.DictReader(io.StringIO(items.get_data(as_text=True))))
+    assert rows[0]["product_name"] == "'=cmd|calc!A1"
+    assert rows[0]["variant_size"] == "'@M"
+
+    picking = client.post(
+        '/api/shipping/picking-list', query_string={"format": "csv"},
+        json={"order_ids": [order.id]}, headers=admin
+    )
+    rows = list(csv.DictReader(io.StringIO(picking.get_data(as_text=True))))
+    assert rows[0]["product_name"] == "'=cmd|calc!A1"
+    assert rows[0]["variant_size"] == "'@M"
+
+
+def test_picking_list_rejects_boolean_order_ids(client, auth, make_user):
+    headers = auth(make_user('magazyn', role='shipping'))
+    for path in ('/api/shipping/picking-list', '/api/shipping/picking-list-pdf'):
+        response = client.post(path, json={"order_ids": [True, 1]}, headers=headers)
+        assert response.status_code == 400
+
+
+def test_picking_list_shares_export_stream_limit(app, client, auth, make_user):
+    headers = auth(make_user('magazyn', role='shipping'))
+    client_user = make_user('klient')
+    product = Product(name='Bluza')
+    db.session.add(product)
+    db.session.flush()
+    variant = ProductVariant(product_id=product.id, size='M')
+    db.session.add(variant)
+    db.session.flush()
+    order = Order(user_id=client_user.id)
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderItem(
+        order_id=order.id, variant_id=variant.id, product_name=product.name,
+        variant_size=variant.size, quantity=1, price_at_order=10.0
+    ))
+    db.session.commit()
+
+    # Liczniki są na proces - wliczamy strumienie niezamknięte przez inne testy
+    open_exports = stream_slots.stats().get('exports', 0)
+    app.config['EXPORT_STREAM_MAX_CONNECTIONS'] = open_exports + 1
+    assert stream_slots.acquire('exports', open_exports + 1) # Trwający eksport admina
+    try:
+        response = client.post('/api/shipping/picking-list', json={"order_ids": [order.id]}, headers=headers)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '30'
+    finally:
+        stream_slots.release('exports')
+
+    response = client.post('/api/shipping/picking-list', json={"order_ids": [order.id]}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()[0]["name"] == 'Bluza'
+    response.close()
+    assert stream_slots.stats().get('exports', 0) == open_exports
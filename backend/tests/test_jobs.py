@@ -0,0 +1,39 @@
+# /backend/tests/test_jobs.py
+"""Kolejka zadań: flaga budzenia po rollbacku i heartbeat długich zadań."""
+import time
+from sqlalchemy import select
+from app import jobs
+from app.models import db, BackgroundJob
+
+
+def test_rollback_forgets_enqueued_jobs(app, monkeypatch):
+    monkeypatch.setitem(jobs._handlers, 'test-noop', lambda payload: None)
+
+    jobs.enqueue_job('test-noop')
+    db.session.begin_nested().rollback()
+    # Wycofany savepoint nie usuwa zadania dodanego przed nim
+    assert db.session.info.get('jobs_enqueued') is True
+
+    db.session.rollback()
+    assert 'jobs_enqueued' not in db.session.info
+
+
+def test_heartbeat_refreshes_lock_of_long_job(app, monkeypatch):
+    monkeypatch.setattr(jobs, 'HEARTBEAT_SECONDS', 0.05)
+    seen = []
+
+    def slow_handler(payload):
+        claimed_at = seen[0]
+        time.sleep(0.3)
+        with db.engine.connect() as connection:
+            seen.append(connection.execute(select(BackgroundJob.locked_at)).scalar())
+        assert seen[-1] > claimed_at
+
+    monkeypatch.setitem(jobs._handlers, 'test-slow', slow_handler)
+    jobs.enqueue_job('test-slow', max_attempts=1)
+    db.session.commit()
+
+    job = jobs._claim_next_job()
+    seen.append(job.locked_at)
+    assert jobs.run_job(job) is True
+    assert db.session.get(BackgroundJob, job.id).status == 'done'
@@ -0,0 +1,48 @@
+# /backend/tests/test_notification_stream.py
+"""Strumień powiadomień (SSE): jednorazowe bilety i limit strumieni na proces."""
+from app.stream_limits import slots
+
+
+def _ticket(client, headers):
+    response = client.post('/api/me/notifications/stream-ticket', headers=headers)
+    assert response.status_code == 201
+    return response.json["ticket"]
+
+
+def test_stream_ticket_is_single_use(app, client, auth, make_user):
+    app.config['NOTIFICATION_STREAM_MAX_SECONDS'] = 0
+    headers = auth(make_user('klient'))
+
+    ticket = _ticket(client, headers)
+    response = client.get('/api/me/notifications/stream', query_string={"ticket": ticket})
+    assert response.status_code == 200
+    response.close()
+
+    again = client.get('/api/me/notifications/stream', query_string={"ticket": ticket})
+    assert again.status_code == 401
+
+
+def test_token_in_query_string_is_rejected(client, auth, make_user):
+    token = auth(make_user('klient'))["Authorization"].split()[1]
+    response = client.get('/api/me/notifications/stream', query_string={"jwt": token})
+    assert response.status_code == 401
+
+
+def test_stream_limit_falls_back_to_polling(app, client, auth, make_user):
+    app.config['NOTIFICATION_STREAM_MAX_SECONDS'] = 0
+    app.config['NOTIFICATION_STREAM_MAX_CONNECTIONS'] = 1
+    headers = auth(make_user('klient'))
+
+    first = client.get('/api/me/notifications/stream', query_string={"ticket": _ticket(client, headers)})
+    assert first.status_code == 200
+
+    rejected = client.get('/api/me/notifications/stream', query_string={"ticket": _ticket(client, headers)})
+    assert rejected.status_code == 503
+    assert rejected.headers['Retry-After']
+
+    # Zamknięcie odpowiedzi zwalnia miejsce
+    first.close()
+    assert slots.stats().get('notifications', 0) == 0
+    second = client.get('/api/me/notifications/stream', query_string={"ticket": _ticket(client, headers)})
+    assert second.status_code == 200
+    second.close()
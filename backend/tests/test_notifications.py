@@ -0,0 +1,42 @@
+# /backend/tests/test_notifications.py
+"""Lista powiadomień z kursorem 'since' (delta zmian)."""
+from app.models import db, Notification, User
+from app.routes import NOTIFICATION_DELTA_LIMIT
+
+
+def _notify(user, count):
+    for index in range(count):
+        db.session.add(Notification(
+            user_id=user.id, title=f"Powiadomienie {index}",
+            seq=User.bump_notification_seq(user.id)
+        ))
+    db.session.commit()
+
+
+def test_small_delta(client, auth, make_user):
+    user = make_user('klient')
+    headers = auth(user)
+    _notify(user, 3)
+    seq = client.get('/api/me/notifications', headers=headers).get_json()["seq"]
+
+    _notify(user, 2)
+    response = client.get('/api/me/notifications', headers=headers, query_string={"since": seq})
+    data = response.get_json()
+    assert data["full"] is False
+    assert [n["title"] for n in data["notifications"]] == ["Powiadomienie 1", "Powiadomienie 0"]
+    assert client.get('/api/me/notifications', headers=headers, query_string={"since": data["seq"]}).status_code == 304
+
+
+def test_mark_read_over_delta_limit_returns_full_list(client, auth, make_user):
+    user = make_user('klient')
+    headers = auth(user)
+    _notify(user, NOTIFICATION_DELTA_LIMIT + 10)
+    seq = client.get('/api/me/notifications', headers=headers).get_json()["seq"]
+
+    # Wszystkie nieprzeczytane dostają jeden 'seq' - więcej zmian niż limit delty
+    assert client.post('/api/me/notifications/mark-read', headers=headers).status_code == 200
+    data = client.get('/api/me/notifications', headers=headers, query_string={"since": seq}).get_json()
+    assert data["full"] is True
+    assert len(data["notifications"]) == 20
+    assert all(n["is_read"] for n in data["notifications"])
+    assert data["unread_count"] == 0
@@ -0,0 +1,21 @@
+# /backend/tests/test_passwords.py
+"""Konfiguracja haszowania haseł (app/passwords.py) przy starcie aplikacji."""
+import os
+import pytest
+from app import create_app
+
+
+@pytest.mark.parametrize('rounds', ['3', '32'])
+def test_bcrypt_rounds_out_of_range_fail_at_startup(app, monkeypatch, rounds):
+    monkeypatch.setenv("BCRYPT_ROUNDS", rounds)
+    with pytest.raises(ValueError, match="BCRYPT_ROUNDS"):
+        create_app()
+
+
+def test_hash_pool_is_sized_per_worker(app, monkeypatch):
+    monkeypatch.delenv("PASSWORD_HASH_WORKERS", raising=False)
+    monkeypatch.setenv("WEB_CONCURRENCY", str(2 * (os.cpu_count() or 1)))
+    assert create_app().config['PASSWORD_HASH_WORKERS'] == 1
+
+    monkeypatch.setenv("WEB_CONCURRENCY", "1")
+    assert create_app().config['PASSWORD_HASH_WORKERS'] == (os.cpu_count() or 1)
@@ -0,0 +1,40 @@
+# /backend/tests/test_pdf_assets.py
+"""Obrazy w PDF-ach z backendu 'canvas' (app/pdf_assets.py)."""
+import datetime
+import re
+from types import SimpleNamespace
+import pytest
+from app.pdf_assets import assets
+from app.pdf_render import render_pdf
+
+LOGOS = ('img/logo_cz.png', 'img/h_cz.png')
+
+
+def _context(items=3):
+    return {
+        "order": SimpleNamespace(id=7, created_at=datetime.datetime(2025, 1, 2, 10, 30), notes=None),
+        "user": SimpleNamespace(username="klient", email="klient@example.com"),
+        "grouped_items": [{
+            "name": f"Produkt {index}",
+            "variants": [{"size": "M", "quantity": 2, "price_at_order": 10.0, "total_price": 20.0}]
+        } for index in range(items)],
+    }
+
+
+def _image_xobjects(pdf_data):
+    """Obrazy w dokumencie bez masek przezroczystości (/SMask to też /Subtype /Image)."""
+    images = len(re.findall(rb'/Subtype\s*/Image', pdf_data))
+    masks = len(re.findall(rb'/SMask\s+\d+\s+0\s+R', pdf_data))
+    return images - masks
+
+
+@pytest.mark.parametrize('items', [3, 120]) # 120 pozycji = kilka stron
+def test_one_image_xobject_per_logo(app, items):
+    assets.clear()
+    first = render_pdf('order_confirmation', _context(items), renderer='canvas')
+    # Drugi dokument korzysta z obrazów zakodowanych przy pierwszym
+    second = render_pdf('order_confirmation', _context(items), renderer='canvas')
+
+    assert _image_xobjects(first) == len(LOGOS)
+    assert _image_xobjects(second) == len(LOGOS)
+    assert assets.stats()["hits"] >= len(LOGOS)
@@ -0,0 +1,25 @@
+# /backend/tests/test_pdf_cache.py
+"""Limit rozmiaru cache PDF-ów bez skanowania katalogu przy każdym zapisie."""
+import os
+from types import SimpleNamespace
+from app import pdf_cache
+
+
+def test_store_scans_directory_only_when_over_limit(app, monkeypatch):
+    app.config['PDF_CACHE_MAX_BYTES'] = 100 * 1000
+    scans = []
+    original_scan = pdf_cache._scan
+
+    def counting_scan():
+        scans.append(1)
+        return original_scan()
+
+    monkeypatch.setattr(pdf_cache, '_scan', counting_scan)
+    stores = 500
+    for order_id in range(1, stores + 1):
+        path, _ = pdf_cache.store_order_pdf(SimpleNamespace(id=order_id), b'x' * 1000, digest=f"d{order_id}")
+
+    # Skan przy pierwszym zapisie, potem dopiero po zapełnieniu zapasu (10% limitu = 10 plików)
+    assert len(scans) <= stores // 5
+    assert pdf_cache.cache_stats()["bytes"] <= 100 * 1000
+    assert os.path.exists(path) # Najnowszy plik zostaje
@@ -0,0 +1,27 @@
+# /backend/tests/test_pdf_export.py
+"""Zbiorczy eksport PDF: walidacja żądania i postęp zapisywany w bazie."""
+from app.models import db
+from app.pdf_export import start_export, export_progress, _Progress
+
+
+def test_boolean_order_ids_are_rejected(client, auth, make_user):
+    headers = auth(make_user('magazyn', role='shipping'))
+    response = client.post('/api/orders/export-pdf', json={"order_ids": [True, 1]}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_progress_is_visible_outside_the_exporting_process(app):
+    export_id = start_export(3, 'eksport-test-1')
+    progress = _Progress(export_id)
+    progress.add(done=1, from_cache=1)
+    progress.add(done=1, failed=1)
+    progress.finish('done')
+
+    # Inny worker nie ma nic w pamięci - czyta wyłącznie z bazy
+    db.session.remove()
+    result = export_progress(export_id)
+    assert result["done"] == 2
+    assert result["from_cache"] == 1
+    assert result["failed"] == 1
+    assert result["status"] == 'done'
+    assert result["percent"] == 66.7
@@ -0,0 +1,79 @@
+# /backend/tests/test_query_plans.py
+"""
+Zapytania endpointów nie mogą czytać dużych tabel pełnym skanem.
+Plany liczymy z zapytań faktycznie wykonanych przez endpointy (app/query_plans.py).
+"""
+import pytest
+from app.models import db, Product, ProductVariant, BackgroundJob
+from app.jobs import _claim_next_job, _requeue_stale_jobs
+from app.query_plans import capture_queries, check_query_plans, explain_queries
+from app.search import create_search_index, rebuild_search_index
+
+
+@pytest.fixture
+def shop(client, make_user, auth):
+    """Klient z przypisanym produktem, spedytor i dwa zamówienia (jedno częściowo wysłane)."""
+    client_user = make_user('klient')
+    shipper = make_user('spedycja', role='shipping')
+    make_user('admin', role='admin')
+    product = Product(name='Bluza')
+    db.session.add(product)
+    db.session.flush()
+    variant = ProductVariant(product_id=product.id, size='XL', price=49.0)
+    db.session.add(variant)
+    client_user.assigned_products.append(product)
+    db.session.commit()
+    assert create_search_index()
+    rebuild_search_index()
+
+    for quantity in (3, 5):
+        response = client.post('/api/orders', headers=auth(client_user), json={
+            "items": [{"variant_id": variant.id, "quantity": quantity}], "notes": "pilne"
+        })
+        assert response.status_code == 201, response.get_json()
+    response = client.post('/api/shipping/orders/1/ship', headers=auth(shipper), json={
+        "items": [{"item_id": 1, "quantity_to_ship": 1}]
+    })
+    assert response.status_code == 200, response.get_json()
+    return {"client": client_user, "shipper": shipper, "variant_id": variant.id}
+
+
+def _failures(results):
+    return [(sql, full_scans) for sql, _, full_scans in results if full_scans]
+
+
+def test_read_endpoints_use_indexes(shop):
+    results = check_query_plans()
+
+    assert len({label for label, *_ in results}) > 10
+    failures = [(label, sql, full_scans) for label, sql, _, full_scans in results if full_scans]
+    assert failures == []
+
+
+def test_write_paths_use_indexes(client, auth, shop):
+    client_headers, shipper_headers = auth(shop["client"]), auth(shop["shipper"])
+
+    with capture_queries() as queries:
+        response = client.post('/api/orders', headers=client_headers, json={
+            "items": [{"variant_id": shop["variant_id"], "quantity": 2}]
+        })
+        assert response.status_code == 201
+        response = client.post('/api/shipping/orders/1/ship', headers=shipper_headers, json={
+            "items": [{"item_id": 1, "quantity_to_ship": 1}]
+        })
+        assert response.status_code == 200
+        response = client.post('/api/shipping/orders/ship-batch', headers=shipper_headers, json={
+            "orders": [{"order_id": 2, "items": [{"item_id": 2, "quantity_to_ship": 5}]}]
+        })
+        assert response.status_code == 200, response.get_json()
+        response = client.post('/api/me/notifications/mark-read', headers=client_headers)
+        assert response.status_code == 200
+
+        # Wątki kolejki zadań (JOB_WORKERS=0 w testach) - wołamy ich zapytania bezpośrednio
+        _requeue_stale_jobs()
+        job = _claim_next_job()
+        assert isinstance(job, BackgroundJob)
+
+    results = explain_queries(queries)
+    assert results
+    assert _failures(results) == []
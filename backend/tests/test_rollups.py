@@ -0,0 +1,49 @@
+# /backend/tests/test_rollups.py
+"""Agregaty kokpitu budowane przy starcie dla bazy z zamówieniami sprzed agregatów."""
+import datetime
+import pytest
+from app.models import db, Order, OrderItem, Product, ProductVariant, DailyRevenue, DailyProductQuantity
+
+
+def _legacy_order(user):
+    # Zamówienie zapisane bez record_order(), jak przed wprowadzeniem agregatów
+    product = Product(name='Bluza')
+    db.session.add(product)
+    db.session.flush()
+    variant = ProductVariant(product_id=product.id, size='M')
+    db.session.add(variant)
+    order = Order(user_id=user.id, created_at=datetime.datetime(2026, 3, 2, 10, 0))
+    db.session.add(order)
+    db.session.flush()
+    db.session.add(OrderItem(
+        order_id=order.id, variant_id=variant.id, product_name='Bluza', variant_size='M',
+        quantity=2, price_at_order=10.0
+    ))
+    Order.rebuild_totals(order_ids=[order.id])
+    db.session.commit()
+    return order
+
+
+def test_startup_builds_empty_rollups(app, make_user):
+    import wsgi
+    _legacy_order(make_user('klient'))
+    assert DailyRevenue.query.count() == 0
+
+    wsgi.backfill_rollups(app)
+
+    revenue = db.session.get(DailyRevenue, datetime.date(2026, 3, 2))
+    assert revenue.order_count == 1
+    assert revenue.item_quantity == 2
+    assert revenue.revenue == 20.0
+    assert db.session.get(DailyProductQuantity, (datetime.date(2026, 3, 2), 'Bluza')).quantity == 2
+
+
+def test_startup_keeps_existing_rollups(app, make_user, monkeypatch):
+    import wsgi
+    _legacy_order(make_user('klient'))
+    db.session.add(DailyRevenue(day=datetime.date(2026, 1, 1), order_count=5))
+    db.session.commit()
+    monkeypatch.setattr(wsgi, 'rebuild_rollups', lambda: pytest.fail("niepotrzebna przebudowa"))
+
+    wsgi.backfill_rollups(app)
+    assert DailyRevenue.query.count() == 1
@@ -0,0 +1,68 @@
+# /backend/tests/test_shipping.py
+"""Wysyłka pozycji: walidacja żądania (400) a konflikty równoległych zmian (409)."""
+import pytest
+from app.models import db, Product, ProductVariant
+
+
+@pytest.fixture
+def order(client, make_user, auth):
+    """Zamówienie klienta z jedną pozycją (3 szt.) i nagłówki spedytora."""
+    client_user = make_user('klient')
+    shipper = make_user('spedycja', role='shipping')
+    product = Product(name='Bluza')
+    db.session.add(product)
+    db.session.flush()
+    variant = ProductVariant(product_id=product.id, size='XL', price=49.0)
+    db.session.add(variant)
+    client_user.assigned_products.append(product)
+    db.session.commit()
+
+    response = client.post('/api/orders', headers=auth(client_user), json={
+        "items": [{"variant_id": variant.id, "quantity": 3}]
+    })
+    assert response.status_code == 201, response.get_json()
+    order = response.get_json()
+    return {"id": order["id"], "item_id": order["items"][0]["id"], "headers": auth(shipper)}
+
+
+def _ship(client, order, items):
+    return client.post(f"/api/shipping/orders/{order['id']}/ship", headers=order["headers"], json={"items": items})
+
+
+def test_overship_with_current_version_is_bad_request(client, order):
+    response = _ship(client, order, [{"item_id": order["item_id"], "quantity_to_ship": 4, "version": 1}])
+    assert response.status_code == 400
+    assert "retryable" not in response.get_json()
+
+
+def test_stale_version_is_conflict(client, order):
+    response = _ship(client, order, [{"item_id": order["item_id"], "quantity_to_ship": 1, "version": 7}])
+    assert response.status_code == 409
+    assert response.get_json()["retryable"] is True
+
+
+@pytest.mark.parametrize('items', [
+    [5],
+    ["pozycja"],
+    [{"item_id": "1", "quantity_to_ship": 1}],
+    [{"item_id": 1.0, "quantity_to_ship": 1}],
+    [{"item_id": None, "quantity_to_ship": 1}],
+    [{"item_id": True, "quantity_to_ship": 1}],
+    [{"item_id": 1, "quantity_to_ship": 1, "version": True}],
+    {"item_id": 1, "quantity_to_ship": 1},
+])
+def test_malformed_items_are_bad_request(client, order, items):
+    response = _ship(client, order, items)
+    assert response.status_code == 400, response.get_json()
+
+
+@pytest.mark.parametrize('items', [
+    [5],
+    [{"item_id": "1", "quantity_to_ship": 1}],
+    "pozycje",
+])
+def test_malformed_items_in_ship_batch_are_bad_request(client, order, items):
+    response = client.post('/api/shipping/orders/ship-batch', headers=order["headers"], json={
+        "orders": [{"order_id": order["id"], "items": items}]
+    })
+    assert response.status_code == 400, response.get_json()
@@ -0,0 +1,69 @@
+# /backend/wsgi.py
+"""
+Punkt wejścia dla serwera produkcyjnego (gunicorn):
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Aplikacja, szablony oraz obrazy i czcionki do PDF-ów są ładowane raz
+w procesie nadrzędnym (preload_app), a workery dostają je gotowe po fork().
+run.py zostaje do developmentu.
+"""
+from app import create_app, db
+from app.models import Order, DailyRevenue
+from app.pdf_assets import preload_pdf_assets
+from app.rollups import rebuild_rollups
+
+app = create_app()
+
+
+def backfill_order_totals(app):
+    """
+    Uzupełnia sumy zamówień, których jeszcze nie przeliczono (np. zaraz po
+    migracji dodającej kolumny) - bez tego kokpit i eksporty pokazywałyby zera.
+    Po uzupełnieniu to jedno UPDATE bez zmienionych wierszy.
+    Zwraca liczbę uzupełnionych zamówień.
+    """
+    with app.app_context():
+        try:
+            updated = Order.rebuild_totals(only_missing=True)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"OSTRZEŻENIE: Nie udało się uzupełnić sum zamówień: {e}")
+            return 0
+        if updated:
+            print(f"Uzupełniono sumy zamówień: {updated}")
+        return updated
+
+
+def backfill_rollups(app, totals_updated=0):
+    """
+    Buduje dzienne agregaty kokpitu, jeśli są puste, a zamówienia już istnieją
+    (baza sprzed wprowadzenia agregatów), albo gdy właśnie uzupełniono sumy
+    zamówień, z których agregaty są liczone. W pozostałych przypadkach
+    to tylko dwa zapytania LIMIT 1.
+    """
+    with app.app_context():
+        try:
+            if not totals_updated:
+                has_rollups = db.session.query(DailyRevenue.day).first() is not None
+                has_orders = db.session.query(Order.id).first() is not None
+                db.session.rollback()
+                if has_rollups or not has_orders:
+                    return
+            days = rebuild_rollups()
+        except Exception as e:
+            db.session.rollback()
+            print(f"OSTRZEŻENIE: Nie udało się zbudować agregatów kokpitu: {e} (uruchom: flask rebuild-rollups)")
+            return
+        print(f"Zbudowano agregaty kokpitu: {days} dni z zamówieniami")
+
+
+def warm_up(app):
+    """Kompiluje szablony Jinja i ładuje zasoby PDF, żeby żaden worker nie robił tego przy pierwszym żądaniu."""
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    preload_pdf_assets(app)
+
+
+backfill_rollups(app, backfill_order_totals(app))
+warm_up(app)
@@ -2,6 +2,13 @@
 import { defineStore } from 'pinia';
 import { ref } from 'vue';
 import apiClient from '@/api';
+import { useAuthStore } from '@/stores/auth';
+
+// Co ile odpytujemy API, gdy strumień (SSE) jest niedostępny
+const POLL_INTERVAL_MS = 30000;
+// Ponowne próby otwarcia strumienia po błędzie: 3 s, 6 s, 12 s... do 5 minut
+const STREAM_RETRY_MIN_MS = 3000;
+const STREAM_RETRY_MAX_MS = 300000;
 
 export const useNotificationStore = defineStore('notification', () => {
     const notifications = ref([]);
@@ -9,6 +16,12 @@ export const useNotificationStore = defineStore('notification', () => {
     const loading = ref(false);
     
     let pollInterval = null; // Zmienna do przechowywania interwału
+    let eventSource = null;  // Otwarty strumień powiadomień (SSE)
+    let lastSeq = null;      // Numer ostatniej znanej zmiany (kursor 'since')
+    let lastEventId = null;  // ID ostatniego zdarzenia ze strumienia (wznowienie)
+    let streamRetryTimer = null;
+    let streamRetryDelay = STREAM_RETRY_MIN_MS;
+    let active = false;      // Nasłuchiwanie włączone (między startPolling a stopPolling)
 
     // Pobiera powiadomienia z API
     async function fetchNotifications() {
@@ -17,6 +30,7 @@ export const useNotificationStore = defineStore('notification', () => {
             const response = await apiClient.get('/me/notifications');
             notifications.value = response.data.notifications;
             unreadCount.value = response.data.unread_count;
+            lastSeq = response.data.seq;
         } catch (error) {
             console.error("Nie udało się pobrać powiadomień:", error);
         } finally {
@@ -24,6 +38,35 @@ export const useNotificationStore = defineStore('notification', () => {
         }
     }
 
+    // Pobiera tylko zmiany od ostatniego razu (304 = nic nowego, pusta odpowiedź)
+    async function fetchChanges() {
+        if (lastSeq === null) return fetchNotifications();
+        try {
+            const response = await apiClient.get('/me/notifications', {
+                params: { since: lastSeq },
+                validateStatus: (status) => status === 200 || status === 304
+            });
+            if (response.status === 304) return;
+
+            const changed = response.data.notifications;
+            if (response.data.full) {
+                // Zmian było za dużo na deltę - serwer oddał pełną listę
+                notifications.value = changed;
+                unreadCount.value = response.data.unread_count;
+                lastSeq = response.data.seq;
+                return;
+            }
+            const changedIds = new Set(changed.map(n => n.id));
+            notifications.value = [...changed, ...notifications.value.filter(n => !changedIds.has(n.id))]
+                .sort((a, b) => (a.is_read - b.is_read) || b.created_at.localeCompare(a.created_at))
+                .slice(0, 20);
+            unreadCount.value = response.data.unread_count;
+            lastSeq = response.data.seq;
+        } catch (error) {
+            console.error("Nie udało się pobrać zmian powiadomień:", error);
+        }
+    }
+
     // Oznacza wszystkie jako przeczytane
     async function markAllAsRead() {
         if (unreadCount.value === 0) return; // Nie rób nic, jeśli nie ma co czytać
@@ -37,33 +80,137 @@ export const useNotificationStore = defineStore('notification', () => {
         }
     }
 
-    // --- Logika odpytywania (Polling) ---
+    // Nowe powiadomienie ze strumienia - dopisujemy na górę listy
+    function addNotification(notification) {
+        lastSeq = Math.max(lastSeq ?? 0, notification.seq ?? 0);
+        if (notifications.value.some(n => n.id === notification.id)) return;
+        notifications.value = [notification, ...notifications.value].slice(0, 20);
+        if (!notification.is_read) {
+            unreadCount.value += 1;
+        }
+    }
+
+    // --- Strumień na żywo (SSE) ---
 
-    // Startuje pętlę, która co 30 sekund sprawdza powiadomienia
+    // Otwiera strumień /me/notifications/stream. EventSource nie wysyła nagłówków,
+    // a adres trafia do logów serwera - dlatego w adresie jest jednorazowy bilet,
+    // nie token. Bilet jest zużyty, więc po każdym zerwaniu (także planowym
+    // zamknięciu przez serwer) łączymy się sami: nowy bilet + ostatnie ID zdarzenia.
+    async function openStream() {
+        const authStore = useAuthStore();
+        if (!window.EventSource || !authStore.token) return false;
+
+        let ticket;
+        try {
+            const response = await apiClient.post('/me/notifications/stream-ticket');
+            ticket = response.data.ticket;
+        } catch (error) {
+            console.error("Nie udało się pobrać biletu strumienia powiadomień:", error);
+            streamFailed();
+            return true;
+        }
+        if (!active || eventSource) return true; // Wylogowanie lub drugi strumień w międzyczasie
+
+        const params = new URLSearchParams({ ticket });
+        if (lastEventId !== null) params.set('last_event_id', lastEventId);
+        eventSource = new EventSource(`${apiClient.defaults.baseURL}/me/notifications/stream?${params}`);
+
+        eventSource.onopen = () => {
+            // Strumień działa - koniec odpytywania i kolejnych prób od nowa
+            streamRetryDelay = STREAM_RETRY_MIN_MS;
+            stopInterval();
+        };
+        eventSource.addEventListener('notification', (event) => {
+            if (event.lastEventId) lastEventId = event.lastEventId;
+            addNotification(JSON.parse(event.data));
+        });
+        eventSource.addEventListener('read', () => {
+            notifications.value.forEach(n => n.is_read = true);
+            unreadCount.value = 0;
+        });
+        eventSource.onerror = () => {
+            // Serwer zamknął strumień, odrzucił go (np. limit połączeń) albo sieć zniknęła
+            console.warn("Strumień powiadomień przerwany, odpytuję API do czasu ponownego połączenia.");
+            closeStream();
+            streamFailed();
+        };
+        return true;
+    }
+
+    // Do czasu ponownego połączenia odpytujemy API; kolejne próby coraz rzadziej
+    function streamFailed() {
+        if (!active) return;
+        startInterval();
+        if (streamRetryTimer) return;
+        streamRetryTimer = setTimeout(() => {
+            streamRetryTimer = null;
+            if (!active) return;
+            fetchChanges(); // Zmiany z czasu przerwy
+            openStream();
+        }, streamRetryDelay);
+        streamRetryDelay = Math.min(streamRetryDelay * 2, STREAM_RETRY_MAX_MS);
+    }
+
+    function closeStream() {
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+    }
+
+    // --- Logika odpytywania (Polling) - zapas, gdy strumień nie działa ---
+
+    function startInterval() {
+        if (pollInterval) return;
+        pollInterval = setInterval(() => {
+            fetchChanges();
+        }, POLL_INTERVAL_MS);
+    }
+
+    function stopInterval() {
+        if (pollInterval) {
+            clearInterval(pollInterval);
+            pollInterval = null;
+        }
+    }
+
+    // Startuje aktualizacje: strumień SSE, a gdy niedostępny - pętlę co 30 sekund
     function startPolling() {
-        // Upewnij się, że nie ma już aktywnej pętli
+        // Upewnij się, że nie ma już aktywnej pętli ani strumienia
         stopPolling(); 
         
-        console.log("Startuję odpytywanie o powiadomienia...");
+        console.log("Startuję nasłuchiwanie powiadomień...");
         // Pobierz od razu przy starcie
         fetchNotifications();
-        
-        // Ustaw pętlę
-        pollInterval = setInterval(() => {
-            fetchNotifications();
-        }, 30000); // 30 sekund
+
+        active = true;
+        if (!window.EventSource) {
+            startInterval();
+            return;
+        }
+        openStream().then((opened) => {
+            if (!opened) startInterval();
+        });
     }
 
-    // Zatrzymuje pętlę (np. przy wylogowaniu)
+    // Zatrzymuje strumień i pętlę (np. przy wylogowaniu)
     function stopPolling() {
+        active = false;
+        closeStream();
+        if (streamRetryTimer) {
+            clearTimeout(streamRetryTimer);
+            streamRetryTimer = null;
+        }
+        streamRetryDelay = STREAM_RETRY_MIN_MS;
         if (pollInterval) {
             console.log("Zatrzymuję odpytywanie o powiadomienia.");
-            clearInterval(pollInterval);
-            pollInterval = null;
+            stopInterval();
         }
         // Wyczyść dane po wylogowaniu
         notifications.value = [];
         unreadCount.value = 0;
+        lastSeq = null;
+        lastEventId = null;
     }
 
     return { 
@@ -75,4 +222,4 @@ export const useNotificationStore = defineStore('notification', () => {
         startPolling,
         stopPolling
     };
-});
\ No newline at end of file
+});
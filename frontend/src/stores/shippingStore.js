@@ -60,6 +60,30 @@ export const useShippingStore = defineStore('shipping', () => {
         }
     }
 
+    // Wysyłka całej fali zamówień jednym żądaniem.
+    // ordersToShip: [{ order_id, items: [{ item_id, quantity_to_ship }] }]
+    async function shipBatch(ordersToShip) {
+        try {
+            const response = await apiClient.post('/shipping/orders/ship-batch', {
+                orders: ordersToShip
+            });
+            // Odpowiedź zawiera same sumy - pozycje odświeżamy pełną listą
+            response.data.orders.forEach(updated => {
+                const index = orders.value.findIndex(o => o.id === updated.id);
+                if (index !== -1) {
+                    orders.value[index] = { ...orders.value[index], ...updated };
+                }
+            });
+
+            fetchStatusCounts();
+            return response.data;
+
+        } catch (err) {
+            console.error(err.response?.data);
+            throw new Error(err.response?.data?.msg || 'Wystąpił nieznany błąd serwera.');
+        }
+    }
+
     async function downloadOrderPdf(orderId) {
         try {
             const response = await apiClient.get(`/orders/${orderId}/pdf`, {
@@ -74,6 +98,44 @@ export const useShippingStore = defineStore('shipping', () => {
         }
     }
     
+    // Zbiorczy eksport potwierdzeń (ZIP). onProgress dostaje { done, total, percent }.
+    async function exportOrdersPdf(orderIds, onProgress) {
+        if (!orderIds || orderIds.length === 0) {
+            throw new Error("Nie wybrano żadnych zamówień.");
+        }
+        const exportId = crypto.randomUUID();
+        const progressTimer = onProgress ? setInterval(async () => {
+            try {
+                const response = await apiClient.get(`/orders/export-pdf/${exportId}`);
+                onProgress(response.data);
+            } catch (err) {
+                // Postęp jest tylko informacyjny (np. eksport jeszcze nie zapisany) - ignorujemy
+            }
+        }, 1000) : null;
+
+        try {
+            const response = await apiClient.post('/orders/export-pdf', {
+                order_ids: orderIds,
+                export_id: exportId
+            }, {
+                responseType: 'blob'
+            });
+            const fileURL = URL.createObjectURL(new Blob([response.data], { type: 'application/zip' }));
+            const link = document.createElement('a');
+            link.href = fileURL;
+            link.download = 'zamowienia.zip';
+            link.click();
+            URL.revokeObjectURL(fileURL);
+        } catch (err) {
+            console.error("Błąd podczas eksportu PDF:", err);
+            throw new Error("Nie udało się pobrać archiwum z potwierdzeniami.");
+        } finally {
+            if (progressTimer) {
+                clearInterval(progressTimer);
+            }
+        }
+    }
+
     async function fetchOrderShipments(order) {
         if (order.shipments) {
             return;
@@ -129,7 +191,9 @@ export const useShippingStore = defineStore('shipping', () => {
         error,
         fetchAllOrders,
         shipItems,
+        shipBatch,
         downloadOrderPdf,
+        exportOrdersPdf,
         fetchOrderShipments,
         generatePickingListPdf,
         fetchStatusCounts